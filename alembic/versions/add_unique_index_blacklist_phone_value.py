@@ -0,0 +1,45 @@
+"""add unique index on blacklist_phone.value
+
+Revision ID: unique_blacklist_phone_value
+Revises: 8439884a80a8
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'unique_blacklist_phone_value'
+down_revision = '8439884a80a8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 1. Chuẩn hoá value giống normalize_phone (bỏ khoảng trắng, +84 → 0)
+    op.execute("""
+        UPDATE blacklist_phone
+        SET value = CASE
+            WHEN left(replace(btrim(value), ' ', ''), 3) = '+84'
+                THEN '0' || substr(replace(btrim(value), ' ', ''), 4)
+            ELSE replace(btrim(value), ' ', '')
+        END
+        WHERE value IS NOT NULL;
+    """)
+
+    # 2. Xoá các dòng trùng số sau khi chuẩn hoá, giữ lại dòng có id nhỏ nhất
+    op.execute("""
+        DELETE FROM blacklist_phone a
+        USING blacklist_phone b
+        WHERE a.value = b.value AND a.id > b.id;
+    """)
+
+    # 3. Tạo unique btree index để tra cứu không còn phải quét toàn bảng
+    op.create_index(
+        op.f('ix_blacklist_phone_value'), 'blacklist_phone', ['value'], unique=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_blacklist_phone_value'), table_name='blacklist_phone')
@@ -0,0 +1,54 @@
+"""add updated timestamp to white_listurl, bump updated on every row update
+
+Revision ID: white_listurl_updated
+Revises: renormalize_blacklist_phone
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'white_listurl_updated'
+down_revision = 'renormalize_blacklist_phone'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 1. Cột updated cho whitelist, giống blacklist_url: DomainSnapshotCache dùng
+    #    max(updated) để phát hiện dòng bị sửa tại chỗ (last_seen chỉ là ngày)
+    op.add_column(
+        'white_listurl',
+        sa.Column(
+            'updated',
+            sa.DateTime(timezone=True),
+            server_default=sa.text('now()'),
+            nullable=False,
+        ),
+    )
+
+    # 2. Trigger cập nhật updated cho mọi UPDATE, kể cả ghi bằng SQL thô từ Airflow
+    #    crawler (onupdate của ORM chỉ áp dụng cho ghi qua app)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION set_updated_timestamp() RETURNS trigger AS $$
+        BEGIN
+            NEW.updated = clock_timestamp();
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    for table in ('white_listurl', 'blacklist_url'):
+        op.execute(f"""
+            CREATE TRIGGER {table}_set_updated
+            BEFORE UPDATE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION set_updated_timestamp();
+        """)
+
+
+def downgrade() -> None:
+    for table in ('white_listurl', 'blacklist_url'):
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_set_updated ON {table};")
+    op.execute("DROP FUNCTION IF EXISTS set_updated_timestamp();")
+    op.drop_column('white_listurl', 'updated')
@@ -0,0 +1,74 @@
+"""renormalize blacklist_phone.value with the normalize_phone rules
+
+Revision ID: renormalize_blacklist_phone
+Revises: unique_blacklist_phone_value
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'renormalize_blacklist_phone'
+down_revision = 'unique_blacklist_phone_value'
+branch_labels = None
+depends_on = None
+
+
+# Bản sao cố định của app.services.phone.normalize_phone tại revision này (cả nhánh
+# fallback cho value không nhận dạng được): migration phải cho cùng kết quả dù sau này
+# hàm của app thay đổi.
+_PHONE_PATTERN = re.compile(
+    r"(?<![\d+])(?P<prefix>\+84|84|0)[ .\-]?"
+    r"(?P<number>2(?:[ .\-]?\d){9}|[35789](?:[ .\-]?\d){8})(?!\d)"
+)
+_SEPARATORS = re.compile(r"[ .\-]")
+
+
+def _normalize_phone(phone: str) -> str:
+    match = _PHONE_PATTERN.fullmatch(phone.strip())
+    if match:
+        return "0" + _SEPARATORS.sub("", match.group("number"))
+
+    phone = phone.strip().replace(" ", "")
+    if phone.startswith("+84"):
+        phone = "0" + phone[3:]
+    return phone
+
+
+def upgrade() -> None:
+    # Cùng quy tắc normalize_phone mà API dùng khi ghi, để value đã migrate và value ghi
+    # sau này luôn cùng một dạng.
+    # Dòng đã ở dạng chuẩn giữ nguyên; dòng khác được đổi sang dạng chuẩn, nếu dạng chuẩn
+    # đã có dòng giữ thì xoá dòng trùng.
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.text("SELECT id, value FROM blacklist_phone WHERE value IS NOT NULL ORDER BY id")
+    ).all()
+
+    owners = {
+        value: entry_id for entry_id, value in rows if _normalize_phone(value) == value
+    }
+    updates, deletes = [], []
+    for entry_id, value in rows:
+        normalized = _normalize_phone(value)
+        if normalized == value:
+            continue
+        if normalized in owners:
+            deletes.append({"id": entry_id})
+        else:
+            owners[normalized] = entry_id
+            updates.append({"id": entry_id, "value": normalized})
+
+    if deletes:
+        bind.execute(sa.text("DELETE FROM blacklist_phone WHERE id = :id"), deletes)
+    if updates:
+        bind.execute(sa.text("UPDATE blacklist_phone SET value = :value WHERE id = :id"), updates)
+
+
+def downgrade() -> None:
+    # Dữ liệu đã được chuẩn hoá, không thể khôi phục dạng gốc
+    pass
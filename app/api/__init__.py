@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.api import utils, auth, users, reported_phones, image_processing, whitelist, reports, admin, sos
+from app.api import utils, auth, users, reported_phones, image_processing, whitelist, reports, admin, sos, classify
 
 api_router = APIRouter()
 
@@ -13,3 +13,4 @@ api_router.include_router(whitelist.router, tags=["whitelist"])
 api_router.include_router(reports.router, tags=["reports"])
 api_router.include_router(admin.router, tags=["admin"])
 api_router.include_router(sos.router, tags=["sos"])
+api_router.include_router(classify.router, tags=["classify"])
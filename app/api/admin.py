@@ -1,13 +1,15 @@
 from fastapi import APIRouter, HTTPException, status, Query
 from sqlalchemy import select
 
-from app.deps.db import CurrentAsyncSession
+from app.deps.db import CurrentAsyncSession, commit_or_conflict
 from app.models.report import Report
 from app.models.blacklist_phone import BlackListPhone
 from app.models.blacklist_url import BlackListURL
 from app.schemas.blacklist import BlackListPhoneOut, BlackListURLOut, ReportOut
+from app.services.domain_snapshot import domain_snapshot_cache
 from app.services.phone import normalize_phone
-from app.services.url_normalizer import URLNormalizer
+from app.services.phone_blacklist import phone_blacklist
+from app.services.url_normalizer import url_normalizer
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
@@ -49,7 +51,7 @@ async def approve_report_phone(
     )
     if existing.scalar_one_or_none():
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
+            status_code=status.HTTP_409_CONFLICT,
             detail="Số điện thoại đã có trong blacklist"
         )
     
@@ -64,7 +66,8 @@ async def approve_report_phone(
     # Cập nhật status report
     report.status = True
     
-    await session.commit()
+    await commit_or_conflict(session, "Số điện thoại đã có trong blacklist")
+    phone_blacklist.mark_stale()
     await session.refresh(blacklist_phone)
     return blacklist_phone
 
@@ -88,25 +91,24 @@ async def approve_report_url(
             detail="Báo cáo này không có URL"
         )
     
-    # Extract domain từ URL
-    normalizer = URLNormalizer()
-    normalized = normalizer.normalize(report.reported_url)
-    if not normalized:
+    # Lấy registrable domain (vd: a.scam.com.vn → scam.com.vn) làm key blacklist
+    # để mọi subdomain anh em đều bị chặn qua so khớp domain cha; domain whitelist và
+    # hosting dùng chung (sites.google.com, ...) giữ nguyên host
+    snapshot = await domain_snapshot_cache.get(session)
+    domain = url_normalizer.blacklist_key(report.reported_url, snapshot.whitelist)
+    if not domain:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="URL không hợp lệ"
+            detail="URL không hợp lệ hoặc là public suffix (vd: com.vn)"
         )
     
-    # Lấy domain (phần trước dấu /)
-    domain = normalized.split("/")[0]
-    
     # Kiểm tra đã có trong blacklist chưa
     existing = await session.execute(
         select(BlackListURL).where(BlackListURL.domain == domain)
     )
     if existing.scalar_one_or_none():
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
+            status_code=status.HTTP_409_CONFLICT,
             detail="Domain đã có trong blacklist"
         )
     
@@ -122,7 +124,8 @@ async def approve_report_url(
     # Cập nhật status report
     report.status = True
     
-    await session.commit()
+    await commit_or_conflict(session, "Domain đã có trong blacklist")
+    domain_snapshot_cache.invalidate()
     await session.refresh(blacklist_url)
     return blacklist_url
 
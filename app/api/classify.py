@@ -0,0 +1,25 @@
+from fastapi import APIRouter
+
+from app.deps.users import CurrentUser
+from app.schemas.scam_detection import BatchClassifyRequest, BatchClassifyResponse
+from app.services.batch_classification import BatchClassifier
+from app.services.gemini_explanation_service import get_gemini_service
+
+router = APIRouter(prefix="/classify")
+
+
+@router.post("/batch", response_model=BatchClassifyResponse)
+async def classify_batch(
+    payload: BatchClassifyRequest,
+    user: CurrentUser,
+):
+    """Phân loại lừa đảo cho nhiều tin nhắn (ví dụ export SMS/Zalo) - yêu cầu đăng nhập
+
+    - Tin nhắn trùng nhau (sau khi làm sạch) chỉ được phân loại một lần
+    - Trả lời từ cache hoặc mô hình cục bộ khi có thể, phần còn lại gộp nhiều tin nhắn
+      vào mỗi lần gọi Gemini
+    - Kết quả trả về theo đúng thứ tự `texts` gửi lên, `source` cho biết nguồn kết quả
+    """
+    classifier = BatchClassifier(get_gemini_service())
+    results, stats = await classifier.classify(payload.texts)
+    return BatchClassifyResponse(results=results, stats=stats)
@@ -1,44 +1,35 @@
 from fastapi import APIRouter, File, UploadFile, HTTPException, status, Form
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from PIL import UnidentifiedImageError
+from app.core.config import settings
 from app.deps.db import CurrentAsyncSession
-from app.services.vintern_ocr_service import VinternOCRService
+from app.services.ocr_provider import OCRDisabledError, ocr_provider
 from app.services.text_cleaning import TextCleaner
-from app.services.gemini_explanation_service import GeminiExplanationService
+from app.services.gemini_explanation_service import get_gemini_service
 from app.schemas.scam_detection import TextExtractionResponse
-from app.services.url_whitelist import WhitelistService
+from app.services.url_verdict import URLVerdictService
+from app.services.inference_pool import InferencePoolSaturated
+from app.services.ocr_profiles import PROFILE_NAMES
+from app.services.phone_blacklist import check_phones
+import asyncio
+import json
 import logging
-import os
-from typing import Optional
+from typing import Any, AsyncIterator, Awaitable, Dict, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/image-processing")
 
 # Initialize services
-ocr_service = VinternOCRService(use_gpu=False)
+# OCR (Vintern) được nạp lười qua ocr_provider ở request ảnh đầu tiên
 text_cleaner = TextCleaner()
 
-# Initialize Gemini service (lazy load)
-gemini_service = None
-
-def get_gemini_service():
-    """Lazy load Gemini service"""
-    global gemini_service
-    if gemini_service is None:
-        try:
-            gemini_service = GeminiExplanationService(
-                api_key=os.getenv("GEMINI_API_KEY"),
-                model_name=os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
-            )
-            logger.info("Gemini service initialized")
-        except Exception as e:
-            logger.warning(f"Could not load Gemini service: {str(e)}")
-            logger.warning("Classification will use fallback")
-    return gemini_service
-
 
 def build_verdict_summary(classification: Optional[dict]) -> str:
     """
-    Tạo ra thông điệp tự nhiên dựa trên kết quả classification để hiển thị cho người dùng cuối.
+    Tạo ra thông điệp tự nhiên dựa trên kết quả classification để hiển thị cho người
+    dùng cuối.
     """
     if not classification:
         return "Chưa đủ dữ liệu để kết luận nội dung có phải lừa đảo hay không."
@@ -71,30 +62,209 @@ def build_verdict_summary(classification: Optional[dict]) -> str:
 
     return " ".join(sections).strip()
 
+EMPTY_CLEANING_STATS = {
+    'original_length': 0,
+    'cleaned_length': 0,
+    'removed_chars': 0,
+    'urls_found': 0,
+    'phones_found': 0,
+    'emails_found': 0
+}
+
+
+def validate_ocr_profile(ocr_profile: Optional[str]) -> None:
+    if ocr_profile and ocr_profile.lower() not in PROFILE_NAMES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=(
+                f"ocr_profile không hợp lệ, chọn một trong: {', '.join(PROFILE_NAMES)}"
+            ),
+        )
+
+
+async def read_image_bytes(image: UploadFile) -> bytes:
+    """Kiểm tra file upload là ảnh không rỗng và đọc bytes"""
+    # Validate file type
+    if not image.content_type or not image.content_type.startswith('image/'):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="File phải là ảnh (image/*)"
+        )
+
+    # Đọc ảnh
+    image_bytes = await image.read()
+
+    if len(image_bytes) == 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="File ảnh rỗng"
+        )
+
+    logger.info(f"Processing image: {image.filename}, size: {len(image_bytes)} bytes")
+    return image_bytes
+
+
+def unreadable_image_error() -> HTTPException:
+    """Ảnh upload có content type image/* nhưng PIL không giải mã được"""
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Không đọc được file ảnh, vui lòng thử lại với ảnh khác"
+    )
+
+
+def ocr_unavailable_error(error: Exception) -> HTTPException:
+    """Chuyển lỗi OCR (tắt OCR / hàng đợi đầy) thành HTTPException tương ứng"""
+    if isinstance(error, OCRDisabledError):
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=(
+                "Node này không hỗ trợ OCR, vui lòng nhập text trực tiếp "
+                "(raw_text_input)"
+            ),
+        )
+    logger.warning(f"OCR queue saturated: {error}")
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Hệ thống OCR đang quá tải, vui lòng thử lại sau",
+        headers={
+            "Retry-After": "5",
+            "X-OCR-Queue-Depth": str(error.queue_depth),
+            "X-OCR-Queue-Capacity": str(error.capacity),
+        },
+    )
+
+
+def analyze_text(raw_text: str) -> dict:
+    """
+    Làm sạch text (GIỮ DẤU TIẾNG VIỆT) và trích xuất URL, số điện thoại, email một lần
+    """
+    cleaned_text = text_cleaner.clean_text(raw_text)
+    cleaned_text = text_cleaner.preserve_vietnamese_accents(cleaned_text)
+    urls = text_cleaner.extract_urls(cleaned_text)
+    phones = text_cleaner.extract_phones(cleaned_text)
+    emails = text_cleaner.extract_emails(cleaned_text)
+    return {
+        "cleaned_text": cleaned_text,
+        "urls": urls,
+        "phones": phones,
+        "emails": emails,
+        "stats": text_cleaner.get_cleaning_stats(
+            raw_text, cleaned_text, urls, phones, emails
+        ),
+    }
+
+
+async def check_whitelist(session, urls: List[str]) -> list:
+    if not urls:
+        return []
+    try:
+        # Cùng kết luận với /whitelist/check: blacklist khớp cụ thể hơn thắng whitelist
+        return await URLVerdictService(session=session).check_urls(urls)
+    except Exception as e:
+        logger.error(f"Lỗi kiểm tra whitelist: {str(e)}", exc_info=True)
+        return []
+
+
+async def check_phone_blacklist(session, phones: List[str]) -> list:
+    if not phones:
+        return []
+    try:
+        return await check_phones(session, phones)
+    except Exception as e:
+        logger.error(f"Lỗi kiểm tra blacklist số điện thoại: {str(e)}", exc_info=True)
+        return []
+
+
+async def check_reputation(
+    session, urls: List[str], phones: List[str]
+) -> Tuple[list, list]:
+    """Nhánh DB: URL rồi số điện thoại, tuần tự vì dùng chung một AsyncSession"""
+    whitelist_results = await check_whitelist(session, urls)
+    phone_results = await check_phone_blacklist(session, phones)
+    return whitelist_results, phone_results
+
+
+async def run_stage(
+    stage: str, coro: Awaitable[Any], timeout: float, default: Any
+) -> Any:
+    """Chạy một nhánh pipeline với timeout riêng; quá hạn thì dùng giá trị mặc định"""
+    try:
+        return await asyncio.wait_for(coro, timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"Pipeline stage '{stage}' timed out after {timeout}s")
+        return default
+
+
+def start_stages(session, analysis: dict) -> Dict[str, "asyncio.Task"]:
+    """
+    Sau bước làm sạch, nhánh tra DB (URL + số điện thoại) và nhánh LLM độc lập với nhau
+    nên chạy song song: độ trễ tổng ≈ nhánh chậm nhất thay vì tổng các nhánh.
+    """
+    urls, phones = analysis["urls"], analysis["phones"]
+    return {
+        "reputation": asyncio.create_task(run_stage(
+            "reputation", check_reputation(session, urls, phones),
+            settings.PIPELINE_DB_TIMEOUT_SECONDS, ([], []),
+        )),
+        "classification": asyncio.create_task(run_stage(
+            "classification", classify_text(analysis["cleaned_text"], urls, phones),
+            settings.PIPELINE_LLM_TIMEOUT_SECONDS, None,
+        )),
+    }
+
+
+async def classify_text(
+    cleaned_text: str, urls: List[str], phones: List[str]
+) -> Optional[dict]:
+    """Phân loại lừa đảo và giải thích với Gemini (None nếu không có service/lỗi)"""
+    try:
+        service = get_gemini_service()
+        if not service:
+            return None
+        classification = await service.aclassify_and_explain(
+            text=cleaned_text,
+            detected_urls=urls,
+            detected_phones=phones
+        )
+        verdict = 'lừa đảo' if classification['is_scam'] else 'không lừa đảo'
+        logger.info(f"Classification result: {verdict}")
+        return classification
+    except Exception as e:
+        logger.error(f"Error in Gemini classification: {str(e)}", exc_info=True)
+        # Continue without classification
+        return None
+
+
 @router.post("/extract-text", response_model=TextExtractionResponse)
 async def extract_text_from_image(
     # TODO: Thêm lại authentication sau khi hoàn thành dịch vụ
     # user: CurrentUser,  # ← Uncomment dòng này để bật lại authentication
     session: CurrentAsyncSession,
     image: Optional[UploadFile] = File(None),
-    raw_text_input: Optional[str] = Form(None)
+    raw_text_input: Optional[str] = Form(None),
+    ocr_profile: Optional[str] = Form(None)
 ):
     """
-    Trích xuất text từ ảnh HOẶC nhận text trực tiếp, sau đó phân loại lừa đảo và giải thích:
+    Trích xuất text từ ảnh HOẶC nhận text trực tiếp, sau đó phân loại lừa đảo và giải
+    thích:
     1. OCR tiếng Việt (Vintern-1B-v3.5) - nếu có ảnh
     2. Làm sạch text (giữ dấu tiếng Việt)
-    3. Phân loại lừa đảo và giải thích (Gemini AI)
-    4. Kiểm tra URL với whitelist
-    
+    3. Song song: kiểm tra URL (whitelist/blacklist) + số điện thoại (blacklist) và
+       phân loại lừa đảo, giải thích (Gemini AI), mỗi nhánh có timeout riêng
+
     **Input options:**
     - `image`: Upload ảnh (multipart/form-data)
     - `raw_text_input`: Nhập text trực tiếp (form-data)
-    
-    **Lưu ý**: 
+    - `ocr_profile`: fast | balanced | accurate | adaptive (mặc định theo cấu hình
+      server)
+
+    **Lưu ý**:
     - Phải có ít nhất 1 trong 2: `image` hoặc `raw_text_input`
     - Text trả về sẽ GIỮ NGUYÊN DẤU TIẾNG VIỆT
-    - Kết quả phân loại lừa đảo và giải thích được tạo bằng Gemini AI (tiếng Việt, dễ hiểu)
+    - Kết quả phân loại lừa đảo và giải thích được tạo bằng Gemini AI (tiếng Việt,
+      dễ hiểu)
     - Cần GEMINI_API_KEY trong environment variables
+    - Muốn nhận kết quả từng bước, dùng `/extract-text/stream`
     """
     try:
         # Validate input
@@ -103,38 +273,31 @@ async def extract_text_from_image(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Cần upload ảnh (image) hoặc nhập text (raw_text_input)"
             )
-        
+        validate_ocr_profile(ocr_profile)
+
         raw_text = ""
-        
+
         # Option 1: Extract từ ảnh
         if image:
-            # Validate file type
-            if not image.content_type or not image.content_type.startswith('image/'):
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="File phải là ảnh (image/*)"
-                )
-            
-            # Đọc ảnh
-            image_bytes = await image.read()
-            
-            if len(image_bytes) == 0:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="File ảnh rỗng"
-                )
-            
-            logger.info(f"Processing image: {image.filename}, size: {len(image_bytes)} bytes")
-            
-            # OCR với Vintern
+            image_bytes = await read_image_bytes(image)
+
+            # OCR với Vintern (chạy trong inference pool, không chặn event loop)
             logger.info("Step 1: Extracting text with Vintern OCR...")
-            raw_text = await ocr_service.extract_text(image_bytes)
-        
+            try:
+                ocr_service = await ocr_provider.get()
+                raw_text = await ocr_service.extract_text(
+                    image_bytes, profile=ocr_profile
+                )
+            except (OCRDisabledError, InferencePoolSaturated) as e:
+                raise ocr_unavailable_error(e)
+            except UnidentifiedImageError:
+                raise unreadable_image_error()
+
         # Option 2: Nhận text trực tiếp
         elif raw_text_input:
             raw_text = raw_text_input.strip()
             logger.info(f"Processing direct text input: {len(raw_text)} characters")
-        
+
         # Validate text
         if not raw_text or len(raw_text.strip()) == 0:
             logger.warning("No text to process")
@@ -144,57 +307,29 @@ async def extract_text_from_image(
                 detected_urls=[],
                 detected_phones=[],
                 detected_emails=[],
-                cleaning_stats={
-                    'original_length': 0,
-                    'cleaned_length': 0,
-                    'removed_chars': 0,
-                    'urls_found': 0,
-                    'phones_found': 0,
-                    'emails_found': 0
-                },
+                cleaning_stats=dict(EMPTY_CLEANING_STATS),
                 classification=None,
                 verdict_summary=""
             )
-        
-        # Bước 2: Làm sạch text (GIỮ DẤU TIẾNG VIỆT)
+
+        # Bước 2: Làm sạch text (GIỮ DẤU TIẾNG VIỆT) và trích xuất thông tin
         logger.info("Step 2: Cleaning text (preserving Vietnamese accents)...")
-        cleaned_text = text_cleaner.clean_text(raw_text)
-        cleaned_text = text_cleaner.preserve_vietnamese_accents(cleaned_text)
-        
-        # Trích xuất thông tin
-        urls = text_cleaner.extract_urls(cleaned_text)
-        phones = text_cleaner.extract_phones(cleaned_text)
-        emails = text_cleaner.extract_emails(cleaned_text)
-        
-        # Thống kê
-        stats = text_cleaner.get_cleaning_stats(raw_text, cleaned_text)
-        
-        whitelist_results = []
-        if urls:
-            try:
-                whitelist_service = WhitelistService(session=session)
-                whitelist_results = await whitelist_service.check_urls(urls)
-            except Exception as e:
-                logger.error(f"Lỗi kiểm tra whitelist: {str(e)}", exc_info=True)
+        analysis = analyze_text(raw_text)
+        cleaned_text = analysis["cleaned_text"]
+        urls = analysis["urls"]
+        phones = analysis["phones"]
+
+        # Bước 3: Tra URL/số điện thoại và phân loại với Gemini chạy song song
+        logger.info(
+            "Step 3: Checking URLs/phones and classifying with Gemini concurrently..."
+        )
+        stages = start_stages(session, analysis)
+        (whitelist_results, phone_results), classification = await asyncio.gather(
+            stages["reputation"], stages["classification"]
+        )
 
-        # Bước 3: Phân loại lừa đảo và giải thích với Gemini
-        classification = None
-        try:
-            service = get_gemini_service()
-            if service:
-                logger.info("Step 3: Classifying and explaining with Gemini...")
-                classification = service.classify_and_explain(
-                    text=cleaned_text,
-                    detected_urls=urls,
-                    detected_phones=phones
-                )
-                logger.info(f"Classification result: {'lừa đảo' if classification['is_scam'] else 'không lừa đảo'}")
-        except Exception as e:
-            logger.error(f"Error in Gemini classification: {str(e)}", exc_info=True)
-            # Continue without classification
-        
         logger.info(f"Extraction completed. Text length: {len(cleaned_text)} chars")
-        
+
         verdict_summary = build_verdict_summary(classification)
 
         return TextExtractionResponse(
@@ -202,13 +337,14 @@ async def extract_text_from_image(
             cleaned_text=cleaned_text,
             detected_urls=urls,
             detected_phones=phones,
-            detected_emails=emails,
-            cleaning_stats=stats,
+            detected_emails=analysis["emails"],
+            cleaning_stats=analysis["stats"],
             classification=classification,
             whitelist_results=whitelist_results,
+            phone_results=phone_results,
             verdict_summary=verdict_summary
         )
-        
+
     except HTTPException:
         raise
     except Exception as e:
@@ -218,3 +354,136 @@ async def extract_text_from_image(
             detail=f"Lỗi khi xử lý: {str(e)}"
         )
 
+
+def sse_event(event: str, data) -> str:
+    """Định dạng một Server-Sent Event với payload JSON"""
+    payload = json.dumps(jsonable_encoder(data), ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+async def pipeline_events(
+    session,
+    ocr_chunks: Optional[AsyncIterator[str]],
+    raw_text_input: Optional[str],
+) -> AsyncIterator[str]:
+    """
+    Chạy pipeline và phát event ngay khi từng bước xong:
+    ocr_token* → ocr_done → cleaned → entities
+    → (whitelist, phones | classification) → done
+    Hai nhánh cuối chạy song song nên thứ tự event của chúng theo nhánh nào xong trước.
+    (lỗi giữa chừng phát event `error` rồi kết thúc stream)
+    """
+    try:
+        if ocr_chunks is not None:
+            parts = []
+            async for chunk in ocr_chunks:
+                parts.append(chunk)
+                yield sse_event("ocr_token", {"text": chunk})
+            raw_text = "".join(parts).strip()
+            yield sse_event("ocr_done", {"extracted_text": raw_text})
+        else:
+            raw_text = (raw_text_input or "").strip()
+
+        if not raw_text:
+            yield sse_event(
+                "cleaned", {"cleaned_text": "", "cleaning_stats": EMPTY_CLEANING_STATS}
+            )
+            yield sse_event("done", {})
+            return
+
+        analysis = analyze_text(raw_text)
+        yield sse_event("cleaned", {
+            "cleaned_text": analysis["cleaned_text"],
+            "cleaning_stats": analysis["stats"],
+        })
+        yield sse_event("entities", {
+            "detected_urls": analysis["urls"],
+            "detected_phones": analysis["phones"],
+            "detected_emails": analysis["emails"],
+        })
+
+        # Phát kết quả từng nhánh ngay khi nhánh đó xong
+        stages = start_stages(session, analysis)
+        pending = set(stages.values())
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                if stages["reputation"] in done:
+                    whitelist_results, phone_results = stages["reputation"].result()
+                    yield sse_event(
+                        "whitelist", {"whitelist_results": whitelist_results}
+                    )
+                    yield sse_event("phones", {"phone_results": phone_results})
+                if stages["classification"] in done:
+                    classification = stages["classification"].result()
+                    yield sse_event("classification", {
+                        "classification": classification,
+                        "verdict_summary": build_verdict_summary(classification),
+                    })
+        finally:
+            # Client ngắt kết nối giữa chừng: huỷ các nhánh còn chạy
+            for task in pending:
+                task.cancel()
+        yield sse_event("done", {})
+    except Exception as e:
+        logger.error(f"Error streaming image/text pipeline: {str(e)}", exc_info=True)
+        yield sse_event("error", {"detail": f"Lỗi khi xử lý: {str(e)}"})
+
+
+@router.post("/extract-text/stream")
+async def extract_text_stream(
+    session: CurrentAsyncSession,
+    image: Optional[UploadFile] = File(None),
+    raw_text_input: Optional[str] = Form(None),
+    ocr_profile: Optional[str] = Form(None)
+):
+    """
+    Giống `/extract-text` nhưng trả về Server-Sent Events (text/event-stream) theo từng
+    bước:
+    - `ocr_token`: đoạn text OCR vừa sinh ra (chỉ khi upload ảnh)
+    - `ocr_done`: toàn bộ text OCR
+    - `cleaned`: text đã làm sạch và thống kê
+    - `entities`: URL, số điện thoại, email
+    - `whitelist`, `phones`: kết quả kiểm tra URL và số điện thoại
+    - `classification`: kết quả phân loại và verdict_summary
+      (hai nhánh trên chạy song song, event đến theo nhánh nào xong trước)
+    - `done` / `error`: kết thúc stream
+
+    **Lưu ý**: streaming OCR dùng greedy decoding (num_beams=1) nên text có thể khác
+    đôi chút so với `/extract-text` ở cùng profile.
+    Lỗi đầu vào hoặc ảnh không đọc được (400), OCR bị tắt (503), hàng đợi OCR đầy
+    (429) hay lỗi OCR khác (500) được trả trước khi mở stream.
+    """
+    if not image and not raw_text_input:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cần upload ảnh (image) hoặc nhập text (raw_text_input)"
+        )
+    validate_ocr_profile(ocr_profile)
+
+    ocr_chunks = None
+    if image:
+        image_bytes = await read_image_bytes(image)
+        try:
+            ocr_service = await ocr_provider.get()
+            ocr_chunks = await ocr_service.stream_text(image_bytes, profile=ocr_profile)
+        except (OCRDisabledError, InferencePoolSaturated) as e:
+            raise ocr_unavailable_error(e)
+        except UnidentifiedImageError:
+            raise unreadable_image_error()
+        except Exception as e:
+            # Lỗi trước khi mở stream vẫn trả HTTP error như `/extract-text`
+            logger.error(f"Error starting OCR stream: {str(e)}", exc_info=True)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Lỗi khi xử lý: {str(e)}"
+            )
+
+    return StreamingResponse(
+        pipeline_events(session, ocr_chunks, raw_text_input),
+        media_type="text/event-stream",
+        # Tắt buffer của proxy (nginx) để event tới client ngay
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -3,12 +3,18 @@ from fastapi import APIRouter, HTTPException, Query, status
 from sqlalchemy import func, select
 from starlette.responses import Response
 
-from app.deps.db import CurrentAsyncSession
+from app.deps.db import CurrentAsyncSession, commit_or_conflict
 from app.deps.request_params import ReportedPhonesRequestParams
 from app.deps.users import CurrentUser
 from app.models.blacklist_phone import BlackListPhone
-from app.schemas.blacklist import BlackListPhoneOut, BlackListPhoneCreate
+from app.schemas.blacklist import (
+    BlackListPhoneOut,
+    BlackListPhoneCreate,
+    PhoneBatchSearchRequest,
+    PhoneBatchSearchResponse,
+)
 from app.services.phone import normalize_phone
+from app.services.phone_blacklist import check_phones, phone_blacklist, search_status
 
 router = APIRouter(prefix="/reported_phones")
 
@@ -26,24 +32,27 @@ async def search_reported_phone(
     """
     normalized_value = normalize_phone(value)
     
-    # Kiểm tra trong blacklist
-    result = await session.execute(
-        select(BlackListPhone).where(BlackListPhone.value == normalized_value)
-    )
-    blacklist_entry = result.scalar_one_or_none()
-    
-    if blacklist_entry:
-        return {
-            "status": "danger",
-            "message": "⚠️ Số điện thoại này đã bị báo cáo là lừa đảo",
-            "found": True
-        }
-    else:
-        return {
-            "status": "warning",
-            "message": "⚠️ Số điện thoại này chưa có trong hệ thống, hãy cẩn thận",
-            "found": False
-        }
+    # Tra trong tập blacklist ở bộ nhớ, chỉ xuống DB khi value không phải số điện thoại hợp lệ
+    await phone_blacklist.ensure_fresh(session)
+    found = phone_blacklist.contains(normalized_value)
+    if found is None:
+        entry_id = await session.scalar(
+            select(BlackListPhone.id).where(BlackListPhone.value == normalized_value)
+        )
+        found = entry_id is not None
+    return search_status(found)
+
+
+@router.post("/search/batch", response_model=PhoneBatchSearchResponse)
+async def search_reported_phones_batch(
+    payload: PhoneBatchSearchRequest,
+    session: CurrentAsyncSession,
+):
+    """Tìm nhiều số điện thoại trong blacklist bằng một query - không yêu cầu đăng nhập
+
+    Kết quả trả về theo đúng thứ tự `values` gửi lên.
+    """
+    return PhoneBatchSearchResponse(results=await check_phones(session, payload.values))
 
 
 @router.get("", response_model=list[BlackListPhoneOut])
@@ -80,9 +89,24 @@ async def create_reported_phone(
     session: CurrentAsyncSession,
 ):
     """Báo cáo số điện thoại đáng ngờ - không yêu cầu đăng nhập"""
-    reported_phone = BlackListPhone(**reported_phone_in.model_dump())
+    data = reported_phone_in.model_dump()
+    data["value"] = normalize_phone(data["value"])
+
+    # value có unique index: kiểm tra trước để báo lỗi sớm, commit_or_conflict lo trường
+    # hợp hai request đồng thời cùng qua bước kiểm tra
+    existing = await session.scalar(
+        select(BlackListPhone.id).where(BlackListPhone.value == data["value"])
+    )
+    if existing is not None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Số điện thoại đã có trong blacklist"
+        )
+
+    reported_phone = BlackListPhone(**data)
     session.add(reported_phone)
-    await session.commit()
+    await commit_or_conflict(session, "Số điện thoại đã có trong blacklist")
+    phone_blacklist.mark_stale()
     await session.refresh(reported_phone)
     return reported_phone
 
@@ -104,10 +128,24 @@ async def update_reported_phone(
     if not reported_phone:
         raise HTTPException(404)
     update_data = reported_phone_in.model_dump(exclude_unset=True)
+    if update_data.get("value") is not None:
+        update_data["value"] = normalize_phone(update_data["value"])
+        existing = await session.scalar(
+            select(BlackListPhone.id).where(
+                BlackListPhone.value == update_data["value"],
+                BlackListPhone.id != reported_phone_id,
+            )
+        )
+        if existing is not None:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Số điện thoại đã có trong blacklist"
+            )
     for field, value in update_data.items():
         setattr(reported_phone, field, value)
     session.add(reported_phone)
-    await session.commit()
+    await commit_or_conflict(session, "Số điện thoại đã có trong blacklist")
+    phone_blacklist.invalidate()
     return reported_phone
 
 
@@ -140,4 +178,5 @@ async def delete_reported_phone(
         raise HTTPException(404)
     await session.delete(reported_phone)
     await session.commit()
+    phone_blacklist.invalidate()
     return {"success": True}
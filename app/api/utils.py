@@ -1,5 +1,6 @@
 from fastapi import APIRouter
 
+from app.core.metrics import collect_stats, current_rss_bytes, startup_seconds
 from app.schemas.msg import Msg
 
 router = APIRouter()
@@ -13,3 +14,14 @@ router = APIRouter()
 )
 def test_hello_world():
     return {"msg": "Hello world!"}
+
+
+@router.get("/health", status_code=200)
+def health():
+    """Trạng thái node: thời gian cold start, bộ nhớ và trạng thái các thành phần (OCR, cache...)"""
+    return {
+        "status": "ok",
+        "startup_seconds": startup_seconds(),
+        "rss_bytes": current_rss_bytes(),
+        **collect_stats(),
+    }
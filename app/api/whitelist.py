@@ -5,17 +5,15 @@ from sqlalchemy import select
 from app.deps.db import CurrentAsyncSession
 from app.deps.users import CurrentUser
 from app.models.white_list_url import WhiteListURL
-from app.models.blacklist_url import BlackListURL
 from app.schemas.whitelist import (
     WhiteListURLCreate,
     WhiteListURLOut,
     WhiteListURLUpdate,
     WhitelistCheckRequest,
     WhitelistCheckResponse,
-    URLWhitelistMatchResult,
 )
-from app.services.url_whitelist import WhitelistService
-from app.services.url_normalizer import URLNormalizer
+from app.services.domain_snapshot import domain_snapshot_cache
+from app.services.url_verdict import URLVerdictService
 
 router = APIRouter(prefix="/whitelist", tags=["whitelist"])
 
@@ -34,73 +32,8 @@ async def check_urls(
     session: CurrentAsyncSession,
 ) -> WhitelistCheckResponse:
     """Check URLs: whitelist trước, sau đó blacklist, cuối cùng là warning"""
-    normalizer = URLNormalizer()
-    results = []
-    
-    for url in payload.urls:
-        normalized = normalizer.normalize(url)
-        if not normalized:
-            results.append(URLWhitelistMatchResult(
-                original_url=url,
-                normalized_url="",
-                is_trusted=False,
-                match_type=None,
-                whitelist_entry_id=None,
-                matched_pattern=None,
-                reason="URL không hợp lệ"
-            ))
-            continue
-        
-        # Extract domain
-        domain = normalized.split("/")[0]
-        
-        # 1. Check whitelist trước
-        whitelist_result = await session.execute(
-            select(WhiteListURL).where(WhiteListURL.domain == domain)
-        )
-        whitelist_entry = whitelist_result.scalar_one_or_none()
-        
-        if whitelist_entry:
-            results.append(URLWhitelistMatchResult(
-                original_url=url,
-                normalized_url=normalized,
-                is_trusted=True,
-                match_type="whitelist",
-                whitelist_entry_id=whitelist_entry.id,
-                matched_pattern=domain,
-                reason="✅ URL này an toàn (có trong whitelist)"
-            ))
-            continue
-        
-        # 2. Check blacklist
-        blacklist_result = await session.execute(
-            select(BlackListURL).where(BlackListURL.domain == domain)
-        )
-        blacklist_entry = blacklist_result.scalar_one_or_none()
-        
-        if blacklist_entry:
-            results.append(URLWhitelistMatchResult(
-                original_url=url,
-                normalized_url=normalized,
-                is_trusted=False,
-                match_type="blacklist",
-                whitelist_entry_id=blacklist_entry.id,
-                matched_pattern=domain,
-                reason="⚠️ URL này đã bị báo cáo là lừa đảo"
-            ))
-            continue
-        
-        # 3. Không có ở cả 2
-        results.append(URLWhitelistMatchResult(
-            original_url=url,
-            normalized_url=normalized,
-            is_trusted=False,
-            match_type="unknown",
-            whitelist_entry_id=None,
-            matched_pattern=None,
-            reason="⚠️ URL này chưa có trong hệ thống, hãy cẩn thận vì chưa được xác nhận"
-        ))
-    
+    verdict_service = URLVerdictService(session=session)
+    results = await verdict_service.check_urls(payload.urls)
     return WhitelistCheckResponse(results=results)
 
 
@@ -141,6 +74,7 @@ async def create_whitelist_url(
     )
     session.add(entry)
     await session.commit()
+    domain_snapshot_cache.invalidate()
     await session.refresh(entry)
     return entry
 
@@ -166,6 +100,7 @@ async def update_whitelist_url(
     
     session.add(entry)
     await session.commit()
+    domain_snapshot_cache.invalidate()
     await session.refresh(entry)
     return entry
 
@@ -183,3 +118,4 @@ async def delete_whitelist_url(
 
     await session.delete(entry)
     await session.commit()
+    domain_snapshot_cache.invalidate()
@@ -68,6 +68,104 @@ class Settings(BaseSettings):
     ]
     WHITELIST_TRACKING_PREFIXES: List[str] = ["aff_", "fb_"]
     WHITELIST_KEEP_PARAMS: List[str] = ["id", "product_id", "page", "category", "q", "s"]
+    # Nhà cung cấp hosting dùng chung (trang của người dùng nằm dưới domain của họ):
+    # URL bị báo cáo trên các domain này được blacklist theo host, không theo registrable domain
+    URL_SHARED_HOSTING_DOMAINS: List[str] = [
+        "google.com",
+        "googleusercontent.com",
+        "forms.gle",
+        "firebaseapp.com",
+        "web.app",
+        "blogspot.com",
+        "wordpress.com",
+        "wixsite.com",
+        "weebly.com",
+        "github.io",
+        "netlify.app",
+        "vercel.app",
+        "pages.dev",
+        "herokuapp.com",
+        "000webhostapp.com",
+        "notion.site",
+        "my.canva.site",
+        "glitch.me",
+    ]
+    # Chu kỳ (giây) kiểm tra thay đổi của snapshot whitelist/blacklist trong bộ nhớ
+    DOMAIN_SNAPSHOT_PROBE_SECONDS: float = 30.0
+    # Số URL tối đa giữ trong LRU cache của URLNormalizer (0 = tắt cache)
+    URL_NORMALIZER_CACHE_SIZE: int = 4096
+    # Chu kỳ (giây) kiểm tra thay đổi của tập SĐT blacklist trong bộ nhớ
+    PHONE_BLACKLIST_PROBE_SECONDS: float = 30.0
+    # Tỉ lệ dương tính giả của bloom filter đứng trước tập SĐT blacklist
+    PHONE_BLOOM_ERROR_RATE: float = 0.01
+
+    # Tắt OCR để chạy node "lookup-only" (không import torch/transformers)
+    OCR_ENABLED: bool = True
+    # Nạp sẵn model OCR khi app khởi động thay vì đợi request đầu tiên
+    OCR_WARMUP_ON_STARTUP: bool = False
+    OCR_MODEL_NAME: str = "5CD-AI/Vintern-1B-v3_5"
+    OCR_USE_GPU: bool = False
+    # Độ chính xác khi chạy trên CPU: fp32 | bf16 | int8 (int8 = dynamic quantization các lớp Linear)
+    OCR_CPU_PRECISION: str = "fp32"
+    # Nạp weight một lần trong process cha của gunicorn (preload_app), các worker fork
+    # ra dùng chung trang nhớ copy-on-write (xem gunicorn.conf.py)
+    OCR_SHARED_WEIGHTS: bool = False
+    # OCR inference chạy trong thread pool riêng, không chặn event loop
+    OCR_WORKERS: int = 1
+    # Số job OCR được phép chờ thêm khi mọi worker đều bận, vượt quá trả về 429
+    OCR_MAX_QUEUE: int = 8
+    # Số thread intra-op của torch (None = mặc định của torch)
+    OCR_TORCH_THREADS: Optional[int] = None
+    # Profile OCR mặc định: fast | balanced | accurate | adaptive
+    OCR_PROFILE: str = "accurate"
+    # Micro-batching: số ảnh tối đa mỗi batch và thời gian chờ gom batch (ms)
+    OCR_BATCH_MAX_SIZE: int = 4
+    OCR_BATCH_WAIT_MS: float = 15.0
+    # Cache kết quả OCR theo hash nội dung ảnh (0 = tắt tầng bộ nhớ)
+    OCR_CACHE_SIZE: int = 512
+    # File SQLite cho tầng cache trên đĩa (None = chỉ cache trong bộ nhớ)
+    OCR_CACHE_SQLITE_PATH: Optional[str] = None
+    # Giới hạn tầng SQLite: số dòng tối đa và tuổi tối đa (giây) của kết quả (0 = không
+    # giới hạn); dòng cũ nhất theo `created` bị xoá khi vượt
+    OCR_CACHE_SQLITE_MAX_ROWS: int = 50000
+    OCR_CACHE_SQLITE_TTL_SECONDS: float = 30 * 24 * 3600
+    # Bật perceptual hash để bắt bản re-encode của cùng ảnh (có thể trùng giữa ảnh rất giống nhau)
+    OCR_CACHE_PERCEPTUAL: bool = False
+    # Timeout mỗi lần gọi Gemini (giây), request quá hạn bị huỷ và dùng kết quả fallback
+    GEMINI_TIMEOUT_SECONDS: float = 20.0
+    # /classify/batch: số tin nhắn gộp trong một lần gọi Gemini, số lần gọi song song tối đa
+    # và timeout mỗi lần gọi (giây)
+    GEMINI_BATCH_SIZE: int = 20
+    GEMINI_BATCH_CONCURRENCY: int = 4
+    GEMINI_BATCH_TIMEOUT_SECONDS: float = 60.0
+    # Ngân sách token (ước lượng) cho nội dung tin nhắn trong prompt Gemini (một tin / mỗi tin
+    # trong prompt gộp); tin dài hơn được rút gọn, giữ đầu, cuối và đoạn quanh URL/số điện thoại
+    GEMINI_PROMPT_TEXT_TOKENS: int = 384
+    GEMINI_BATCH_PROMPT_TEXT_TOKENS: int = 256
+    # Đưa phần hướng dẫn cố định của prompt vào context cache của Gemini (model phải hỗ trợ
+    # và hướng dẫn phải đủ số token tối thiểu, nếu không sẽ tự dùng system_instruction)
+    GEMINI_CONTEXT_CACHE: bool = False
+    GEMINI_CONTEXT_CACHE_TTL_SECONDS: int = 3600
+    # Mô hình phân loại cục bộ (TF-IDF + logistic regression) chạy trước Gemini;
+    # chỉ các trường hợp có độ tin cậy dưới ngưỡng mới gọi Gemini. Tắt mặc định: artifact
+    # hiện tại huấn luyện trên dữ liệu theo mẫu, chỉ bật sau khi kiểm tra độ tin cậy trên
+    # tin nhắn thật (python -m app.services.local_classifier_training --holdout ...)
+    LOCAL_CLASSIFIER_ENABLED: bool = False
+    # Artifact .npz (mặc định data/models/scam_classifier.npz)
+    LOCAL_CLASSIFIER_PATH: Optional[str] = None
+    LOCAL_CLASSIFIER_CONFIDENCE: float = 0.9
+    # Tỉ lệ n-gram tối thiểu nằm trong từ vựng của mô hình; text lạ hơn luôn được gửi Gemini
+    LOCAL_CLASSIFIER_MIN_COVERAGE: float = 0.97
+    # Cache kết quả phân loại của Gemini (0 = tắt), TTL tính bằng giây
+    CLASSIFICATION_CACHE_SIZE: int = 4096
+    CLASSIFICATION_CACHE_TTL_SECONDS: float = 6 * 3600
+    # Ngưỡng tương đồng (MinHash) để dùng lại kết quả của tin nhắn gần trùng (0 = chỉ cache exact)
+    CLASSIFICATION_CACHE_NEAR_DUPLICATE_THRESHOLD: float = 0.75
+    # Timeout từng nhánh của pipeline phân tích text (giây): tra DB URL/số điện thoại và LLM
+    PIPELINE_DB_TIMEOUT_SECONDS: float = 5.0
+    PIPELINE_LLM_TIMEOUT_SECONDS: float = 30.0
+    # Đường dẫn Public Suffix List (mặc định dùng bản đóng gói trong app/data)
+    PUBLIC_SUFFIX_LIST_PATH: Optional[str] = None
     # Crawler đã được thay thế bằng Airflow (xem airflow-crawler/)
 
 
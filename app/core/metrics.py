@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import os
+import resource
+import time
+from typing import Callable, Dict, Optional
+
+# Mốc thời gian khi process bắt đầu nạp app (module này được import rất sớm)
+_process_started_at = time.monotonic()
+_ready_at: Optional[float] = None
+
+_stats_providers: Dict[str, Callable[[], dict]] = {}
+
+
+def register_stats(name: str, provider: Callable[[], dict]) -> None:
+    """Đăng ký một nguồn số liệu để hiển thị trên endpoint /health"""
+    _stats_providers[name] = provider
+
+
+def collect_stats() -> Dict[str, dict]:
+    return {name: provider() for name, provider in _stats_providers.items()}
+
+
+def mark_ready() -> None:
+    global _ready_at
+    if _ready_at is None:
+        _ready_at = time.monotonic()
+
+
+def startup_seconds() -> Optional[float]:
+    """Thời gian cold start: từ lúc import app đến khi sự kiện startup chạy xong"""
+    if _ready_at is None:
+        return None
+    return round(_ready_at - _process_started_at, 3)
+
+
+def current_rss_bytes() -> Optional[int]:
+    """RSS hiện tại của process (Linux: /proc/self/statm), fallback về peak RSS"""
+    try:
+        with open("/proc/self/statm") as handle:
+            return int(handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
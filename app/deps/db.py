@@ -1,6 +1,7 @@
 from typing import Annotated
 
-from fastapi import Depends
+from fastapi import Depends, HTTPException, status
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio.session import AsyncSession
 
 from app.db import async_session_maker
@@ -13,3 +14,15 @@ async def get_async_session():
 
 
 CurrentAsyncSession = Annotated[AsyncSession, Depends(get_async_session)]
+
+
+async def commit_or_conflict(session: AsyncSession, detail: str) -> None:
+    """
+    Commit, đổi lỗi vi phạm unique index thành 409 thay vì 500. Kiểm tra trùng trước khi
+    insert không đủ: hai request đồng thời cùng qua bước kiểm tra, request sau sẽ lỗi ở đây.
+    """
+    try:
+        await session.commit()
+    except IntegrityError:
+        await session.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=detail)
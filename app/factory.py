@@ -1,3 +1,5 @@
+import asyncio
+
 from fastapi import FastAPI
 from fastapi.routing import APIRoute
 from fastapi.staticfiles import StaticFiles
@@ -9,6 +11,7 @@ from starlette.responses import FileResponse
 from app.api import api_router
 from app.core.config import settings
 from app.core.logger import logger
+from app.core.metrics import mark_ready
 from app.deps.users import fastapi_users, jwt_authentication
 from app.schemas.user import UserCreate, UserRead, UserUpdate
 
@@ -23,6 +26,7 @@ def create_app():
         redoc_url=None,
     )
     setup_routers(app, fastapi_users)
+    setup_startup_hooks(app)
     setup_cors_middleware(app)
     serve_static_app(app)
     
@@ -80,6 +84,24 @@ def setup_routers(app: FastAPI, fastapi_users: FastAPIUsers) -> None:
     use_route_names_as_operation_ids(app)
 
 
+def setup_startup_hooks(app: FastAPI) -> None:
+    @app.on_event("startup")
+    async def _on_startup():
+        if settings.OCR_ENABLED and settings.OCR_WARMUP_ON_STARTUP:
+            from app.services.ocr_provider import ocr_provider
+
+            # Nạp model nền, app nhận request ngay; request OCR đầu tiên sẽ chờ lock nạp
+            app.state.ocr_warmup_task = asyncio.create_task(ocr_provider.warmup())
+        mark_ready()
+        logger.info("Application startup complete")
+
+    @app.on_event("shutdown")
+    async def _on_shutdown():
+        from app.services.gemini_explanation_service import close_gemini_service
+
+        await close_gemini_service()
+
+
 def serve_static_app(app):
     app.mount("/", StaticFiles(directory="static"), name="static")
 
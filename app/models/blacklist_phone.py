@@ -21,7 +21,7 @@ class BlackListPhone(Base):
         DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
     )
 
-    value: Mapped[Optional[str]]
+    value: Mapped[Optional[str]] = mapped_column(String, nullable=True, unique=True, index=True)
     description: Mapped[Optional[str]] = mapped_column(String, nullable=True)
 
     report_id: Mapped[Optional[int]] = mapped_column(
@@ -1,7 +1,7 @@
-from datetime import date
+from datetime import date, datetime
 from typing import Optional
 from sqlalchemy.orm import Mapped, mapped_column
-from sqlalchemy import Date, String, Integer
+from sqlalchemy import Date, DateTime, String, Integer, func
 
 from app.db import Base
 
@@ -15,6 +15,10 @@ class WhiteListURL(Base):
     first_seen: Mapped[date] = mapped_column(Date, nullable=False)
     last_seen: Mapped[date] = mapped_column(Date, nullable=False)
     source: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    # Bump ở mọi UPDATE (trigger trong DB) để DomainSnapshotCache phát hiện dòng bị sửa
+    updated: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
 
     def __repr__(self) -> str:
         return f"WhiteListURL(id={self.id}, domain={self.domain!r}, source={self.source!r})"
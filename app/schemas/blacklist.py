@@ -1,5 +1,5 @@
-from pydantic import BaseModel, ConfigDict
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, Field
+from typing import List, Optional
 from datetime import datetime
 from uuid import UUID
 
@@ -20,6 +20,22 @@ class BlackListPhoneOut(BaseModel):
     updated: datetime
 
 
+class PhoneBatchSearchRequest(BaseModel):
+    values: List[str] = Field(..., min_length=1, max_length=1000)
+
+
+class PhoneSearchResult(BaseModel):
+    value: str
+    normalized_value: str
+    status: str
+    message: str
+    found: bool
+
+
+class PhoneBatchSearchResponse(BaseModel):
+    results: List[PhoneSearchResult]
+
+
 class BlackListURLCreate(BaseModel):
     domain: str
     description: Optional[str] = None
@@ -1,6 +1,7 @@
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict
 
+from app.schemas.blacklist import PhoneSearchResult
 from app.schemas.whitelist import URLWhitelistMatchResult
 
 class ScamClassification(BaseModel):
@@ -11,6 +12,8 @@ class ScamClassification(BaseModel):
     recommendations: str = ""  # Nên làm gì trong trường hợp lừa đảo này (nếu có)
     why_not_scam: str = ""  # Vì sao không lừa đảo (nếu không lừa đảo)
     conversation_topic: str = ""  # Đây là cuộc trò chuyện về gì (nếu không lừa đảo)
+    confidence: Optional[float] = None  # Độ tin cậy (khi kết quả đến từ mô hình cục bộ)
+    source: Optional[str] = None  # "local_model" nếu không cần gọi Gemini
 
 class TextExtractionResponse(BaseModel):
     """Response schema cho text extraction từ ảnh"""
@@ -22,5 +25,23 @@ class TextExtractionResponse(BaseModel):
     cleaning_stats: dict
     classification: Optional[ScamClassification] = None  # Kết quả phân loại từ Gemini
     whitelist_results: List[URLWhitelistMatchResult] = Field(default_factory=list)
+    phone_results: List[PhoneSearchResult] = Field(default_factory=list)  # Số điện thoại có trong blacklist không
     verdict_summary: str = ""  # Thông điệp tự nhiên để hiển thị ra UI
 
+
+class BatchClassifyRequest(BaseModel):
+    """Danh sách tin nhắn cần phân loại (ví dụ export SMS/Zalo)"""
+    texts: List[str] = Field(..., min_length=1, max_length=5000)
+
+
+class BatchClassifyResult(BaseModel):
+    index: int  # Vị trí trong `texts` gửi lên
+    detected_urls: List[str] = Field(default_factory=list)
+    detected_phones: List[str] = Field(default_factory=list)
+    classification: Optional[ScamClassification] = None
+    source: str  # cache | local_model | gemini | fallback | empty | unavailable
+
+
+class BatchClassifyResponse(BaseModel):
+    results: List[BatchClassifyResult]  # Cùng thứ tự với `texts`
+    stats: Dict[str, int] = Field(default_factory=dict)
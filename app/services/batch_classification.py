@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.services.classification_cache import classification_cache, exact_key
+from app.services.gemini_explanation_service import GeminiExplanationService
+from app.services.local_classifier import local_classification, local_classifier
+from app.services.text_cleaning import TextCleaner
+
+logger = logging.getLogger(__name__)
+
+text_cleaner = TextCleaner()
+
+
+@dataclass
+class _UniqueMessage:
+    text: str
+    urls: List[str]
+    phones: List[str]
+    classification: Optional[dict] = None
+    source: str = ""
+    positions: List[int] = field(default_factory=list)
+
+
+class BatchClassifier:
+    """
+    Phân loại nhiều tin nhắn một lượt:
+    1. Làm sạch, trích xuất URL/số điện thoại và gộp các tin nhắn trùng nhau
+    2. Trả lời từ cache phân loại hoặc mô hình cục bộ khi đủ tin cậy
+    3. Phần còn lại gộp thành các prompt nhiều tin nhắn gửi Gemini, tối đa
+       `concurrency` lần gọi song song; tin nhắn Gemini không trả lời được dùng fallback
+    """
+
+    def __init__(
+        self,
+        service: Optional[GeminiExplanationService],
+        batch_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        timeout_seconds: Optional[float] = None,
+    ):
+        self.service = service
+        self.batch_size = max(1, batch_size or settings.GEMINI_BATCH_SIZE)
+        self.concurrency = max(1, concurrency or settings.GEMINI_BATCH_CONCURRENCY)
+        self.timeout_seconds = timeout_seconds or settings.GEMINI_BATCH_TIMEOUT_SECONDS
+        self.cache = service.cache if service is not None else classification_cache
+
+    async def classify(self, texts: Sequence[str]) -> Tuple[List[dict], Dict[str, int]]:
+        """Trả về (kết quả theo đúng thứ tự `texts`, thống kê theo nguồn)"""
+        # Làm sạch + tra cache + mô hình cục bộ là việc CPU, chạy ngoài event loop
+        messages = await asyncio.to_thread(self._prepare, texts)
+
+        pending = [message for message in messages if not message.source]
+        gemini_calls = await self._classify_with_gemini(pending) if pending else 0
+
+        results: List[Optional[dict]] = [None] * len(texts)
+        stats: Dict[str, int] = {"total": len(texts), "unique": len(messages), "gemini_calls": gemini_calls}
+        for message in messages:
+            stats[message.source] = stats.get(message.source, 0) + 1
+            for position in message.positions:
+                results[position] = {
+                    "index": position,
+                    "detected_urls": message.urls,
+                    "detected_phones": message.phones,
+                    "classification": message.classification,
+                    "source": message.source,
+                }
+        return results, stats
+
+    def _prepare(self, texts: Sequence[str]) -> List[_UniqueMessage]:
+        messages: List[_UniqueMessage] = []
+        by_key: Dict[str, _UniqueMessage] = {}
+        for position, raw_text in enumerate(texts):
+            cleaned = text_cleaner.preserve_vietnamese_accents(text_cleaner.clean_text(raw_text or ""))
+            urls = text_cleaner.extract_urls(cleaned)
+            phones = text_cleaner.extract_phones(cleaned)
+            key = exact_key(cleaned, urls, phones)
+            message = by_key.get(key)
+            if message is None:
+                message = _UniqueMessage(text=cleaned, urls=urls, phones=phones)
+                by_key[key] = message
+                messages.append(message)
+                self._answer_locally(message)
+            message.positions.append(position)
+        return messages
+
+    def _answer_locally(self, message: _UniqueMessage) -> None:
+        if not message.text.strip():
+            message.source = "empty"
+            return
+
+        cached = self.cache.lookup(message.text, message.urls, message.phones)
+        if cached is not None:
+            message.source, message.classification = "cache", cached
+            return
+
+        verdict = local_classifier.predict(message.text)
+        if verdict is not None:
+            local_classifier.record(verdict)
+            if verdict.confident:
+                message.source = "local_model"
+                message.classification = local_classification(verdict, message.urls, message.phones)
+
+    async def _classify_with_gemini(self, pending: List[_UniqueMessage]) -> int:
+        """Gửi các tin nhắn còn lại theo từng nhóm; trả về số lần gọi Gemini"""
+        if self.service is None or not self.service.client:
+            for message in pending:
+                self._fallback(message)
+            return 0
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        chunks = [pending[i:i + self.batch_size] for i in range(0, len(pending), self.batch_size)]
+
+        async def run_chunk(chunk: List[_UniqueMessage]) -> None:
+            async with semaphore:
+                classifications = await self.service.aclassify_many(
+                    [(message.text, message.urls, message.phones) for message in chunk],
+                    timeout=self.timeout_seconds,
+                )
+            for message, classification in zip(chunk, classifications):
+                if classification is None:
+                    self._fallback(message)
+                else:
+                    message.source, message.classification = "gemini", classification
+
+        await asyncio.gather(*(run_chunk(chunk) for chunk in chunks))
+        logger.info(f"Batch classification: {len(pending)} messages sent to Gemini in {len(chunks)} calls")
+        return len(chunks)
+
+    def _fallback(self, message: _UniqueMessage) -> None:
+        if self.service is None:
+            message.source, message.classification = "unavailable", None
+            return
+        classification = self.service.fallback_classification(message.urls, message.phones, message.text)
+        message.source = classification.get("source") or "fallback"
+        message.classification = classification
@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.metrics import register_stats
+from app.services.text_normalization import mask_variables, normalize_text
+
+# MinHash: hash tuyến tính (a*x + b) mod p, p nguyên tố Mersenne 2^31-1 để a*x không tràn uint64
+_MERSENNE_PRIME = np.uint64((1 << 31) - 1)
+
+
+def exact_key(text: str, urls: Sequence[str] = (), phones: Sequence[str] = ()) -> str:
+    """Key tầng exact: hash của text đã chuẩn hoá cùng tập URL và số điện thoại"""
+    payload = json.dumps(
+        [normalize_text(text), sorted(set(urls or ())), sorted(set(phones or ()))],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def shingles(text: str, size: int = 5) -> np.ndarray:
+    """
+    Tập shingle ký tự (crc32) của text. Link được thay bằng "<url>" và chữ số được gộp
+    thành "0" để các bản chỉ khác đường link, số tiền, số tài khoản, số điện thoại vẫn có
+    tập shingle gần như trùng nhau.
+    """
+    text = mask_variables(normalize_text(text))
+    if len(text) <= size:
+        grams = {text} if text else set()
+    else:
+        grams = {text[i:i + size] for i in range(len(text) - size + 1)}
+    return np.fromiter(
+        (zlib.crc32(gram.encode("utf-8")) for gram in grams), dtype=np.uint64, count=len(grams)
+    ) % _MERSENNE_PRIME
+
+
+class MinHasher:
+    """Chữ ký MinHash độ dài `num_perm`; tỉ lệ vị trí trùng nhau ước lượng độ tương đồng Jaccard"""
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = np.random.RandomState(seed)
+        prime = int(_MERSENNE_PRIME)
+        self.num_perm = num_perm
+        self._a = rng.randint(1, prime, size=num_perm).astype(np.uint64)
+        self._b = rng.randint(0, prime, size=num_perm).astype(np.uint64)
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        values = shingles(text)
+        if values.size == 0:
+            return None
+        hashed = (np.outer(self._a, values) + self._b[:, None]) % _MERSENNE_PRIME
+        return hashed.min(axis=1)
+
+    @staticmethod
+    def similarity(left: np.ndarray, right: np.ndarray) -> float:
+        return float(np.mean(left == right))
+
+
+@dataclass
+class _NearEntry:
+    signature: np.ndarray
+    classification: dict
+    expires_at: Optional[float]
+
+
+class NearDuplicateIndex:
+    """
+    Index LSH trên chữ ký MinHash: chia chữ ký thành `bands` dải, hai text trùng ít nhất
+    một dải là ứng viên, sau đó mới so độ tương đồng đầy đủ với ngưỡng.
+    Giới hạn số phần tử theo LRU, phần tử quá TTL bị bỏ qua và xoá khi gặp.
+    """
+
+    def __init__(self, maxsize: int, ttl_seconds: Optional[float], threshold: float,
+                 num_perm: int = 64, bands: int = 16):
+        assert num_perm % bands == 0
+        self.maxsize = max(0, maxsize)
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm)
+        self._entries: "OrderedDict[int, _NearEntry]" = OrderedDict()
+        self._buckets: Dict[Tuple[int, bytes], Set[int]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def _band_keys(self, signature: np.ndarray) -> List[Tuple[int, bytes]]:
+        return [
+            (band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
+
+    def _remove(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        for key in self._band_keys(entry.signature):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def lookup(self, signature: np.ndarray) -> Optional[Tuple[dict, float]]:
+        """Trả về (classification, similarity) của phần tử giống nhất vượt ngưỡng"""
+        now = time.monotonic()
+        with self._lock:
+            candidates = set()
+            for key in self._band_keys(signature):
+                candidates |= self._buckets.get(key, set())
+
+            best_id, best_similarity = None, 0.0
+            for entry_id in candidates:
+                entry = self._entries[entry_id]
+                if entry.expires_at is not None and entry.expires_at <= now:
+                    self._remove(entry_id)
+                    self.expirations += 1
+                    continue
+                similarity = MinHasher.similarity(signature, entry.signature)
+                if similarity >= self.threshold and similarity > best_similarity:
+                    best_id, best_similarity = entry_id, similarity
+
+            if best_id is None:
+                return None
+            self._entries.move_to_end(best_id)
+            return self._entries[best_id].classification, best_similarity
+
+    def add(self, signature: np.ndarray, classification: dict) -> None:
+        if self.maxsize == 0:
+            return
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = _NearEntry(signature, classification, expires_at)
+            for key in self._band_keys(signature):
+                self._buckets.setdefault(key, set()).add(entry_id)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class ClassificationCache:
+    """
+    Cache kết quả phân loại của Gemini hai tầng:
+    1. exact: hash text đã chuẩn hoá + URL + số điện thoại
+    2. near-duplicate: MinHash/LSH, bắt các bản sao kịch bản lừa đảo chỉ khác tên,
+       số tiền hay đường link (tắt khi threshold <= 0)
+    Chỉ nên lưu kết quả thật từ Gemini, không lưu kết quả fallback.
+    """
+
+    def __init__(
+        self,
+        maxsize: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+        near_duplicate_threshold: Optional[float] = None,
+    ):
+        maxsize = settings.CLASSIFICATION_CACHE_SIZE if maxsize is None else maxsize
+        ttl_seconds = settings.CLASSIFICATION_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        threshold = (
+            settings.CLASSIFICATION_CACHE_NEAR_DUPLICATE_THRESHOLD
+            if near_duplicate_threshold is None else near_duplicate_threshold
+        )
+        self._exact: LRUCache[str, dict] = LRUCache(maxsize, ttl_seconds=ttl_seconds)
+        self._near = NearDuplicateIndex(maxsize, ttl_seconds, threshold) if threshold > 0 else None
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    def lookup(self, text: str, urls: Sequence[str] = (), phones: Sequence[str] = ()) -> Optional[dict]:
+        cached = self._exact.get(exact_key(text, urls, phones))
+        if cached is not None:
+            self.exact_hits += 1
+            return copy.deepcopy(cached)
+
+        if self._near is not None:
+            signature = self._near.hasher.signature(text)
+            hit = self._near.lookup(signature) if signature is not None else None
+            if hit is not None:
+                self.near_hits += 1
+                return copy.deepcopy(hit[0])
+
+        self.misses += 1
+        return None
+
+    def store(self, text: str, urls: Sequence[str], phones: Sequence[str], classification: dict) -> None:
+        classification = copy.deepcopy(classification)
+        self._exact.set(exact_key(text, urls, phones), classification)
+        if self._near is not None:
+            signature = self._near.hasher.signature(text)
+            if signature is not None:
+                self._near.add(signature, classification)
+
+    def clear(self) -> None:
+        self._exact.clear()
+        if self._near is not None:
+            self._near.clear()
+
+    def stats(self) -> dict:
+        lookups = self.exact_hits + self.near_hits + self.misses
+        exact = self._exact.stats()
+        return {
+            "size": exact["size"],
+            "maxsize": exact["maxsize"],
+            "exact_hits": self.exact_hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.exact_hits + self.near_hits) / lookups, 4) if lookups else 0.0,
+            "evictions": exact["evictions"],
+            "expirations": exact["expirations"],
+            "near_duplicate_enabled": self._near is not None,
+            "near_duplicate_size": len(self._near) if self._near is not None else 0,
+        }
+
+
+classification_cache = ClassificationCache()
+register_stats("classification_cache", classification_cache.stats)
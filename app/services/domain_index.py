@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, Generic, Iterable, Iterator, List, Mapping, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+def normalize_domain(domain: str) -> str:
+    """Chuẩn hoá domain/hostname để dùng làm key tra cứu (lower, bỏ www. và dấu chấm cuối)"""
+    value = (domain or "").strip().lower().rstrip(".")
+    if value.startswith("www."):
+        value = value[4:]
+    return value
+
+
+def candidate_suffixes(host: str) -> List[str]:
+    """
+    Sinh các domain cha của host, từ dài nhất đến ngắn nhất.
+
+    Ví dụ: a.b.c.vn → [a.b.c.vn, b.c.vn, c.vn, vn]
+    """
+    host = normalize_domain(host)
+    if not host:
+        return []
+
+    suffixes = [host]
+    start = host.find(".")
+    while start != -1:
+        suffixes.append(host[start + 1:])
+        start = host.find(".", start + 1)
+    return suffixes
+
+
+@dataclass(frozen=True)
+class DomainHit(Generic[T]):
+    value: T
+    domain: str
+    exact: bool
+
+
+def match_host(host: str, entries: Mapping[str, T]) -> Optional[DomainHit[T]]:
+    """
+    Bộ so khớp dùng chung: tìm domain dài nhất trong `entries` khớp với host.
+
+    `entries` là mapping domain đã normalize → giá trị. Mọi đường kiểm tra URL đều đi
+    qua đây (qua DomainIndex của snapshot) nên cho cùng một kết luận.
+    """
+    for position, suffix in enumerate(candidate_suffixes(host)):
+        value = entries.get(suffix)
+        if value is not None:
+            return DomainHit(value=value, domain=suffix, exact=position == 0)
+    return None
+
+
+class DomainIndex(Generic[T]):
+    """
+    Index domain → giá trị, tra cứu exact/subdomain bằng các phép hash theo từng domain cha.
+
+    Chi phí một lần tra cứu là O(số label trong host), không phụ thuộc kích thước danh sách.
+    """
+
+    def __init__(self, items: Optional[Iterable[Tuple[str, T]]] = None):
+        self._entries: Dict[str, T] = {}
+        for domain, value in items or ():
+            self.add(domain, value)
+
+    def add(self, domain: str, value: T) -> None:
+        key = normalize_domain(domain)
+        if key:
+            # Giữ bản ghi đầu tiên nếu có nhiều dòng trùng domain sau khi normalize
+            self._entries.setdefault(key, value)
+
+    def get(self, domain: str) -> Optional[T]:
+        return self._entries.get(normalize_domain(domain))
+
+    def lookup(self, host: str) -> Optional[DomainHit[T]]:
+        """Tìm domain dài nhất trong index khớp với host (chính nó hoặc domain cha)"""
+        return match_host(host, self._entries)
+
+    def __contains__(self, domain: str) -> bool:
+        return normalize_domain(domain) in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
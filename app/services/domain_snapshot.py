@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.blacklist_url import BlackListURL
+from app.models.white_list_url import WhiteListURL
+from app.services.domain_index import DomainIndex
+
+
+@dataclass(frozen=True)
+class DomainRecord:
+    id: int
+    domain: str
+
+
+@dataclass(frozen=True)
+class DomainSnapshot:
+    whitelist: DomainIndex[DomainRecord]
+    blacklist: DomainIndex[DomainRecord]
+    version: Tuple
+    loaded_at: float = field(default_factory=time.time)
+
+
+class DomainSnapshotCache:
+    """
+    Snapshot chỉ-đọc của whitelist/blacklist domain, dùng chung trong cả process.
+
+    - Hot path chỉ đọc snapshot trong bộ nhớ, không query Postgres.
+    - Mỗi `probe_interval` giây mới chạy một query nhỏ (count/max id/max updated) để
+      phát hiện thay đổi từ process khác (worker khác, Airflow crawler). `updated` được
+      trigger trong DB bump ở mọi UPDATE nên dòng bị sửa tại chỗ cũng được phát hiện.
+    - Các endpoint ghi dữ liệu gọi `invalidate()` để lần đọc kế tiếp nạp lại ngay.
+    """
+
+    def __init__(self, probe_interval: Optional[float] = None):
+        self.probe_interval = (
+            settings.DOMAIN_SNAPSHOT_PROBE_SECONDS if probe_interval is None else probe_interval
+        )
+        self._snapshot: Optional[DomainSnapshot] = None
+        self._dirty = True
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def invalidate(self) -> None:
+        """Đánh dấu snapshot đã cũ, lần truy cập sau sẽ nạp lại từ database"""
+        self._dirty = True
+
+    def _is_fresh(self) -> bool:
+        return (
+            self._snapshot is not None
+            and not self._dirty
+            and time.monotonic() - self._checked_at < self.probe_interval
+        )
+
+    async def get(self, session: AsyncSession) -> DomainSnapshot:
+        if self._is_fresh():
+            return self._snapshot
+
+        async with self._lock:
+            # Request khác có thể đã refresh trong lúc chờ lock
+            if self._is_fresh():
+                return self._snapshot
+
+            version = await self._probe_version(session)
+            if self._dirty or self._snapshot is None or self._snapshot.version != version:
+                # Reset cờ trước khi nạp để invalidate() xảy ra trong lúc nạp không bị mất
+                self._dirty = False
+                self._snapshot = await self._load(session, version)
+            self._checked_at = time.monotonic()
+            return self._snapshot
+
+    async def _probe_version(self, session: AsyncSession) -> Tuple:
+        stmt = select(
+            select(func.count(WhiteListURL.id)).scalar_subquery(),
+            select(func.max(WhiteListURL.id)).scalar_subquery(),
+            select(func.max(WhiteListURL.updated)).scalar_subquery(),
+            select(func.count(BlackListURL.id)).scalar_subquery(),
+            select(func.max(BlackListURL.id)).scalar_subquery(),
+            select(func.max(BlackListURL.updated)).scalar_subquery(),
+        )
+        result = await session.execute(stmt)
+        return tuple(result.one())
+
+    async def _load(self, session: AsyncSession, version: Tuple) -> DomainSnapshot:
+        whitelist_rows = await session.execute(
+            select(WhiteListURL.id, WhiteListURL.domain).order_by(WhiteListURL.id)
+        )
+        blacklist_rows = await session.execute(
+            select(BlackListURL.id, BlackListURL.domain).order_by(BlackListURL.id)
+        )
+        return DomainSnapshot(
+            whitelist=DomainIndex(
+                (domain, DomainRecord(id=entry_id, domain=domain))
+                for entry_id, domain in whitelist_rows
+            ),
+            blacklist=DomainIndex(
+                (domain, DomainRecord(id=entry_id, domain=domain))
+                for entry_id, domain in blacklist_rows
+            ),
+            version=version,
+        )
+
+
+domain_snapshot_cache = DomainSnapshotCache()
@@ -1,151 +1,396 @@
 from google import genai
-from typing import Dict, List, Optional
+from google.genai import types
+from typing import Dict, List, Optional, Sequence, Tuple
+import asyncio
 import logging
 import os
 import json
 import re
+import threading
+import time
+
+from app.core.config import settings
+from app.services.classification_cache import ClassificationCache, classification_cache
+from app.services.gemini_prompt import (
+    PROMPT_INSTRUCTIONS,
+    build_batch_classification_prompt,
+    build_classification_prompt,
+    estimate_tokens,
+    prompt_stats,
+)
+from app.services.local_classifier import local_classification, local_classifier
 
 logger = logging.getLogger(__name__)
 
 class GeminiExplanationService:
     """Service để phân loại lừa đảo và giải thích bằng Google Gemini"""
-    
-    def __init__(self, api_key: Optional[str] = None, model_name: str = "gemini-2.5-flash"):
+
+    def __init__(self,
+                 api_key: Optional[str] = None,
+                 model_name: str = "gemini-2.5-flash",
+                 timeout_seconds: Optional[float] = None,
+                 cache: Optional[ClassificationCache] = None,
+                 context_cache_ttl_seconds: Optional[int] = None):
         """
         Initialize Gemini service với SDK mới
-        
+        Một client dùng chung cho mọi request: connection pool HTTP (sync và async)
+        được tái sử dụng.
+
         Args:
             api_key: Google AI API key
             model_name: Model name ("gemini-2.5-flash", "gemini-pro", "gemini-ultra")
+            timeout_seconds: Timeout mặc định cho mỗi lần gọi Gemini
+                (None = không giới hạn)
+            cache: Cache kết quả phân loại (mặc định dùng cache chung của process)
+            context_cache_ttl_seconds: Bật context caching cho phần hướng dẫn cố định
+                của prompt với TTL này (None = chỉ gửi qua system_instruction)
         """
         self.api_key = api_key or os.getenv("GEMINI_API_KEY")
         self.model_name = model_name
-        
+        self.timeout_seconds = timeout_seconds
+        self.cache = cache or classification_cache
+        self.context_cache_ttl_seconds = context_cache_ttl_seconds
+        self._context_caches: Dict[str, Tuple[str, float]] = {}
+        self._context_cache_failed = set()
+        self._context_cache_lock = threading.Lock()
+
         if not self.api_key:
-            logger.warning("No Gemini API key provided. Gemini service will be disabled.")
+            logger.warning(
+                "No Gemini API key provided. Gemini service will be disabled."
+            )
             self.client = None
         else:
             try:
-                self.client = genai.Client(api_key=self.api_key)
+                http_options = None
+                if timeout_seconds:
+                    # Timeout ở tầng HTTP (milliseconds) cho cả client sync và async
+                    http_options = types.HttpOptions(
+                        timeout=int(timeout_seconds * 1000)
+                    )
+                self.client = genai.Client(
+                    api_key=self.api_key, http_options=http_options
+                )
                 logger.info(f"Gemini client initialized with model: {model_name}")
             except Exception as e:
                 logger.error(f"Error initializing Gemini: {str(e)}", exc_info=True)
                 self.client = None
-    
-    def classify_and_explain(self,
-                           text: str,
-                           detected_urls: List[str] = None,
-                           detected_phones: List[str] = None) -> Dict:
-        """
-        Phân loại lừa đảo và tạo explanation bằng Gemini (một lần gọi)
-        
+
+    async def aclassify_and_explain(self,
+                                    text: str,
+                                    detected_urls: List[str] = None,
+                                    detected_phones: List[str] = None,
+                                    timeout: Optional[float] = None) -> Dict:
+        """
+        Phân loại lừa đảo và tạo explanation bằng Gemini (một lần gọi, client async
+        của SDK nên không chặn event loop). Quá `timeout` giây (mặc định
+        timeout_seconds của service) thì huỷ request và trả về fallback; caller huỷ
+        task thì request HTTP cũng bị huỷ theo.
+
         Args:
             text: Text cần phân loại
             detected_urls: List URL phát hiện được (optional)
             detected_phones: List số điện thoại phát hiện được (optional)
-            
+            timeout: Timeout cho lần gọi (giây)
+
         Returns:
             Dict với keys:
                 - is_scam: bool - Có lừa đảo không
                 - scam_points: List[str] - Các điểm lừa đảo (nếu có)
                 - scam_topic: str - Chủ đề lừa đảo (nếu có)
-                - recommendations: str - Nên làm gì trong trường hợp lừa đảo này (nếu có)
+                - recommendations: str - Nên làm gì trong trường hợp lừa đảo này
+                  (nếu có)
                 - why_not_scam: str - Vì sao không lừa đảo (nếu không lừa đảo)
-                - conversation_topic: str - Đây là cuộc trò chuyện về gì (nếu không lừa đảo)
+                - conversation_topic: str - Đây là cuộc trò chuyện về gì
+                  (nếu không lừa đảo)
         """
         if not self.client:
-            return self._fallback_classification(detected_urls, detected_phones)
-        
+            return self.fallback_classification(detected_urls, detected_phones, text)
+
         if not text or len(text.strip()) == 0:
-            return {
-                "is_scam": False,
-                "scam_points": [],
-                "scam_topic": "",
-                "recommendations": "",
-                "why_not_scam": "Không có text để phân tích.",
-                "conversation_topic": "Không xác định được"
-            }
-        
+            return self._empty_text_classification()
+
+        cached = self._cached_classification(text, detected_urls, detected_phones)
+        if cached is not None:
+            return cached
+
+        local = self._local_first_pass(text, detected_urls, detected_phones)
+        if local is not None:
+            return local
+
+        timeout = self.timeout_seconds if timeout is None else timeout
         try:
-            # Tạo prompt cho Gemini để phân loại và giải thích
-            prompt = self._create_classification_prompt(text, detected_urls, detected_phones)
-            
-            logger.info("Classifying and explaining with Gemini...")
-            
-            # Generate content với Gemini
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=prompt,
+            prompt = self._create_classification_prompt(
+                text, detected_urls, detected_phones
+            )
+
+            logger.info("Classifying and explaining with Gemini (async)...")
+
+            response = await asyncio.wait_for(
+                self._agenerate(prompt, "single", timeout), timeout
+            )
+            prompt_stats.record(
+                "single",
+                estimate_tokens(prompt),
+                getattr(response, 'usage_metadata', None),
+            )
+
+            response_text = self._response_text(response)
+            classification = self._parse_and_cache(
+                response_text, text, detected_urls, detected_phones
             )
-            
-            # Lấy text từ response
-            response_text = response.text.strip() if hasattr(response, 'text') else str(response).strip()
-            
-            # Parse response từ Gemini
-            classification = self._parse_gemini_response(response_text)
-            
-            logger.info(f"Classification result: {'lừa đảo' if classification['is_scam'] else 'không lừa đảo'}")
+
+            verdict = 'lừa đảo' if classification['is_scam'] else 'không lừa đảo'
+            logger.info(f"Classification result: {verdict}")
             return classification
-            
+
+        except asyncio.TimeoutError:
+            logger.warning(f"Gemini classification timed out after {timeout}s")
+            return self.fallback_classification(detected_urls, detected_phones, text)
         except Exception as e:
             logger.error(f"Error in Gemini classification: {str(e)}", exc_info=True)
-            return self._fallback_classification(detected_urls, detected_phones)
-    
+            return self.fallback_classification(detected_urls, detected_phones, text)
+
+    async def aclassify_many(self,
+                             items: Sequence[Tuple[str, List[str], List[str]]],
+                             timeout: Optional[float] = None) -> List[Optional[Dict]]:
+        """
+        Phân loại nhiều tin nhắn trong MỘT lần gọi Gemini (JSON array vào, JSON array
+        ra).
+        Không dùng cache/mô hình cục bộ - caller đã lọc trước.
+
+        Args:
+            items: Danh sách (text, detected_urls, detected_phones)
+            timeout: Timeout cho cả lần gọi (mặc định timeout_seconds của service)
+
+        Returns:
+            Classification theo đúng thứ tự `items`; None cho tin nhắn Gemini không trả
+            lời được (caller tự fallback). Kết quả hợp lệ được lưu vào cache.
+        """
+        if not self.client or not items:
+            return [None] * len(items)
+
+        timeout = self.timeout_seconds if timeout is None else timeout
+        try:
+            prompt = self._create_batch_classification_prompt(items)
+            logger.info(f"Classifying {len(items)} messages with one Gemini call...")
+            # Prompt nhiều tin nhắn cần lâu hơn timeout HTTP mặc định của client
+            response = await asyncio.wait_for(
+                self._agenerate(prompt, "batch", timeout), timeout
+            )
+            prompt_stats.record(
+                "batch",
+                estimate_tokens(prompt),
+                getattr(response, 'usage_metadata', None),
+            )
+            response_text = self._response_text(response)
+        except asyncio.TimeoutError:
+            logger.warning(f"Gemini batch classification timed out after {timeout}s")
+            return [None] * len(items)
+        except Exception as e:
+            logger.error(
+                f"Error in Gemini batch classification: {str(e)}", exc_info=True
+            )
+            return [None] * len(items)
+
+        results: List[Optional[Dict]] = [None] * len(items)
+        for index, data in self._parse_batch_response(response_text).items():
+            if 0 <= index < len(items):
+                text, detected_urls, detected_phones = items[index]
+                results[index] = self._normalize_classification(data)
+                self.cache.store(
+                    text, detected_urls or [], detected_phones or [], results[index]
+                )
+        missing = sum(result is None for result in results)
+        if missing:
+            logger.warning(
+                f"Gemini batch response missing {missing}/{len(items)} messages"
+            )
+        return results
+
+    async def aclose(self) -> None:
+        """Đóng connection pool của client (gọi khi app shutdown)"""
+        if self.client:
+            await self.client.aio.aclose()
+            self.client.close()
+
+    async def _agenerate(self, prompt: str, kind: str, timeout: Optional[float] = None):
+        """
+        Một lần gọi Gemini, kể cả bước lấy config (có thể phải tạo context cache):
+        caller bọc cả coroutine trong wait_for nên timeout tính cho toàn bộ.
+        """
+        config = await self._ageneration_config(kind, timeout)
+        return await self.client.aio.models.generate_content(
+            model=self.model_name,
+            contents=prompt,
+            config=config,
+        )
+
+    @staticmethod
+    def _response_text(response) -> str:
+        text = response.text if hasattr(response, 'text') else str(response)
+        return text.strip()
+
+    def _generation_config(
+        self, kind: str, timeout: Optional[float] = None
+    ) -> types.GenerateContentConfig:
+        """
+        Config cho một lần gọi: phần hướng dẫn cố định đi qua context cache nếu có, nếu
+        không thì qua system_instruction (prefix giống nhau giữa các request, Gemini có
+        thể cache ngầm)
+        """
+        config = {}
+        cache_name = self._context_cache_name(kind)
+        if cache_name:
+            config["cached_content"] = cache_name
+        else:
+            config["system_instruction"] = PROMPT_INSTRUCTIONS[kind]
+        if timeout:
+            config["http_options"] = types.HttpOptions(timeout=int(timeout * 1000))
+        return types.GenerateContentConfig(**config)
+
+    async def _ageneration_config(
+        self, kind: str, timeout: Optional[float] = None
+    ) -> types.GenerateContentConfig:
+        if self.context_cache_ttl_seconds:
+            # Có thể phải gọi API tạo cache (sync), chạy ngoài event loop
+            return await asyncio.to_thread(self._generation_config, kind, timeout)
+        return self._generation_config(kind, timeout)
+
+    def _context_cache_name(self, kind: str) -> Optional[str]:
+        """
+        Tên cached content còn hạn cho hướng dẫn `kind` (tạo mới khi hết hạn), None nếu
+        không dùng
+        """
+        if not self.context_cache_ttl_seconds or kind in self._context_cache_failed:
+            return None
+        with self._context_cache_lock:
+            now = time.monotonic()
+            entry = self._context_caches.get(kind)
+            if entry is not None and entry[1] > now:
+                return entry[0]
+            try:
+                ttl = self.context_cache_ttl_seconds
+                cached_content = self.client.caches.create(
+                    model=self.model_name,
+                    config=types.CreateCachedContentConfig(
+                        system_instruction=PROMPT_INSTRUCTIONS[kind],
+                        display_name=f"scam-classification-{kind}",
+                        ttl=f"{ttl}s",
+                    ),
+                )
+            except Exception as e:
+                # Thường do hướng dẫn ngắn hơn số token tối thiểu của model: không thử
+                # lại
+                logger.warning(
+                    f"Gemini context cache disabled for '{kind}' prompt: {str(e)}"
+                )
+                self._context_cache_failed.add(kind)
+                return None
+            # Làm mới sớm hơn hạn thật một chút để không gửi tên cache vừa hết hạn
+            self._context_caches[kind] = (cached_content.name, now + ttl * 0.9)
+            logger.info(
+                f"Gemini context cache created for '{kind}' prompt: "
+                f"{cached_content.name}"
+            )
+            return cached_content.name
+
+    def _cached_classification(self,
+                               text: str,
+                               detected_urls: List[str] = None,
+                               detected_phones: List[str] = None) -> Optional[Dict]:
+        """Tra cache (exact rồi near-duplicate) trước khi gọi Gemini"""
+        cached = self.cache.lookup(text, detected_urls or [], detected_phones or [])
+        if cached is not None:
+            logger.info("Classification served from cache")
+        return cached
+
+    def _local_first_pass(self,
+                          text: str,
+                          detected_urls: List[str] = None,
+                          detected_phones: List[str] = None) -> Optional[Dict]:
+        """Verdict của mô hình cục bộ nếu đủ tin cậy, None nếu cần hỏi Gemini"""
+        verdict = local_classifier.predict(text)
+        if verdict is None:
+            return None
+        local_classifier.record(verdict)
+        if not verdict.confident:
+            return None
+        logger.info(
+            f"Local classifier verdict (confidence {verdict.confidence:.3f}), "
+            "skipping Gemini"
+        )
+        return local_classification(verdict, detected_urls, detected_phones)
+
+    def _parse_and_cache(self,
+                         response_text: str,
+                         text: str,
+                         detected_urls: List[str] = None,
+                         detected_phones: List[str] = None) -> Dict:
+        """
+        Parse response; chỉ lưu cache khi Gemini trả JSON hợp lệ (không lưu kết quả
+        đoán)
+        """
+        classification = self._parse_json_classification(response_text)
+        if classification is None:
+            return self._classify_unparsed_response(response_text)
+        self.cache.store(
+            text, detected_urls or [], detected_phones or [], classification
+        )
+        return classification
+
+    def _empty_text_classification(self) -> Dict:
+        return {
+            "is_scam": False,
+            "scam_points": [],
+            "scam_topic": "",
+            "recommendations": "",
+            "why_not_scam": "Không có text để phân tích.",
+            "conversation_topic": "Không xác định được"
+        }
+
     def _create_classification_prompt(self,
                                      text: str,
                                      detected_urls: List[str] = None,
                                      detected_phones: List[str] = None) -> str:
-        """Tạo prompt cho Gemini để phân loại và giải thích"""
-        urls_str = ", ".join(detected_urls) if detected_urls else "Không có"
-        phones_str = ", ".join(detected_phones) if detected_phones else "Không có"
-        
-        prompt = f"""Bạn là chuyên gia phân tích tin nhắn lừa đảo. Hãy phân tích tin nhắn sau và trả lời CHỈ bằng JSON, không có text nào khác.
-
-Tin nhắn: "{text[:1000]}"
-
-Thông tin bổ sung:
-- URL phát hiện: {urls_str}
-- Số điện thoại phát hiện: {phones_str}
-
-QUAN TRỌNG: Trả lời CHỈ bằng JSON sau đây, không có text giải thích thêm:
-
-{{
-    "is_scam": false,
-    "scam_points": [],
-    "scam_topic": "",
-    "recommendations": "",
-    "why_not_scam": "Giải thích vì sao không lừa đảo",
-    "conversation_topic": "Mô tả cuộc trò chuyện này về gì"
-}}
-
-Nếu LỪA ĐẢO, trả về:
-{{
-    "is_scam": true,
-    "scam_points": ["điểm lừa đảo 1", "điểm lừa đảo 2"],
-    "scam_topic": "Chủ đề lừa đảo (ví dụ: lừa đảo tài chính, phishing, mạo danh)",
-    "recommendations": "Nên làm gì trong trường hợp này",
-    "why_not_scam": "",
-    "conversation_topic": ""
-}}
-
-Quy tắc phân tích:
-1. Quiz, câu hỏi giáo dục, thông báo chính thức → KHÔNG phải lừa đảo
-2. Chỉ đánh dấu lừa đảo nếu có: yêu cầu chuyển tiền, link đáng ngờ, mạo danh, lừa đảo tình cảm
-3. scam_points: danh sách các điểm cụ thể cho thấy lừa đảo
-4. scam_topic: chủ đề lừa đảo (ví dụ: "Lừa đảo tài chính", "Phishing", "Mạo danh ngân hàng")
-5. recommendations: lời khuyên cụ thể nên làm gì (ví dụ: "Không bấm vào link", "Không chuyển tiền")
-6. why_not_scam: giải thích rõ ràng vì sao không lừa đảo
-7. conversation_topic: mô tả cuộc trò chuyện này về gì (ví dụ: "Thông báo từ ngân hàng", "Câu hỏi quiz giáo dục")
-
-Trả lời CHỈ bằng JSON:"""
-        
-        return prompt
-    
-    def _parse_gemini_response(self, response_text: str) -> Dict:
-        """Parse response từ Gemini thành dict classification"""
+        """
+        Phần thay đổi của prompt cho Gemini (hướng dẫn cố định nằm trong
+        system_instruction)
+        """
+        return build_classification_prompt(text, detected_urls, detected_phones)
+
+    def _create_batch_classification_prompt(
+        self, items: Sequence[Tuple[str, List[str], List[str]]]
+    ) -> str:
+        """Prompt phân loại nhiều tin nhắn: input/output là JSON array, khớp theo id"""
+        return build_batch_classification_prompt(items)
+
+    def _parse_batch_response(self, response_text: str) -> Dict[int, Dict]:
+        """Parse JSON array Gemini trả về thành {id: object}; bỏ qua phần tử lỗi"""
+        start, end = response_text.find('['), response_text.rfind(']')
+        if start == -1 or end <= start:
+            logger.warning(
+                f"Gemini batch response is not a JSON array: {response_text[:200]}"
+            )
+            return {}
+        try:
+            data = json.loads(response_text[start:end + 1])
+        except json.JSONDecodeError as e:
+            logger.warning(f"Could not parse Gemini batch response as JSON: {e}")
+            return {}
+
+        parsed = {}
+        for entry in data if isinstance(data, list) else []:
+            if isinstance(entry, dict) and isinstance(entry.get('id'), int):
+                parsed.setdefault(entry['id'], entry)
+        return parsed
+
+    def _parse_json_classification(self, response_text: str) -> Optional[Dict]:
+        """Parse JSON classification trong response, None nếu không phải JSON hợp lệ"""
         try:
             # Tìm JSON trong response (có thể có text thêm trước/sau)
-            json_matches = list(re.finditer(r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}', response_text, re.DOTALL))
+            json_matches = list(re.finditer(
+                r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}', response_text, re.DOTALL
+            ))
             if json_matches:
                 # Lấy JSON block lớn nhất
                 json_match = max(json_matches, key=lambda m: len(m.group(0)))
@@ -154,78 +399,106 @@ Trả lời CHỈ bằng JSON:"""
             else:
                 # Nếu không tìm thấy JSON, thử parse toàn bộ response
                 data = json.loads(response_text.strip())
-            
-            # Validate và normalize
-            is_scam = bool(data.get('is_scam', False))
-            scam_points = data.get('scam_points', [])
-            scam_topic = str(data.get('scam_topic', ''))
-            recommendations = str(data.get('recommendations', ''))
-            why_not_scam = str(data.get('why_not_scam', ''))
-            conversation_topic = str(data.get('conversation_topic', ''))
-            
-            # Đảm bảo scam_points là list
-            if not isinstance(scam_points, list):
-                scam_points = []
-            
-            # Đảm bảo các field string không rỗng nếu cần
-            if is_scam:
-                if not scam_topic:
-                    scam_topic = "Lừa đảo"
-                if not recommendations:
-                    recommendations = "Hãy cẩn thận và không thực hiện các yêu cầu trong tin nhắn."
-            else:
-                if not why_not_scam:
-                    why_not_scam = "Tin nhắn này không có dấu hiệu lừa đảo rõ ràng."
-                if not conversation_topic:
-                    conversation_topic = "Không xác định được"
-            
-            return {
-                "is_scam": is_scam,
-                "scam_points": scam_points,
-                "scam_topic": scam_topic,
-                "recommendations": recommendations,
-                "why_not_scam": why_not_scam,
-                "conversation_topic": conversation_topic
-            }
-            
+
+            return self._normalize_classification(data)
+
         except (json.JSONDecodeError, KeyError, ValueError) as e:
             logger.warning(f"Could not parse Gemini response as JSON: {e}")
             logger.warning(f"Response text: {response_text[:200]}")
-            
-            # Fallback: Phân tích text response để tìm is_scam
-            response_lower = response_text.lower()
-            is_scam = any(keyword in response_lower for keyword in ['lừa đảo', 'scam', 'fraud', 'phishing'])
-            
-            if is_scam:
-                return {
-                    "is_scam": True,
-                    "scam_points": ["Có dấu hiệu lừa đảo trong tin nhắn"],
-                    "scam_topic": "Lừa đảo",
-                    "recommendations": "Hãy cẩn thận và không thực hiện các yêu cầu trong tin nhắn.",
-                    "why_not_scam": "",
-                    "conversation_topic": ""
-                }
-            else:
-                return {
-                    "is_scam": False,
-                    "scam_points": [],
-                    "scam_topic": "",
-                    "recommendations": "",
-                    "why_not_scam": response_text[:500] if response_text else "Không thể phân tích tin nhắn này.",
-                    "conversation_topic": "Không xác định được"
-                }
-    
-    def _fallback_classification(self,
-                                 detected_urls: List[str] = None,
-                                 detected_phones: List[str] = None) -> Dict:
-        """Fallback classification nếu Gemini không available"""
+            return None
+
+    def _normalize_classification(self, data: Dict) -> Dict:
+        """Validate và normalize một object classification Gemini trả về"""
+        is_scam = bool(data.get('is_scam', False))
+        scam_points = data.get('scam_points', [])
+        scam_topic = str(data.get('scam_topic', ''))
+        recommendations = str(data.get('recommendations', ''))
+        why_not_scam = str(data.get('why_not_scam', ''))
+        conversation_topic = str(data.get('conversation_topic', ''))
+
+        # Đảm bảo scam_points là list
+        if not isinstance(scam_points, list):
+            scam_points = []
+
+        # Đảm bảo các field string không rỗng nếu cần
+        if is_scam:
+            if not scam_topic:
+                scam_topic = "Lừa đảo"
+            if not recommendations:
+                recommendations = (
+                    "Hãy cẩn thận và không thực hiện các yêu cầu trong tin nhắn."
+                )
+        else:
+            if not why_not_scam:
+                why_not_scam = "Tin nhắn này không có dấu hiệu lừa đảo rõ ràng."
+            if not conversation_topic:
+                conversation_topic = "Không xác định được"
+
+        return {
+            "is_scam": is_scam,
+            "scam_points": scam_points,
+            "scam_topic": scam_topic,
+            "recommendations": recommendations,
+            "why_not_scam": why_not_scam,
+            "conversation_topic": conversation_topic
+        }
+
+    def _classify_unparsed_response(self, response_text: str) -> Dict:
+        """Fallback: Phân tích text response để tìm is_scam"""
+        response_lower = response_text.lower()
+        is_scam = any(
+            keyword in response_lower
+            for keyword in ['lừa đảo', 'scam', 'fraud', 'phishing']
+        )
+
+        if is_scam:
+            return {
+                "is_scam": True,
+                "scam_points": ["Có dấu hiệu lừa đảo trong tin nhắn"],
+                "scam_topic": "Lừa đảo",
+                "recommendations": (
+                    "Hãy cẩn thận và không thực hiện các yêu cầu trong tin nhắn."
+                ),
+                "why_not_scam": "",
+                "conversation_topic": ""
+            }
+        else:
+            return {
+                "is_scam": False,
+                "scam_points": [],
+                "scam_topic": "",
+                "recommendations": "",
+                "why_not_scam": (
+                    response_text[:500]
+                    if response_text
+                    else "Không thể phân tích tin nhắn này."
+                ),
+                "conversation_topic": "Không xác định được"
+            }
+
+    def fallback_classification(self,
+                                detected_urls: List[str] = None,
+                                detected_phones: List[str] = None,
+                                text: Optional[str] = None) -> Dict:
+        """
+        Fallback classification nếu Gemini không available hoặc không trả lời được
+        (cũng dùng cho /classify/batch): dùng mô hình cục bộ khi text đủ giống dữ liệu
+        huấn luyện, còn lại dựa vào URL/số điện thoại
+        """
+        verdict = local_classifier.predict(text) if text else None
+        if verdict is not None and verdict.coverage >= local_classifier.min_coverage:
+            return local_classification(verdict, detected_urls, detected_phones)
+
         is_scam = bool(detected_urls or detected_phones)
         if is_scam:
             return {
                 "is_scam": True,
                 "scam_points": ["Phát hiện URL hoặc số điện thoại đáng ngờ"],
                 "scam_topic": "Lừa đảo",
-                "recommendations": "Hãy cẩn thận với các link và số điện thoại lạ. Không bấm vào link hoặc chuyển tiền.",
+                "recommendations": (
+                    "Hãy cẩn thận với các link và số điện thoại lạ. "
+                    "Không bấm vào link hoặc chuyển tiền."
+                ),
                 "why_not_scam": "",
                 "conversation_topic": ""
             }
@@ -235,7 +508,43 @@ Trả lời CHỈ bằng JSON:"""
                 "scam_points": [],
                 "scam_topic": "",
                 "recommendations": "",
-                "why_not_scam": "Không thể phân tích với Gemini. Hãy cẩn thận với các link và số điện thoại lạ.",
+                "why_not_scam": (
+                    "Không thể phân tích với Gemini. "
+                    "Hãy cẩn thận với các link và số điện thoại lạ."
+                ),
                 "conversation_topic": "Không xác định được"
             }
 
+
+# Service dùng chung cho mọi request (nạp lười, một client/connection pool mỗi process)
+gemini_service: Optional[GeminiExplanationService] = None
+
+
+def get_gemini_service() -> Optional[GeminiExplanationService]:
+    """Lazy load Gemini service"""
+    global gemini_service
+    if gemini_service is None:
+        try:
+            gemini_service = GeminiExplanationService(
+                api_key=os.getenv("GEMINI_API_KEY"),
+                model_name=os.getenv("GEMINI_MODEL", "gemini-2.5-flash"),
+                timeout_seconds=settings.GEMINI_TIMEOUT_SECONDS,
+                context_cache_ttl_seconds=(
+                    settings.GEMINI_CONTEXT_CACHE_TTL_SECONDS
+                    if settings.GEMINI_CONTEXT_CACHE
+                    else None
+                ),
+            )
+            logger.info("Gemini service initialized")
+        except Exception as e:
+            logger.warning(f"Could not load Gemini service: {str(e)}")
+            logger.warning("Classification will use fallback")
+    return gemini_service
+
+
+async def close_gemini_service() -> None:
+    """Đóng client Gemini dùng chung khi app shutdown"""
+    global gemini_service
+    if gemini_service is not None:
+        await gemini_service.aclose()
+        gemini_service = None
@@ -0,0 +1,265 @@
+from __future__ import annotations
+
+import json
+import math
+import re
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.core.metrics import register_stats
+from app.services.phone import find_phones
+
+# Ước lượng thô cho tokenizer của Gemini: tiếng Việt có dấu tách token dày hơn tiếng Anh
+# (~4 ký tự/token), lấy 3 ký tự/token để ngân sách không bị vượt
+CHARS_PER_TOKEN = 3.0
+
+# Khi phải rút gọn: mọi URL/số điện thoại luôn được giữ trước tiên; tối đa
+# EVIDENCE_CONTEXT_SHARE phần ngân sách còn lại dùng cho ngữ cảnh quanh chúng (mỗi bên
+# không quá EVIDENCE_CONTEXT_CHARS, co lại khi có nhiều span), phần dư chia cho đoạn
+# đầu/đoạn cuối tin nhắn theo HEAD_SHARE
+EVIDENCE_CONTEXT_SHARE = 0.5
+EVIDENCE_CONTEXT_CHARS = 80
+HEAD_SHARE = 2 / 3
+# Dịch điểm cắt tối đa bao nhiêu ký tự để không cắt giữa từ
+_SNAP_CHARS = 16
+OMISSION_MARKER = " […] "
+
+_RESPONSE_RULES = """Quy tắc phân tích:
+1. Quiz, câu hỏi giáo dục, thông báo chính thức → KHÔNG phải lừa đảo
+2. Chỉ đánh dấu lừa đảo nếu có: yêu cầu chuyển tiền, link đáng ngờ, mạo danh, lừa đảo tình cảm
+3. scam_points: danh sách các điểm cụ thể cho thấy lừa đảo
+4. scam_topic: chủ đề lừa đảo (ví dụ: "Lừa đảo tài chính", "Phishing", "Mạo danh ngân hàng")
+5. recommendations: lời khuyên cụ thể nên làm gì (ví dụ: "Không bấm vào link", "Không chuyển tiền")
+6. why_not_scam: giải thích rõ ràng vì sao không lừa đảo
+7. conversation_topic: mô tả cuộc trò chuyện này về gì (ví dụ: "Thông báo từ ngân hàng", "Câu hỏi quiz giáo dục")
+8. Tin nhắn dài có thể đã được rút gọn: "[…]" đánh dấu đoạn bị lược bỏ, các đoạn quanh URL và số điện thoại luôn được giữ lại"""
+
+# Phần hướng dẫn cố định, gửi qua system_instruction (hoặc context cache) thay vì lặp lại
+# trong nội dung mỗi request
+CLASSIFICATION_INSTRUCTIONS = f"""Bạn là chuyên gia phân tích tin nhắn lừa đảo. Mỗi request là một tin nhắn kèm URL và số điện thoại phát hiện được. Hãy phân tích và trả lời CHỈ bằng JSON, không có text giải thích thêm.
+
+Nếu KHÔNG lừa đảo, trả về:
+{{
+    "is_scam": false,
+    "scam_points": [],
+    "scam_topic": "",
+    "recommendations": "",
+    "why_not_scam": "Giải thích vì sao không lừa đảo",
+    "conversation_topic": "Mô tả cuộc trò chuyện này về gì"
+}}
+
+Nếu LỪA ĐẢO, trả về:
+{{
+    "is_scam": true,
+    "scam_points": ["điểm lừa đảo 1", "điểm lừa đảo 2"],
+    "scam_topic": "Chủ đề lừa đảo (ví dụ: lừa đảo tài chính, phishing, mạo danh)",
+    "recommendations": "Nên làm gì trong trường hợp này",
+    "why_not_scam": "",
+    "conversation_topic": ""
+}}
+
+{_RESPONSE_RULES}"""
+
+BATCH_CLASSIFICATION_INSTRUCTIONS = f"""Bạn là chuyên gia phân tích tin nhắn lừa đảo. Mỗi request là một JSON array gồm các tin nhắn ĐỘC LẬP (mỗi tin có id, text, urls, phones phát hiện được). Hãy phân tích TỪNG tin nhắn riêng biệt.
+
+Trả lời CHỈ bằng một JSON array, mỗi phần tử ứng với một tin nhắn (đủ số phần tử, giữ nguyên id), không có text nào khác:
+
+[
+    {{
+        "id": 0,
+        "is_scam": true,
+        "scam_points": ["điểm lừa đảo 1", "điểm lừa đảo 2"],
+        "scam_topic": "Chủ đề lừa đảo (ví dụ: lừa đảo tài chính, phishing, mạo danh)",
+        "recommendations": "Nên làm gì trong trường hợp này",
+        "why_not_scam": "",
+        "conversation_topic": ""
+    }},
+    {{
+        "id": 1,
+        "is_scam": false,
+        "scam_points": [],
+        "scam_topic": "",
+        "recommendations": "",
+        "why_not_scam": "Giải thích vì sao không lừa đảo",
+        "conversation_topic": "Mô tả cuộc trò chuyện này về gì"
+    }}
+]
+
+{_RESPONSE_RULES}"""
+
+PROMPT_INSTRUCTIONS: Dict[str, str] = {
+    "single": CLASSIFICATION_INSTRUCTIONS,
+    "batch": BATCH_CLASSIFICATION_INSTRUCTIONS,
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Số token ước lượng (không gọi API count_tokens)"""
+    return math.ceil(len(text or "") / CHARS_PER_TOKEN)
+
+
+def evidence_spans(text: str, urls: Sequence[str] = ()) -> List[Tuple[int, int]]:
+    """Vị trí (start, end) các URL đã phát hiện và số điện thoại trong text, đã gộp span chồng nhau"""
+    spans = [(match.start, match.end) for match in find_phones(text)]
+    for url in set(urls or ()):
+        if url:
+            spans.extend(match.span() for match in re.finditer(re.escape(url), text))
+    return _merge(spans)
+
+
+def _merge(intervals: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _covered(intervals: List[Tuple[int, int]]) -> int:
+    return sum(end - start for start, end in _merge(intervals))
+
+
+def _snap(text: str, start: int, end: int, keep_start: int, keep_end: int) -> Tuple[int, int]:
+    """
+    Đưa điểm cắt về khoảng trắng gần nhất (trong _SNAP_CHARS ký tự) để không cắt giữa từ,
+    nhưng không bao giờ cắt vào [keep_start, keep_end) (span bằng chứng trong đoạn)
+    """
+    if start > 0 and not text[start - 1].isspace():
+        space = text.find(" ", start, min(start + _SNAP_CHARS, keep_start))
+        if space != -1:
+            start = space + 1
+    if end < len(text) and not text[end].isspace():
+        space = text.rfind(" ", max(start, end - _SNAP_CHARS, keep_end), end)
+        if space > start:
+            end = space
+    return start, end
+
+
+def compact_text(text: str, max_tokens: int, urls: Sequence[str] = ()) -> str:
+    """
+    Rút gọn tin nhắn về khoảng `max_tokens` token (ước lượng). Tin vừa ngân sách giữ
+    nguyên; tin dài hơn giữ MỌI URL/số điện thoại (kể cả khi riêng chúng đã vượt ngân
+    sách), ngữ cảnh quanh từng span, rồi đoạn đầu và đoạn cuối; các đoạn bị lược nối
+    bằng "[…]".
+    """
+    text = text or ""
+    limit = max(1, int(max_tokens * CHARS_PER_TOKEN))
+    if len(text) <= limit:
+        return text
+
+    length = len(text)
+    spans = evidence_spans(text, urls)
+    remaining = max(0, limit - _covered(spans))
+
+    # Ngữ cảnh mỗi bên span: co lại để đủ chỗ cho tất cả span
+    context = 0
+    if spans:
+        context = min(EVIDENCE_CONTEXT_CHARS, int(remaining * EVIDENCE_CONTEXT_SHARE) // (2 * len(spans)))
+    intervals = [(max(0, start - context), min(length, end + context)) for start, end in spans]
+    remaining = max(0, limit - _covered(intervals))
+
+    head = int(remaining * HEAD_SHARE)
+    tail = remaining - head
+    if head:
+        intervals.append((0, head))
+    if tail:
+        intervals.append((length - tail, length))
+
+    segments = []
+    for start, end in _merge(intervals):
+        inner = [span for span in spans if start <= span[0] and span[1] <= end]
+        keep_start = inner[0][0] if inner else end
+        keep_end = inner[-1][1] if inner else start
+        start, end = _snap(text, start, end, keep_start, keep_end)
+        segments.append(text[start:end].strip())
+    compacted = OMISSION_MARKER.join(segment for segment in segments if segment)
+    prompt_stats.record_compaction(length, len(compacted))
+    return compacted
+
+
+def build_classification_prompt(text: str,
+                                detected_urls: Sequence[str] = None,
+                                detected_phones: Sequence[str] = None,
+                                max_tokens: Optional[int] = None) -> str:
+    """Phần thay đổi theo request của prompt phân loại một tin nhắn"""
+    max_tokens = settings.GEMINI_PROMPT_TEXT_TOKENS if max_tokens is None else max_tokens
+    urls_str = ", ".join(detected_urls) if detected_urls else "Không có"
+    phones_str = ", ".join(detected_phones) if detected_phones else "Không có"
+    return f"""Tin nhắn: "{compact_text(text, max_tokens, detected_urls or ())}"
+
+Thông tin bổ sung:
+- URL phát hiện: {urls_str}
+- Số điện thoại phát hiện: {phones_str}"""
+
+
+def build_batch_classification_prompt(items: Sequence[Tuple[str, List[str], List[str]]],
+                                      max_tokens: Optional[int] = None) -> str:
+    """Phần thay đổi theo request của prompt gộp nhiều tin nhắn (khớp kết quả theo id)"""
+    max_tokens = settings.GEMINI_BATCH_PROMPT_TEXT_TOKENS if max_tokens is None else max_tokens
+    messages = [
+        {
+            "id": index,
+            "text": compact_text(text, max_tokens, detected_urls or ()),
+            "urls": list(detected_urls or []),
+            "phones": list(detected_phones or []),
+        }
+        for index, (text, detected_urls, detected_phones) in enumerate(items)
+    ]
+    return f"{len(messages)} tin nhắn:\n{json.dumps(messages, ensure_ascii=False)}"
+
+
+class GeminiPromptStats:
+    """
+    Thống kê kích thước prompt: token ước lượng phía client, token thật Gemini báo về
+    (usage_metadata) và phần được phục vụ từ context cache.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, dict] = {}
+        self.compacted = 0
+        self.chars_dropped = 0
+
+    def record_compaction(self, original_chars: int, kept_chars: int) -> None:
+        with self._lock:
+            self.compacted += 1
+            self.chars_dropped += max(0, original_chars - kept_chars)
+
+    def record(self, kind: str, estimated_tokens: int, usage_metadata=None) -> None:
+        with self._lock:
+            entry = self._stats.setdefault(
+                kind, {"calls": 0, "estimated_tokens": 0, "prompt_tokens": 0, "cached_tokens": 0, "reported": 0}
+            )
+            entry["calls"] += 1
+            entry["estimated_tokens"] += estimated_tokens
+            prompt_tokens = getattr(usage_metadata, "prompt_token_count", None)
+            if prompt_tokens is not None:
+                entry["reported"] += 1
+                entry["prompt_tokens"] += prompt_tokens
+                entry["cached_tokens"] += getattr(usage_metadata, "cached_content_token_count", None) or 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            result = {
+                kind: {
+                    "calls": entry["calls"],
+                    "avg_estimated_tokens": round(entry["estimated_tokens"] / entry["calls"], 1),
+                    "avg_prompt_tokens": (
+                        round(entry["prompt_tokens"] / entry["reported"], 1) if entry["reported"] else None
+                    ),
+                    "avg_cached_tokens": (
+                        round(entry["cached_tokens"] / entry["reported"], 1) if entry["reported"] else None
+                    ),
+                }
+                for kind, entry in self._stats.items()
+            }
+            result["compacted_messages"] = self.compacted
+            result["chars_dropped"] = self.chars_dropped
+            return result
+
+
+prompt_stats = GeminiPromptStats()
+register_stats("gemini_prompt", prompt_stats.stats)
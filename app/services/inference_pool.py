@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional, TypeVar
+
+from app.core.config import settings
+from app.core.metrics import register_stats
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class InferencePoolSaturated(Exception):
+    """Hàng đợi inference đã đầy, caller nên trả 429 cho client"""
+
+    def __init__(self, queue_depth: int, capacity: int):
+        self.queue_depth = queue_depth
+        self.capacity = capacity
+        super().__init__(f"Inference queue is full ({queue_depth}/{capacity})")
+
+
+class InferencePool:
+    """
+    Thread pool riêng cho inference model (OCR), tách khỏi event loop của FastAPI.
+
+    - `workers` job chạy song song, tối đa `max_queue` job chờ thêm; vượt quá thì
+      `run()` ném InferencePoolSaturated ngay thay vì xếp hàng vô hạn.
+    - Số thread intra-op của torch được cố định một lần khi tạo pool để các worker
+      không tranh CPU với nhau.
+    - Executor được tạo lười ở lần dùng đầu tiên (an toàn khi fork worker).
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        torch_threads: Optional[int] = None,
+        name: str = "ocr-inference",
+    ):
+        self.workers = max(1, workers or settings.OCR_WORKERS)
+        self.max_queue = max(0, settings.OCR_MAX_QUEUE if max_queue is None else max_queue)
+        self.torch_threads = torch_threads or settings.OCR_TORCH_THREADS
+        self.name = name
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.max_queue
+
+    @property
+    def queue_depth(self) -> int:
+        """Số job đang chạy hoặc đang chờ"""
+        return self._pending
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    if self.torch_threads:
+                        import torch
+
+                        torch.set_num_threads(self.torch_threads)
+                        logger.info(f"Pinned torch intra-op threads to {self.torch_threads}")
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix=self.name
+                    )
+        return self._executor
+
+    def _release(self, _future: Any) -> None:
+        with self._pending_lock:
+            self._pending -= 1
+
+    def check_capacity(self) -> None:
+        """
+        Ném InferencePoolSaturated nếu hàng đợi đã đầy. Gọi trước phần tiền xử lý tốn
+        CPU để server quá tải trả 429 ngay; `submit()` vẫn kiểm tra lại khi đưa job vào.
+        """
+        if self._pending >= self.capacity:
+            raise InferencePoolSaturated(self._pending, self.capacity)
+
+    def submit(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> "asyncio.Future[T]":
+        """
+        Đưa job vào pool và trả về future ngay (gọi từ event loop).
+        Ném InferencePoolSaturated đồng bộ nếu hàng đợi đã đầy.
+        """
+        with self._pending_lock:
+            if self._pending >= self.capacity:
+                raise InferencePoolSaturated(self._pending, self.capacity)
+            self._pending += 1
+
+        try:
+            future = self._get_executor().submit(partial(fn, *args, **kwargs))
+        except BaseException:
+            self._release(None)
+            raise
+        # Chỉ giải phóng slot khi job thực sự chạy xong (kể cả khi request bị huỷ)
+        future.add_done_callback(self._release)
+        return asyncio.wrap_future(future)
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        return await self.submit(fn, *args, **kwargs)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "queue_depth": self.queue_depth,
+        }
+
+
+ocr_inference_pool = InferencePool()
+register_stats("ocr_inference_pool", ocr_inference_pool.stats)
@@ -0,0 +1,250 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.metrics import register_stats
+from app.services.text_normalization import mask_variables, normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Neo theo vị trí file (không phụ thuộc thư mục chạy app): <repo>/data/models/scam_classifier.npz
+DEFAULT_MODEL_PATH = Path(__file__).resolve().parent.parent.parent / "data" / "models" / "scam_classifier.npz"
+
+
+def normalize_for_features(text: str) -> str:
+    """NFC, lower, thay link bằng "<url>" và gộp chữ số thành "0" để mô hình không học thuộc giá trị cụ thể"""
+    return " " + normalize_text(mask_variables(normalize_text(text), " <url> ")) + " "
+
+
+@dataclass(frozen=True)
+class HashingCharVectorizer:
+    """
+    TF-IDF trên char n-gram, băm vào `n_features` bucket bằng crc32 (ổn định giữa các
+    process và phiên bản Python, khác với hash() có salt).
+    """
+    n_features: int = 1 << 18
+    ngram_min: int = 2
+    ngram_max: int = 4
+    max_chars: int = 2000
+
+    def bucket_counts(self, text: str) -> Dict[int, int]:
+        text = normalize_for_features(text[:self.max_chars])
+        counts: Dict[int, int] = {}
+        crc32 = zlib.crc32
+        n_features = self.n_features
+        length = len(text)
+        for n in range(self.ngram_min, self.ngram_max + 1):
+            for start in range(length - n + 1):
+                index = crc32(text[start:start + n].encode("utf-8")) % n_features
+                counts[index] = counts.get(index, 0) + 1
+        return counts
+
+    def transform(self, counts: Dict[int, int], idf: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Vector TF-IDF (sublinear tf, chuẩn hoá L2) dạng (indices, values)"""
+        if not counts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        values = (1.0 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))) * idf[indices]
+        norm = float(np.sqrt(np.dot(values, values)))
+        if norm > 0:
+            values /= norm
+        return indices, values
+
+
+class LocalScamClassifier:
+    """
+    Logistic regression trên TF-IDF char n-gram, chạy hoàn toàn bằng numpy.
+
+    Artifact (.npz) chỉ lưu các bucket có trọng số khác 0 nên rất gọn; khi nạp được
+    bung ra mảng dense để tra cứu theo index.
+    """
+
+    def __init__(self, vectorizer: HashingCharVectorizer, idf: np.ndarray, coef: np.ndarray,
+                 intercept: float, metadata: Optional[dict] = None):
+        self.vectorizer = vectorizer
+        self.idf = idf.astype(np.float32)
+        self.coef = coef.astype(np.float32)
+        self.intercept = float(intercept)
+        self.metadata = metadata or {}
+
+    def score(self, text: str) -> Tuple[float, float]:
+        """
+        (xác suất lừa đảo, coverage). Coverage là tỉ lệ n-gram của text nằm trong từ vựng
+        của mô hình: text lạ so với dữ liệu huấn luyện có coverage thấp và xác suất của
+        mô hình khi đó không đáng tin.
+        """
+        counts = self.vectorizer.bucket_counts(text)
+        total = sum(counts.values())
+        if not total:
+            return 0.5, 0.0
+        indices, values = self.vectorizer.transform(counts, self.idf)
+        known = self.idf[indices] > 0
+        coverage = float(np.fromiter(counts.values(), dtype=np.float32, count=len(counts))[known].sum()) / total
+        score = float(np.dot(self.coef[indices], values)) + self.intercept
+        return float(1.0 / (1.0 + np.exp(-score))), coverage
+
+    def predict_proba(self, text: str) -> float:
+        """Xác suất nội dung là lừa đảo"""
+        return self.score(text)[0]
+
+    def save(self, path: str) -> None:
+        used = np.flatnonzero(self.idf)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez_compressed(
+            path,
+            n_features=self.vectorizer.n_features,
+            ngram_range=np.array([self.vectorizer.ngram_min, self.vectorizer.ngram_max]),
+            max_chars=self.vectorizer.max_chars,
+            indices=used.astype(np.int32),
+            idf=self.idf[used],
+            coef=self.coef[used],
+            intercept=self.intercept,
+            metadata=np.array(repr(self.metadata)),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "LocalScamClassifier":
+        import ast
+
+        with np.load(path) as artifact:
+            vectorizer = HashingCharVectorizer(
+                n_features=int(artifact["n_features"]),
+                ngram_min=int(artifact["ngram_range"][0]),
+                ngram_max=int(artifact["ngram_range"][1]),
+                max_chars=int(artifact["max_chars"]),
+            )
+            idf = np.zeros(vectorizer.n_features, dtype=np.float32)
+            coef = np.zeros(vectorizer.n_features, dtype=np.float32)
+            idf[artifact["indices"]] = artifact["idf"]
+            coef[artifact["indices"]] = artifact["coef"]
+            metadata = ast.literal_eval(str(artifact["metadata"]))
+            return cls(vectorizer, idf, coef, float(artifact["intercept"]), metadata)
+
+
+@dataclass
+class LocalVerdict:
+    probability: float
+    coverage: float
+    is_scam: bool
+    confidence: float
+    confident: bool
+
+
+class LocalClassifierProvider:
+    """
+    Nạp artifact lười ở lần dùng đầu tiên và đưa ra verdict kèm độ tin cậy.
+    Verdict "chắc chắn" khi xác suất >= ngưỡng hoặc <= 1 - ngưỡng và text đủ giống dữ
+    liệu huấn luyện (coverage >= min_coverage); còn lại caller nên hỏi Gemini.
+    """
+
+    def __init__(self, path: Optional[str] = None, confidence_threshold: Optional[float] = None,
+                 min_coverage: Optional[float] = None):
+        self.path = path or settings.LOCAL_CLASSIFIER_PATH or DEFAULT_MODEL_PATH
+        self.confidence_threshold = (
+            settings.LOCAL_CLASSIFIER_CONFIDENCE if confidence_threshold is None else confidence_threshold
+        )
+        self.min_coverage = settings.LOCAL_CLASSIFIER_MIN_COVERAGE if min_coverage is None else min_coverage
+        self._model: Optional[LocalScamClassifier] = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        self.predictions = 0
+        self.decisions = 0
+        self.escalations = 0
+        self.total_seconds = 0.0
+
+    def get(self) -> Optional[LocalScamClassifier]:
+        if not settings.LOCAL_CLASSIFIER_ENABLED:
+            return None
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    try:
+                        self._model = LocalScamClassifier.load(self.path)
+                        logger.info(f"Local scam classifier loaded from {self.path}")
+                    except Exception as e:
+                        logger.warning(f"Local scam classifier unavailable ({self.path}): {str(e)}")
+                    self._loaded = True
+        return self._model
+
+    def predict(self, text: str) -> Optional[LocalVerdict]:
+        model = self.get()
+        if model is None or not text or not text.strip():
+            return None
+        started = time.perf_counter()
+        probability, coverage = model.score(text)
+        self.total_seconds += time.perf_counter() - started
+        self.predictions += 1
+        is_scam = probability >= 0.5
+        confidence = probability if is_scam else 1.0 - probability
+        return LocalVerdict(
+            probability=probability,
+            coverage=coverage,
+            is_scam=is_scam,
+            confidence=confidence,
+            confident=confidence >= self.confidence_threshold and coverage >= self.min_coverage,
+        )
+
+    def record(self, verdict: LocalVerdict) -> None:
+        """Đếm số lần verdict cục bộ được dùng trực tiếp / phải chuyển lên Gemini"""
+        if verdict.confident:
+            self.decisions += 1
+        else:
+            self.escalations += 1
+
+    def stats(self) -> dict:
+        predictions = self.predictions
+        return {
+            "enabled": settings.LOCAL_CLASSIFIER_ENABLED,
+            "loaded": self._model is not None,
+            "confidence_threshold": self.confidence_threshold,
+            "min_coverage": self.min_coverage,
+            "predictions": predictions,
+            "decisions": self.decisions,
+            "escalations": self.escalations,
+            "avg_ms": round(self.total_seconds / predictions * 1000, 3) if predictions else None,
+        }
+
+
+def local_classification(verdict: LocalVerdict,
+                         detected_urls: Sequence[str] = None,
+                         detected_phones: Sequence[str] = None) -> dict:
+    """Đổi verdict của mô hình cục bộ sang cùng format ScamClassification với Gemini"""
+    percent = round(verdict.confidence * 100)
+    if verdict.is_scam:
+        scam_points: List[str] = [f"Nội dung giống các kịch bản lừa đảo đã biết (độ tin cậy {percent}%)"]
+        if detected_urls or detected_phones:
+            scam_points.append("Có URL hoặc số điện thoại cần kiểm tra")
+        return {
+            "is_scam": True,
+            "scam_points": scam_points,
+            "scam_topic": "Lừa đảo",
+            "recommendations": "Không bấm vào link, không cung cấp mã OTP/thông tin tài khoản và không chuyển tiền.",
+            "why_not_scam": "",
+            "conversation_topic": "",
+            "confidence": round(verdict.confidence, 4),
+            "source": "local_model",
+        }
+    return {
+        "is_scam": False,
+        "scam_points": [],
+        "scam_topic": "",
+        "recommendations": "",
+        "why_not_scam": f"Nội dung không giống các kịch bản lừa đảo đã biết (độ tin cậy {percent}%).",
+        "conversation_topic": "Không xác định được",
+        "confidence": round(verdict.confidence, 4),
+        "source": "local_model",
+    }
+
+
+local_classifier = LocalClassifierProvider()
+register_stats("local_classifier", local_classifier.stats)
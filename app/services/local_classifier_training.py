@@ -0,0 +1,183 @@
+"""
+Huấn luyện mô hình phân loại lừa đảo cục bộ (TF-IDF char n-gram + logistic regression, numpy).
+
+    python -m app.services.local_classifier_training \
+        --data data/datasets/phishing_conversations_vi_840_nospeaker_matched.jsonl \
+        --output data/models/scam_classifier.npz
+
+In ra accuracy cross-validation và tỉ lệ request được mô hình tự quyết (không cần Gemini)
+ở ngưỡng độ tin cậy/coverage, rồi huấn luyện lại trên toàn bộ dữ liệu và lưu artifact.
+
+Dữ liệu huấn luyện là hội thoại theo mẫu nên CV gần như tuyệt đối và không phản ánh độ
+tin cậy thật. Trước khi bật LOCAL_CLASSIFIER_ENABLED, đánh giá trên tin nhắn thật đã gán
+nhãn (cùng format jsonl, không dùng để huấn luyện):
+
+    python -m app.services.local_classifier_training --holdout data/datasets/real_messages.jsonl
+
+và chỉnh LOCAL_CLASSIFIER_CONFIDENCE/LOCAL_CLASSIFIER_MIN_COVERAGE tới khi "confident
+accuracy" trên holdout đạt yêu cầu.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from datetime import datetime, timezone
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.local_classifier import DEFAULT_MODEL_PATH, HashingCharVectorizer, LocalScamClassifier
+
+DEFAULT_DATASET = "data/datasets/phishing_conversations_vi_840_nospeaker_matched.jsonl"
+SCAM_LABEL = "lừa đảo"
+
+
+def load_dataset(path: str) -> Tuple[List[str], np.ndarray]:
+    texts, labels = [], []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            texts.append(row["text"])
+            labels.append(1.0 if row["label"].strip().lower() == SCAM_LABEL else 0.0)
+    return texts, np.array(labels, dtype=np.float32)
+
+
+def _sparse_counts(vectorizer: HashingCharVectorizer, texts: Sequence[str]):
+    """Ma trận count dạng COO (rows, cols, counts)"""
+    rows, cols, counts = [], [], []
+    for row, text in enumerate(texts):
+        bucket_counts = vectorizer.bucket_counts(text)
+        rows.extend([row] * len(bucket_counts))
+        cols.extend(bucket_counts.keys())
+        counts.extend(bucket_counts.values())
+    return np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64), np.array(counts, dtype=np.float32)
+
+
+def _tfidf(rows, cols, counts, idf: np.ndarray, n_rows: int) -> np.ndarray:
+    values = (1.0 + np.log(counts)) * idf[cols]
+    norms = np.sqrt(np.bincount(rows, weights=values * values, minlength=n_rows))
+    return (values / np.maximum(norms[rows], 1e-12)).astype(np.float32)
+
+
+def train(texts: Sequence[str], labels: np.ndarray, vectorizer: HashingCharVectorizer,
+          l2: float = 1e-3, epochs: int = 300, learning_rate: float = 2.0,
+          min_df: int = 2) -> LocalScamClassifier:
+    """Logistic regression full-batch (gradient descent có momentum) trên ma trận thưa"""
+    n_rows = len(texts)
+    rows, cols, counts = _sparse_counts(vectorizer, texts)
+
+    # IDF (smooth) chỉ cho bucket xuất hiện trong >= min_df văn bản, còn lại bỏ hẳn
+    df = np.bincount(cols, minlength=vectorizer.n_features)
+    idf = np.where(df >= min_df, np.log((1 + n_rows) / (1 + df)) + 1.0, 0.0).astype(np.float32)
+    keep = idf[cols] > 0
+    rows, cols, counts = rows[keep], cols[keep], counts[keep]
+    values = _tfidf(rows, cols, counts, idf, n_rows)
+
+    coef = np.zeros(vectorizer.n_features, dtype=np.float64)
+    velocity = np.zeros_like(coef)
+    intercept, intercept_velocity = 0.0, 0.0
+    momentum = 0.9
+    for _ in range(epochs):
+        scores = np.bincount(rows, weights=values * coef[cols], minlength=n_rows) + intercept
+        error = 1.0 / (1.0 + np.exp(-scores)) - labels
+        gradient = np.bincount(cols, weights=values * error[rows], minlength=vectorizer.n_features) / n_rows
+        gradient += l2 * coef
+        velocity = momentum * velocity - learning_rate * gradient
+        coef += velocity
+        intercept_velocity = momentum * intercept_velocity - learning_rate * float(error.mean())
+        intercept += intercept_velocity
+
+    coef[idf == 0] = 0.0
+    return LocalScamClassifier(vectorizer, idf, coef, intercept)
+
+
+def cross_validate(texts: Sequence[str], labels: np.ndarray, vectorizer: HashingCharVectorizer,
+                   folds: int, threshold: float, min_coverage: float, seed: int = 13) -> dict:
+    """
+    Stratified k-fold: accuracy tổng thể và accuracy/tỉ lệ của các verdict đủ tin cậy
+    (những request mô hình tự quyết, không cần Gemini)
+    """
+    rng = np.random.RandomState(seed)
+    fold_of = np.empty(len(texts), dtype=np.int64)
+    for label in (0.0, 1.0):
+        members = np.flatnonzero(labels == label)
+        rng.shuffle(members)
+        fold_of[members] = np.arange(len(members)) % folds
+
+    probabilities = np.empty(len(texts))
+    coverages = np.empty(len(texts))
+    for fold in range(folds):
+        train_idx = np.flatnonzero(fold_of != fold)
+        model = train([texts[i] for i in train_idx], labels[train_idx], vectorizer)
+        for i in np.flatnonzero(fold_of == fold):
+            probabilities[i], coverages[i] = model.score(texts[i])
+
+    return _metrics(probabilities, coverages, labels, threshold, min_coverage)
+
+
+def evaluate(model: LocalScamClassifier, texts: Sequence[str], labels: np.ndarray,
+             threshold: float, min_coverage: float) -> dict:
+    """Đánh giá mô hình đã huấn luyện trên tập holdout (tin nhắn thật không dùng để huấn luyện)"""
+    scores = [model.score(text) for text in texts]
+    probabilities = np.array([probability for probability, _ in scores])
+    coverages = np.array([coverage for _, coverage in scores])
+    return _metrics(probabilities, coverages, labels, threshold, min_coverage)
+
+
+def _metrics(probabilities: np.ndarray, coverages: np.ndarray, labels: np.ndarray,
+             threshold: float, min_coverage: float) -> dict:
+    predictions = probabilities >= 0.5
+    confident = (np.maximum(probabilities, 1 - probabilities) >= threshold) & (coverages >= min_coverage)
+    return {
+        "accuracy": float(np.mean(predictions == labels.astype(bool))),
+        "coverage": float(confident.mean()),
+        "confident_accuracy": float(np.mean(predictions[confident] == labels[confident].astype(bool)))
+        if confident.any() else None,
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Huấn luyện mô hình phân loại lừa đảo cục bộ")
+    parser.add_argument("--data", default=DEFAULT_DATASET)
+    parser.add_argument("--output", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=settings.LOCAL_CLASSIFIER_CONFIDENCE,
+                        help="Ngưỡng độ tin cậy để không cần Gemini")
+    parser.add_argument("--min-coverage", type=float, default=settings.LOCAL_CLASSIFIER_MIN_COVERAGE)
+    parser.add_argument("--holdout", help="jsonl tin nhắn thật đã gán nhãn, chỉ dùng để đánh giá")
+    args = parser.parse_args(argv)
+
+    texts, labels = load_dataset(args.data)
+    vectorizer = HashingCharVectorizer()
+    print(f"Loaded {len(texts)} samples ({int(labels.sum())} scam)")
+
+    metrics = cross_validate(texts, labels, vectorizer, args.folds, args.threshold, args.min_coverage)
+    print(f"{args.folds}-fold CV: accuracy {metrics['accuracy']:.3f}, "
+          f"confident coverage {metrics['coverage']:.3f} @ {args.threshold}, "
+          f"confident accuracy {metrics['confident_accuracy']}")
+
+    model = train(texts, labels, vectorizer)
+    model.metadata = {
+        "dataset": args.data,
+        "samples": len(texts),
+        "trained_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "cv": metrics,
+    }
+    if args.holdout:
+        holdout_texts, holdout_labels = load_dataset(args.holdout)
+        holdout = evaluate(model, holdout_texts, holdout_labels, args.threshold, args.min_coverage)
+        print(f"Holdout ({len(holdout_texts)} samples): accuracy {holdout['accuracy']:.3f}, "
+              f"confident coverage {holdout['coverage']:.3f} @ {args.threshold}, "
+              f"confident accuracy {holdout['confident_accuracy']}")
+        model.metadata["holdout"] = {"dataset": args.holdout, "samples": len(holdout_texts), **holdout}
+    model.save(args.output)
+    print(f"Saved model to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
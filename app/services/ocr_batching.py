@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set
+
+from app.core.config import settings
+from app.services.inference_pool import InferencePool
+
+logger = logging.getLogger(__name__)
+
+# runner(pixel_values_list, questions, generation_config) -> list text, chạy trong inference pool
+BatchRunner = Callable[[List[Any], List[str], dict], List[str]]
+
+
+@dataclass
+class _OCRJob:
+    pixel_values: Any
+    question: str
+    future: asyncio.Future
+
+
+class OCRBatchScheduler:
+    """
+    Gom các request OCR đồng thời thành micro-batch.
+
+    Job có cùng generation config được gom trong cửa sổ `max_wait_ms`, tối đa
+    `max_batch_size` job, rồi chạy một lần forward (`batch_chat`) trong inference pool;
+    kết quả được trả về từng future riêng. Kích thước batch đạt được được thống kê
+    để hiển thị trên /health.
+    """
+
+    def __init__(
+        self,
+        runner: BatchRunner,
+        inference_pool: InferencePool,
+        max_batch_size: Optional[int] = None,
+        max_wait_ms: Optional[float] = None,
+    ):
+        self.runner = runner
+        self.inference_pool = inference_pool
+        self.max_batch_size = max(
+            1, settings.OCR_BATCH_MAX_SIZE if max_batch_size is None else max_batch_size
+        )
+        self.max_wait = (settings.OCR_BATCH_WAIT_MS if max_wait_ms is None else max_wait_ms) / 1000
+        self._groups: Dict[Hashable, List[_OCRJob]] = {}
+        self._timers: Dict[Hashable, asyncio.TimerHandle] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+        self.batches = 0
+        self.jobs = 0
+        self.last_batch_size = 0
+        self.batch_size_histogram: Counter = Counter()
+
+    async def submit(self, pixel_values: Any, question: str, generation_config: dict) -> str:
+        pool = self.inference_pool
+        pool.check_capacity()
+
+        if self.max_batch_size == 1:
+            self._record(1)
+            results = await pool.run(self.runner, [pixel_values], [question], generation_config)
+            return results[0]
+
+        loop = asyncio.get_running_loop()
+        key = tuple(sorted(generation_config.items()))
+        job = _OCRJob(pixel_values=pixel_values, question=question, future=loop.create_future())
+        group = self._groups.setdefault(key, [])
+        group.append(job)
+
+        if len(group) >= self.max_batch_size:
+            self._flush(key, generation_config)
+        elif len(group) == 1:
+            self._timers[key] = loop.call_later(self.max_wait, self._flush, key, generation_config)
+
+        return await job.future
+
+    def _flush(self, key: Hashable, generation_config: dict) -> None:
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        jobs = self._groups.pop(key, [])
+        # Bỏ các job mà caller đã huỷ trước khi batch kịp chạy
+        jobs = [job for job in jobs if not job.future.done()]
+        if not jobs:
+            return
+
+        task = asyncio.ensure_future(self._run(jobs, generation_config))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, jobs: List[_OCRJob], generation_config: dict) -> None:
+        self._record(len(jobs))
+        try:
+            results = await self.inference_pool.run(
+                self.runner,
+                [job.pixel_values for job in jobs],
+                [job.question for job in jobs],
+                generation_config,
+            )
+        except Exception as e:
+            for job in jobs:
+                if not job.future.done():
+                    job.future.set_exception(e)
+            return
+
+        for job, text in zip(jobs, results):
+            if not job.future.done():
+                job.future.set_result(text)
+
+    def _record(self, batch_size: int) -> None:
+        self.batches += 1
+        self.jobs += batch_size
+        self.last_batch_size = batch_size
+        self.batch_size_histogram[batch_size] += 1
+
+    def stats(self) -> dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": round(self.max_wait * 1000, 3),
+            "batches": self.batches,
+            "jobs": self.jobs,
+            "avg_batch_size": round(self.jobs / self.batches, 3) if self.batches else 0.0,
+            "last_batch_size": self.last_batch_size,
+            "batch_size_histogram": dict(sorted(self.batch_size_histogram.items())),
+        }
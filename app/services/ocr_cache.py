@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Optional, Tuple
+
+from PIL import Image
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.metrics import register_stats
+
+logger = logging.getLogger(__name__)
+
+# dHash 16x16 = 256 bit: đủ để bắt bản re-encode/resize của cùng một ảnh,
+# nhưng vẫn có thể trùng giữa các screenshot rất giống nhau nên mặc định tắt.
+_PHASH_SIZE = 16
+# Dọn tầng SQLite (TTL + số dòng tối đa) sau mỗi _PRUNE_EVERY lần ghi và khi mở file
+_PRUNE_EVERY = 256
+
+
+@dataclass(frozen=True)
+class OCRCacheKey:
+    content: str
+    perceptual: Optional[str] = None
+
+
+def perceptual_hash(image_bytes: bytes) -> Optional[str]:
+    """dHash: so sánh độ sáng các pixel kề nhau trên ảnh xám thu nhỏ"""
+    try:
+        image = Image.open(BytesIO(image_bytes))
+        image.draft("L", (_PHASH_SIZE * 4, _PHASH_SIZE * 4))
+        pixels = image.convert("L").resize((_PHASH_SIZE + 1, _PHASH_SIZE)).tobytes()
+    except Exception as e:
+        logger.warning(f"Could not compute perceptual hash: {str(e)}")
+        return None
+
+    bits = 0
+    row = _PHASH_SIZE + 1
+    for y in range(_PHASH_SIZE):
+        for x in range(_PHASH_SIZE):
+            bits = (bits << 1) | (pixels[y * row + x] > pixels[y * row + x + 1])
+    return f"{bits:0{_PHASH_SIZE * _PHASH_SIZE // 4}x}"
+
+
+class OCRResultCache:
+    """
+    Cache kết quả OCR theo nội dung ảnh.
+
+    Key = sha256(bytes ảnh) + digest của prompt/generation config/model, nên ảnh giống hệt
+    được trả ngay không cần chạy Vintern. Tuỳ chọn thêm perceptual hash (dHash) để bắt
+    bản re-encode của cùng ảnh. Tầng bộ nhớ là LRU có giới hạn; tầng đĩa SQLite
+    (OCR_CACHE_SQLITE_PATH) giữ kết quả qua các lần restart và chia sẻ giữa các worker,
+    giới hạn theo `created`: dòng quá `sqlite_ttl_seconds` không được đọc và bị xoá,
+    số dòng được cắt về `sqlite_max_rows` (giữ dòng mới nhất).
+    """
+
+    def __init__(
+        self,
+        maxsize: Optional[int] = None,
+        sqlite_path: Optional[str] = None,
+        use_perceptual_hash: Optional[bool] = None,
+        sqlite_max_rows: Optional[int] = None,
+        sqlite_ttl_seconds: Optional[float] = None,
+    ):
+        self._memory: LRUCache[str, str] = LRUCache(
+            settings.OCR_CACHE_SIZE if maxsize is None else maxsize
+        )
+        self.sqlite_path = sqlite_path if sqlite_path is not None else settings.OCR_CACHE_SQLITE_PATH
+        self.use_perceptual_hash = (
+            settings.OCR_CACHE_PERCEPTUAL if use_perceptual_hash is None else use_perceptual_hash
+        )
+        self.sqlite_max_rows = (
+            settings.OCR_CACHE_SQLITE_MAX_ROWS
+            if sqlite_max_rows is None
+            else sqlite_max_rows
+        )
+        self.sqlite_ttl_seconds = (
+            settings.OCR_CACHE_SQLITE_TTL_SECONDS
+            if sqlite_ttl_seconds is None
+            else sqlite_ttl_seconds
+        )
+        self._conn: Optional[sqlite3.Connection] = None
+        self._conn_lock = threading.Lock()
+        self._writes = 0
+        self.disk_hits = 0
+        self.disk_pruned = 0
+        self.perceptual_hits = 0
+
+    def build_key(self, image_bytes: bytes, params: dict) -> OCRCacheKey:
+        params_digest = hashlib.sha256(
+            json.dumps(params, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        ).hexdigest()[:16]
+        content = f"{hashlib.sha256(image_bytes).hexdigest()}:{params_digest}"
+
+        perceptual = None
+        if self.use_perceptual_hash:
+            phash = perceptual_hash(image_bytes)
+            if phash:
+                perceptual = f"p:{phash}:{params_digest}"
+        return OCRCacheKey(content=content, perceptual=perceptual)
+
+    def lookup(self, image_bytes: bytes, params: dict) -> Tuple[OCRCacheKey, Optional[str]]:
+        """Tính key và tra cache (blocking - gọi qua asyncio.to_thread)"""
+        key = self.build_key(image_bytes, params)
+
+        text = self._get(key.content)
+        if text is None and key.perceptual:
+            text = self._get(key.perceptual)
+            if text is not None:
+                self.perceptual_hits += 1
+                self._memory.set(key.content, text)
+        return key, text
+
+    def store(self, key: OCRCacheKey, text: str) -> None:
+        self._memory.set(key.content, text)
+        if key.perceptual:
+            self._memory.set(key.perceptual, text)
+
+        conn = self._get_connection()
+        if conn is None:
+            return
+        rows = [(key.content, text, time.time())]
+        if key.perceptual:
+            rows.append((key.perceptual, text, time.time()))
+        try:
+            with self._conn_lock, conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO ocr_cache(key, text, created) VALUES (?, ?, ?)", rows
+                )
+                self._writes += 1
+                if self._writes % _PRUNE_EVERY == 0:
+                    self._prune(conn)
+        except sqlite3.Error as e:
+            logger.warning(f"Could not write OCR cache to disk: {str(e)}")
+
+    def _get(self, cache_key: str) -> Optional[str]:
+        text = self._memory.get(cache_key)
+        if text is not None:
+            return text
+
+        conn = self._get_connection()
+        if conn is None:
+            return None
+        try:
+            with self._conn_lock:
+                row = conn.execute(
+                    "SELECT text FROM ocr_cache WHERE key = ? AND created >= ?",
+                    (cache_key, self._expires_before()),
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Could not read OCR cache from disk: {str(e)}")
+            return None
+        if row is None:
+            return None
+
+        self.disk_hits += 1
+        self._memory.set(cache_key, row[0])
+        return row[0]
+
+    def _get_connection(self) -> Optional[sqlite3.Connection]:
+        if not self.sqlite_path:
+            return None
+        if self._conn is None:
+            with self._conn_lock:
+                if self._conn is None:
+                    conn = sqlite3.connect(self.sqlite_path, check_same_thread=False, timeout=5)
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS ocr_cache ("
+                        "key TEXT PRIMARY KEY, text TEXT NOT NULL, created REAL NOT NULL)"
+                    )
+                    conn.execute(
+                        "CREATE INDEX IF NOT EXISTS ocr_cache_created "
+                        "ON ocr_cache(created)"
+                    )
+                    with conn:
+                        self._prune(conn)
+                    self._conn = conn
+        return self._conn
+
+    def _expires_before(self) -> float:
+        """Dòng có `created` nhỏ hơn mốc này đã hết hạn (0 = không có TTL)"""
+        return time.time() - self.sqlite_ttl_seconds if self.sqlite_ttl_seconds else 0.0
+
+    def _prune(self, conn: sqlite3.Connection) -> None:
+        """Xoá dòng hết hạn rồi giữ lại sqlite_max_rows dòng mới nhất (đã giữ lock)"""
+        deleted = 0
+        if self.sqlite_ttl_seconds:
+            deleted += conn.execute(
+                "DELETE FROM ocr_cache WHERE created < ?", (self._expires_before(),)
+            ).rowcount
+        if self.sqlite_max_rows:
+            deleted += conn.execute(
+                "DELETE FROM ocr_cache WHERE key IN ("
+                "SELECT key FROM ocr_cache ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                (self.sqlite_max_rows,),
+            ).rowcount
+        self.disk_pruned += deleted
+
+    def stats(self) -> dict:
+        return {
+            **self._memory.stats(),
+            "disk_enabled": bool(self.sqlite_path),
+            "disk_hits": self.disk_hits,
+            "disk_pruned": self.disk_pruned,
+            "perceptual_enabled": self.use_perceptual_hash,
+            "perceptual_hits": self.perceptual_hits,
+        }
+
+
+ocr_result_cache = OCRResultCache()
+register_stats("ocr_result_cache", ocr_result_cache.stats)
@@ -0,0 +1,93 @@
+"""
+Self-check cho các chế độ độ chính xác CPU của Vintern OCR.
+
+Chạy OCR trên ảnh mẫu (mặc định Docs/image/*.png) với fp32 làm chuẩn, rồi so sánh
+output của bf16/int8 bằng difflib, kèm thời gian, tốc độ (ký tự/giây) và RSS tăng thêm.
+
+    python -m app.services.ocr_precision_check --precisions bf16 int8 --min-similarity 0.9
+
+Trả exit code 1 nếu có ảnh có độ tương đồng thấp hơn ngưỡng.
+"""
+from __future__ import annotations
+
+import argparse
+import difflib
+import gc
+import glob
+import sys
+import time
+from typing import Dict, List
+
+from app.core.config import settings
+from app.core.metrics import current_rss_bytes
+from app.services.vintern_ocr_service import CPU_PRECISIONS, VinternOCRService
+
+DEFAULT_SAMPLES = "Docs/image/*.png"
+
+
+def run_precision(precision: str, images: Dict[str, bytes]) -> dict:
+    """Nạp model ở một chế độ, OCR toàn bộ ảnh mẫu rồi giải phóng model"""
+    rss_before = current_rss_bytes()
+    started = time.perf_counter()
+    service = VinternOCRService(model_name=settings.OCR_MODEL_NAME, use_gpu=False, cpu_precision=precision)
+    load_seconds = time.perf_counter() - started
+    rss_after = current_rss_bytes()
+
+    outputs, seconds = {}, {}
+    for name, image_bytes in images.items():
+        started = time.perf_counter()
+        outputs[name] = service.extract_text_sync(image_bytes)
+        seconds[name] = time.perf_counter() - started
+
+    del service
+    gc.collect()
+    return {
+        "load_seconds": load_seconds,
+        "rss_delta_bytes": rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+        "outputs": outputs,
+        "seconds": seconds,
+    }
+
+
+def similarity(reference: str, candidate: str) -> float:
+    return difflib.SequenceMatcher(None, reference, candidate, autojunk=False).ratio()
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="So sánh OCR bf16/int8 với fp32 trên ảnh mẫu")
+    parser.add_argument("--samples", default=DEFAULT_SAMPLES, help="Glob ảnh mẫu")
+    parser.add_argument("--precisions", nargs="+", default=["bf16", "int8"],
+                        choices=[p for p in CPU_PRECISIONS if p != "fp32"])
+    parser.add_argument("--min-similarity", type=float, default=0.9)
+    args = parser.parse_args(argv)
+
+    paths = sorted(glob.glob(args.samples))
+    if not paths:
+        print(f"No sample images match {args.samples}", file=sys.stderr)
+        return 2
+    images = {path: open(path, "rb").read() for path in paths}
+
+    results = {precision: run_precision(precision, images) for precision in ["fp32", *args.precisions]}
+    reference = results["fp32"]
+
+    failed = False
+    for precision, result in results.items():
+        chars = sum(len(text) for text in result["outputs"].values())
+        total_seconds = sum(result["seconds"].values())
+        rss = result["rss_delta_bytes"]
+        rss_text = f"rss +{rss / 2**20:.0f} MiB" if rss is not None else "rss n/a"
+        print(f"[{precision}] load {result['load_seconds']:.1f}s, {rss_text} | "
+              f"OCR {total_seconds:.1f}s, {chars / max(total_seconds, 1e-9):.1f} chars/s")
+        if precision == "fp32":
+            continue
+        for path in paths:
+            ratio = similarity(reference["outputs"][path], result["outputs"][path])
+            marker = "OK " if ratio >= args.min_similarity else "LOW"
+            failed = failed or ratio < args.min_similarity
+            print(f"    {marker} {ratio:.3f}  {path}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import logging
+import math
+import threading
+from dataclasses import dataclass, replace
+from io import BytesIO
+from typing import Dict, Optional, Tuple
+
+from PIL import Image
+
+from app.core.config import settings
+from app.core.metrics import register_stats
+
+logger = logging.getLogger(__name__)
+
+TILE_SIZE = 448
+
+
+@dataclass(frozen=True)
+class OCRProfile:
+    """Bộ tham số đánh đổi chất lượng/độ trễ của OCR"""
+    name: str
+    max_tiles: int
+    num_beams: int
+    max_new_tokens: int
+    repetition_penalty: float = 2.5
+
+    @property
+    def generation_config(self) -> dict:
+        return dict(
+            max_new_tokens=self.max_new_tokens,
+            do_sample=False,
+            num_beams=self.num_beams,
+            repetition_penalty=self.repetition_penalty,
+        )
+
+
+OCR_PROFILES: Dict[str, OCRProfile] = {
+    # Greedy, ít tile, giới hạn token thấp: nhanh nhất trên CPU
+    "fast": OCRProfile(name="fast", max_tiles=2, num_beams=1, max_new_tokens=512),
+    "balanced": OCRProfile(name="balanced", max_tiles=4, num_beams=2, max_new_tokens=768),
+    # Cấu hình gốc của code mẫu Vintern
+    "accurate": OCRProfile(name="accurate", max_tiles=6, num_beams=3, max_new_tokens=1024),
+}
+# adaptive: generation config của balanced, số tile chọn theo kích thước/tỉ lệ ảnh
+ADAPTIVE_PROFILE = "adaptive"
+PROFILE_NAMES = (*OCR_PROFILES, ADAPTIVE_PROFILE)
+
+
+def image_dimensions(image_bytes: bytes) -> Optional[Tuple[int, int]]:
+    """Đọc kích thước ảnh từ header, không decode toàn bộ ảnh"""
+    try:
+        return Image.open(BytesIO(image_bytes)).size
+    except Exception:
+        return None
+
+
+def adaptive_tile_budget(width: int, height: int, max_tiles: int) -> int:
+    """
+    Số tile vừa đủ cho ảnh: theo diện tích (ảnh nhỏ chỉ cần 1 tile) và theo tỉ lệ
+    cạnh (screenshot chat dài cần đủ tile theo chiều dọc để chữ không bị bóp nhỏ).
+    """
+    by_area = math.ceil(width * height / (TILE_SIZE * TILE_SIZE))
+    by_aspect = math.ceil(max(width, height) / max(1, min(width, height)))
+    return max(1, min(max_tiles, max(by_area, by_aspect)))
+
+
+def resolve_profile(name: Optional[str], image_bytes: Optional[bytes] = None) -> OCRProfile:
+    """Lấy profile theo tên (mặc định OCR_PROFILE); adaptive được cụ thể hoá theo ảnh"""
+    name = (name or settings.OCR_PROFILE).lower()
+    if name == ADAPTIVE_PROFILE:
+        base = OCR_PROFILES["balanced"]
+        cap = OCR_PROFILES["accurate"].max_tiles
+        size = image_dimensions(image_bytes) if image_bytes else None
+        tiles = adaptive_tile_budget(*size, cap) if size else base.max_tiles
+        return replace(base, name=ADAPTIVE_PROFILE, max_tiles=tiles)
+
+    try:
+        return OCR_PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown OCR profile: {name!r} (expected one of {', '.join(PROFILE_NAMES)})")
+
+
+class OCRProfileLatency:
+    """Thống kê độ trễ OCR theo profile để tinh chỉnh đánh đổi trên production"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, dict] = {}
+
+    def record(self, profile: str, seconds: float, tiles: int) -> None:
+        with self._lock:
+            entry = self._stats.setdefault(
+                profile, {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0, "total_tiles": 0}
+            )
+            entry["count"] += 1
+            entry["total_seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+            entry["total_tiles"] += tiles
+            entry["last_seconds"] = seconds
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                profile: {
+                    "count": entry["count"],
+                    "avg_seconds": round(entry["total_seconds"] / entry["count"], 3),
+                    "max_seconds": round(entry["max_seconds"], 3),
+                    "last_seconds": round(entry["last_seconds"], 3),
+                    "avg_tiles": round(entry["total_tiles"] / entry["count"], 2),
+                }
+                for profile, entry in self._stats.items()
+            }
+
+
+ocr_profile_latency = OCRProfileLatency()
+register_stats("ocr_profiles", lambda: {"default": settings.OCR_PROFILE, **ocr_profile_latency.stats()})
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import asyncio
+import gc
+import logging
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Optional
+
+from app.core.config import settings
+from app.core.metrics import current_rss_bytes, register_stats
+
+if TYPE_CHECKING:
+    from app.services.vintern_ocr_service import VinternOCRService
+
+logger = logging.getLogger(__name__)
+
+
+class OCRDisabledError(Exception):
+    """Node đang chạy ở chế độ lookup-only (OCR_ENABLED=False)"""
+
+
+class OCRServiceProvider:
+    """
+    Nạp VinternOCRService lười ở lần dùng đầu tiên.
+
+    Module này không import torch/transformers; chỉ khi cần OCR thật sự mới import
+    `app.services.vintern_ocr_service`. Node lookup-only (OCR_ENABLED=False) không bao
+    giờ nạp các thư viện đó. Thời gian nạp và bộ nhớ tăng thêm được ghi lại cho /health.
+    """
+
+    def __init__(self):
+        self._service: Optional["VinternOCRService"] = None
+        self._lock = threading.Lock()
+        self.state = "not_loaded"
+        self.load_seconds: Optional[float] = None
+        self.load_rss_delta_bytes: Optional[int] = None
+        self.error: Optional[str] = None
+        # PID của process đã nạp weight; khác PID hiện tại nghĩa là weight dùng chung qua fork
+        self.loaded_in_pid: Optional[int] = None
+        self._parent_torch_threads: Optional[int] = None
+
+    @property
+    def enabled(self) -> bool:
+        return settings.OCR_ENABLED
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._service is not None
+
+    def get_sync(self) -> "VinternOCRService":
+        if not self.enabled:
+            self.state = "disabled"
+            raise OCRDisabledError("OCR is disabled on this node (OCR_ENABLED=False)")
+
+        if self._service is None:
+            with self._lock:
+                if self._service is None:
+                    self._service = self._load()
+        return self._service
+
+    async def get(self) -> "VinternOCRService":
+        """Lấy service; lần đầu nạp model trong thread riêng để không chặn event loop"""
+        if self._service is not None:
+            return self._service
+        return await asyncio.to_thread(self.get_sync)
+
+    async def warmup(self) -> None:
+        """Hook cho startup: nạp sẵn model để request OCR đầu tiên không phải chờ"""
+        try:
+            await self.get()
+        except Exception as e:
+            logger.error(f"OCR warm-up failed: {str(e)}")
+
+    def preload_for_fork(self) -> None:
+        """
+        Nạp model trong process cha (gunicorn preload_app) trước khi fork worker.
+
+        Tensor weight nằm ngoài object Python nên refcount không chạm tới, các worker
+        dùng chung trang nhớ vật lý theo copy-on-write. Process cha chạy torch với
+        1 thread để không khởi tạo thread pool OpenMP trước fork; executor inference
+        vẫn được tạo lười trong từng worker.
+        """
+        if not self.enabled:
+            return
+        import torch
+
+        self._parent_torch_threads = torch.get_num_threads()
+        torch.set_num_threads(1)
+        self.get_sync()
+        # Đưa các object đã nạp ra khỏi GC để lượt collect trong worker không ghi vào trang dùng chung
+        gc.collect()
+        gc.freeze()
+        logger.info(f"Vintern OCR preloaded in pid {os.getpid()} for copy-on-write sharing")
+
+    def after_fork(self, torch_threads: Optional[int] = None) -> None:
+        """Hook post_fork của worker: khôi phục số thread torch đã hạ xuống trong process cha"""
+        if self._parent_torch_threads is None:
+            return
+        import torch
+
+        torch.set_num_threads(torch_threads or self._parent_torch_threads)
+
+    def _load(self) -> "VinternOCRService":
+        self.state = "loading"
+        rss_before = current_rss_bytes()
+        started = time.perf_counter()
+        try:
+            from app.services.vintern_ocr_service import VinternOCRService
+
+            service = VinternOCRService(
+                model_name=settings.OCR_MODEL_NAME,
+                use_gpu=settings.OCR_USE_GPU,
+                cpu_precision=settings.OCR_CPU_PRECISION,
+            )
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+            raise
+
+        self.load_seconds = round(time.perf_counter() - started, 3)
+        rss_after = current_rss_bytes()
+        if rss_before is not None and rss_after is not None:
+            self.load_rss_delta_bytes = rss_after - rss_before
+        self.state = "ready"
+        self.error = None
+        self.loaded_in_pid = os.getpid()
+        logger.info(f"Vintern OCR loaded lazily in {self.load_seconds}s")
+        return service
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "state": "disabled" if not self.enabled else self.state,
+            "precision": self._service.precision if self._service is not None else None,
+            "load_seconds": self.load_seconds,
+            "load_rss_delta_bytes": self.load_rss_delta_bytes,
+            "error": self.error,
+            "shared_weights": self.loaded_in_pid is not None and self.loaded_in_pid != os.getpid(),
+        }
+
+
+ocr_provider = OCRServiceProvider()
+register_stats("ocr", ocr_provider.stats)
@@ -1,5 +1,59 @@
+import re
+from dataclasses import dataclass
+from typing import List, Optional
+
+# Số điện thoại Việt Nam: tiền tố +84 / 84 / 0, sau đó 9 chữ số di động (3/5/7/8/9)
+# hoặc 10 chữ số cố định (2x), cho phép một dấu cách/chấm/gạch giữa các chữ số.
+# Mọi phép lặp đều có giới hạn nên regex chạy tuyến tính theo độ dài text.
+PHONE_PATTERN = re.compile(
+    r"(?<![\d+])(?P<prefix>\+84|84|0)[ .\-]?"
+    r"(?P<number>2(?:[ .\-]?\d){9}|[35789](?:[ .\-]?\d){8})(?!\d)"
+)
+_SEPARATORS = re.compile(r"[ .\-]")
+
+
+@dataclass(frozen=True)
+class PhoneMatch:
+    raw: str
+    national: str  # Dạng quốc gia, dùng làm key lưu trữ/tra cứu: 0912345678
+    e164: str  # Dạng E.164: +84912345678
+    start: int
+    end: int
+
+
+def _build_match(match: "re.Match[str]") -> PhoneMatch:
+    subscriber = _SEPARATORS.sub("", match.group("number"))
+    return PhoneMatch(
+        raw=match.group(0),
+        national=f"0{subscriber}",
+        e164=f"+84{subscriber}",
+        start=match.start(),
+        end=match.end(),
+    )
+
+
+def find_phones(text: str) -> List[PhoneMatch]:
+    """Tìm tất cả số điện thoại trong text, kèm dạng chuẩn và vị trí (span)"""
+    if not text:
+        return []
+    return [_build_match(match) for match in PHONE_PATTERN.finditer(text)]
+
+
+def parse_phone(phone: str) -> Optional[PhoneMatch]:
+    """Parse một chuỗi chỉ chứa số điện thoại, trả về None nếu không hợp lệ"""
+    if not phone:
+        return None
+    match = PHONE_PATTERN.fullmatch(phone.strip())
+    return _build_match(match) if match else None
+
+
 def normalize_phone(phone: str) -> str:
+    parsed = parse_phone(phone)
+    if parsed:
+        return parsed.national
+
+    # Không nhận dạng được: giữ cách chuẩn hoá cũ để không làm lệch dữ liệu đã lưu
     phone = phone.strip().replace(" ", "")
     if phone.startswith("+84"):
         phone = "0" + phone[3:]
-    return phone
\ No newline at end of file
+    return phone
@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from array import array
+from bisect import bisect_left
+from datetime import datetime
+from typing import Iterable, List, Optional, Sequence, Set
+
+from sqlalchemy import String, any_, bindparam, func, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.blacklist_phone import BlackListPhone
+from app.schemas.blacklist import PhoneSearchResult
+from app.services.phone import normalize_phone, parse_phone
+
+_MASK64 = (1 << 64) - 1
+
+
+def phone_key(normalized_phone: Optional[str]) -> Optional[int]:
+    """
+    Đổi số điện thoại thành số nguyên để lưu gọn trong array('Q'), dùng dạng E.164 bỏ dấu
+    "+" (84xxxxxxxxx) nên không mất chữ số 0 đầu. Chỉ nhận số parse_phone xác nhận hợp lệ:
+    "912345678" hay "00912345678" không được trùng key với "0912345678".
+    """
+    parsed = parse_phone(normalized_phone) if normalized_phone else None
+    if parsed is None:
+        return None
+    return int(parsed.e164[1:])
+
+
+def _mix64(value: int) -> int:
+    """splitmix64 - hash 64 bit nhanh, phân bố đều cho số nguyên"""
+    value = (value + 0x9E3779B97F4A7C15) & _MASK64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return value ^ (value >> 31)
+
+
+class BloomFilter:
+    """Bloom filter trên bytearray cho khoá số nguyên (double hashing từ splitmix64)"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = max(1, capacity)
+        bits = -self.capacity * math.log(error_rate) / (math.log(2) ** 2)
+        self.size = max(64, int(math.ceil(bits)))
+        self.hash_count = max(1, int(round(self.size / self.capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: int):
+        mixed = _mix64(key)
+        h1 = mixed & 0xFFFFFFFF
+        h2 = (mixed >> 32) | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key: int) -> None:
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: int) -> bool:
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class PhoneBlacklistSet:
+    """
+    Tập số điện thoại blacklist trong bộ nhớ: array('Q') đã sắp xếp + bloom filter phía trước.
+
+    - Số không có trong blacklist (đa số request) bị bloom filter loại ngay, không cần DB
+      và không tạo object Python cho từng số.
+    - Mỗi `probe_interval` giây chạy một query count/max(updated); nếu chỉ có dòng mới
+      (id lớn hơn lần refresh trước) thì nạp thêm các dòng đó. Có dòng cũ bị sửa (worker
+      khác đổi value), số dòng giảm/lệch (có dòng bị xoá) hoặc `invalidate()` được gọi
+      thì nạp lại toàn bộ.
+    """
+
+    def __init__(
+        self,
+        probe_interval: Optional[float] = None,
+        error_rate: Optional[float] = None,
+    ):
+        self.probe_interval = (
+            settings.PHONE_BLACKLIST_PROBE_SECONDS if probe_interval is None else probe_interval
+        )
+        self.error_rate = settings.PHONE_BLOOM_ERROR_RATE if error_rate is None else error_rate
+        self._numbers = array("Q")
+        self._bloom = BloomFilter(1, self.error_rate)
+        self._loaded = False
+        self._needs_full_reload = True
+        self._stale = True
+        self._watermark: Optional[datetime] = None
+        self._max_id = 0
+        self._row_count = 0
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def invalidate(self) -> None:
+        """Nạp lại toàn bộ ở lần truy cập sau (dùng khi số bị sửa hoặc xoá)"""
+        self._needs_full_reload = True
+
+    def mark_stale(self) -> None:
+        """Buộc kiểm tra thay đổi ở lần truy cập sau (dùng khi thêm số mới)"""
+        self._stale = True
+
+    def _is_fresh(self) -> bool:
+        return (
+            self._loaded
+            and not self._needs_full_reload
+            and not self._stale
+            and time.monotonic() - self._checked_at < self.probe_interval
+        )
+
+    async def ensure_fresh(self, session: AsyncSession) -> None:
+        if self._is_fresh():
+            return
+
+        async with self._lock:
+            if self._is_fresh():
+                return
+
+            self._stale = False
+            row_count, watermark = (
+                await session.execute(
+                    select(func.count(BlackListPhone.id), func.max(BlackListPhone.updated))
+                )
+            ).one()
+
+            if self._needs_full_reload or not self._loaded or row_count < self._row_count:
+                await self._full_reload(session)
+            elif watermark is not None and (self._watermark is None or watermark > self._watermark):
+                if not await self._incremental_reload(session) or self._row_count != row_count:
+                    await self._full_reload(session)
+            elif self._row_count != row_count:
+                await self._full_reload(session)
+
+            self._checked_at = time.monotonic()
+
+    async def _full_reload(self, session: AsyncSession) -> None:
+        self._needs_full_reload = False
+        result = await session.execute(
+            select(
+                func.count(BlackListPhone.id),
+                func.max(BlackListPhone.id),
+                func.max(BlackListPhone.updated),
+            )
+        )
+        row_count, max_id, watermark = result.one()
+        values = await session.execute(
+            select(BlackListPhone.value).where(BlackListPhone.updated <= watermark)
+            if watermark is not None
+            else select(BlackListPhone.value)
+        )
+        self._rebuild(phone_key(value) for value in values.scalars())
+        self._row_count = row_count
+        self._max_id = max_id or 0
+        self._watermark = watermark
+        self._loaded = True
+
+    async def _incremental_reload(self, session: AsyncSession) -> bool:
+        """
+        Nạp thêm các dòng mới. Trả về False nếu gặp dòng cũ bị sửa: value cũ của nó vẫn
+        nằm trong tập nên caller phải nạp lại toàn bộ.
+        """
+        result = await session.execute(
+            select(BlackListPhone.id, BlackListPhone.value, BlackListPhone.updated)
+            .where(BlackListPhone.updated > self._watermark)
+            .order_by(BlackListPhone.updated)
+        )
+        rows = result.all()
+        if any(entry_id <= self._max_id for entry_id, _, _ in rows):
+            return False
+
+        new_keys = []
+        for entry_id, value, updated in rows:
+            self._row_count += 1
+            self._max_id = max(self._max_id, entry_id)
+            self._watermark = updated
+            key = phone_key(value)
+            if key is not None:
+                new_keys.append(key)
+
+        if len(self._numbers) + len(new_keys) > self._bloom.capacity or len(new_keys) > 64:
+            self._rebuild([*self._numbers, *new_keys])
+            return True
+
+        for key in new_keys:
+            position = bisect_left(self._numbers, key)
+            if position < len(self._numbers) and self._numbers[position] == key:
+                continue
+            self._numbers.insert(position, key)
+            self._bloom.add(key)
+        return True
+
+    def _rebuild(self, keys: Iterable[Optional[int]]) -> None:
+        numbers = array("Q", sorted({key for key in keys if key is not None}))
+        bloom = BloomFilter(max(1024, 2 * len(numbers)), self.error_rate)
+        for key in numbers:
+            bloom.add(key)
+        self._numbers, self._bloom = numbers, bloom
+
+    def contains(self, normalized_phone: str) -> Optional[bool]:
+        """
+        True/False nếu số có/không có trong blacklist.
+        None nếu value không phải số điện thoại hợp lệ (caller tự tra DB theo value).
+        """
+        key = phone_key(normalized_phone)
+        if key is None:
+            return None
+        if key not in self._bloom:
+            return False
+        position = bisect_left(self._numbers, key)
+        return position < len(self._numbers) and self._numbers[position] == key
+
+    async def find_blacklisted(self, session: AsyncSession, normalized_phones: Iterable[str]) -> Set[str]:
+        """
+        Trả về tập các số (đã normalize) có trong blacklist.
+        Số hợp lệ tra trong bộ nhớ; value còn lại tra DB bằng một query duy nhất.
+        """
+        await self.ensure_fresh(session)
+        blacklisted = set()
+        unresolved = set()
+        for normalized in set(normalized_phones):
+            found = self.contains(normalized)
+            if found is None:
+                unresolved.add(normalized)
+            elif found:
+                blacklisted.add(normalized)
+
+        if unresolved:
+            result = await session.execute(
+                select(BlackListPhone.value).where(
+                    BlackListPhone.value == any_(
+                        bindparam("values", sorted(unresolved), type_=ARRAY(String))
+                    )
+                )
+            )
+            blacklisted.update(result.scalars().all())
+        return blacklisted
+
+    def __len__(self) -> int:
+        return len(self._numbers)
+
+
+phone_blacklist = PhoneBlacklistSet()
+
+
+def search_status(found: bool) -> dict:
+    if found:
+        return {
+            "status": "danger",
+            "message": "⚠️ Số điện thoại này đã bị báo cáo là lừa đảo",
+            "found": True
+        }
+    return {
+        "status": "warning",
+        "message": "⚠️ Số điện thoại này chưa có trong hệ thống, hãy cẩn thận",
+        "found": False
+    }
+
+
+async def check_phones(session: AsyncSession, values: Sequence[str]) -> List[PhoneSearchResult]:
+    """Tra nhiều số điện thoại trong blacklist, kết quả theo đúng thứ tự `values`"""
+    normalized_values = [normalize_phone(value) for value in values]
+    blacklisted = await phone_blacklist.find_blacklisted(session, normalized_values)
+    return [
+        PhoneSearchResult(
+            value=value,
+            normalized_value=normalized,
+            **search_status(normalized in blacklisted),
+        )
+        for value, normalized in zip(values, normalized_values)
+    ]
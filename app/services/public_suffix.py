@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import logging
+import threading
+from pathlib import Path
+from typing import FrozenSet, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Bản sao offline của https://publicsuffix.org/list/public_suffix_list.dat (MPL-2.0)
+DEFAULT_PSL_PATH = Path(__file__).resolve().parent.parent / "data" / "public_suffix_list.dat"
+
+
+def _to_ascii(label: str) -> str:
+    """Đưa rule IDN về dạng punycode để khớp với hostname đã qua urlsplit"""
+    try:
+        return label.encode("idna").decode("ascii")
+    except UnicodeError:
+        return label
+
+
+class PublicSuffixList:
+    """
+    Public Suffix List đã được biên dịch thành 3 tập hash:
+    - rules: suffix thông thường (com.vn, github.io, ...)
+    - wildcards: domain cha của rule `*.x` (lưu `x`)
+    - exceptions: rule `!x` (lưu `x`)
+
+    Tra cứu một host chỉ tốn O(số label) phép hash.
+    """
+
+    def __init__(self, lines: Iterable[str]):
+        rules: set[str] = set()
+        wildcards: set[str] = set()
+        exceptions: set[str] = set()
+
+        for raw in lines:
+            line = raw.strip()
+            if not line or line.startswith("//"):
+                continue
+            rule = line.split()[0].lower()
+            for form in {rule, ".".join(_to_ascii(label) for label in rule.split("."))}:
+                if form.startswith("!"):
+                    exceptions.add(form[1:])
+                elif form.startswith("*."):
+                    wildcards.add(form[2:])
+                else:
+                    rules.add(form)
+
+        self.rules: FrozenSet[str] = frozenset(rules)
+        self.wildcards: FrozenSet[str] = frozenset(wildcards)
+        self.exceptions: FrozenSet[str] = frozenset(exceptions)
+
+    @classmethod
+    def from_file(cls, path: Path) -> "PublicSuffixList":
+        with open(path, encoding="utf-8") as handle:
+            return cls(handle)
+
+    def public_suffix(self, host: str) -> str:
+        """Trả về public suffix dài nhất của host (mặc định là label cuối cùng)"""
+        labels = host.strip(".").lower().split(".")
+        count = len(labels)
+
+        # Duyệt từ suffix dài nhất đến ngắn nhất, rule dài nhất thắng
+        for start in range(count):
+            suffix = ".".join(labels[start:])
+            if suffix in self.exceptions:
+                return ".".join(labels[start + 1:])
+            if suffix in self.rules:
+                return suffix
+            if start + 1 < count and ".".join(labels[start + 1:]) in self.wildcards:
+                return suffix
+        return labels[-1]
+
+    def registrable_domain(self, host: str) -> Optional[str]:
+        """
+        Trả về registrable domain (public suffix + 1 label), ví dụ:
+        a.scam.com.vn → scam.com.vn. Trả về None nếu host chính là public suffix.
+        """
+        host = host.strip(".").lower()
+        if not host:
+            return None
+
+        suffix = self.public_suffix(host)
+        if host == suffix:
+            return None
+
+        prefix = host[: -len(suffix) - 1]
+        return f"{prefix.rsplit('.', 1)[-1]}.{suffix}"
+
+
+_psl: Optional[PublicSuffixList] = None
+_psl_lock = threading.Lock()
+
+
+def get_public_suffix_list(path: Optional[Path] = None) -> PublicSuffixList:
+    """Nạp Public Suffix List một lần cho cả process, chỉ khi cần dùng tới"""
+    global _psl
+    if _psl is None:
+        with _psl_lock:
+            if _psl is None:
+                source = path or DEFAULT_PSL_PATH
+                _psl = PublicSuffixList.from_file(source)
+                logger.info(
+                    f"Loaded Public Suffix List from {source}: "
+                    f"{len(_psl.rules)} rules, {len(_psl.wildcards)} wildcards, "
+                    f"{len(_psl.exceptions)} exceptions"
+                )
+    return _psl
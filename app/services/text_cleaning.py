@@ -1,8 +1,10 @@
 import re
 import unicodedata
-from typing import List, Dict
+from typing import List, Dict, Optional
 import logging
 
+from app.services.phone import PHONE_PATTERN, find_phones
+
 logger = logging.getLogger(__name__)
 
 class TextCleaner:
@@ -20,10 +22,8 @@ class TextCleaner:
             r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+'
         )
         
-        # Pattern để tìm số điện thoại Việt Nam
-        self.phone_pattern = re.compile(
-            r'(\+84|0)[0-9]{9,10}'
-        )
+        # Pattern để tìm số điện thoại Việt Nam (dùng chung với app.services.phone)
+        self.phone_pattern = PHONE_PATTERN
         
         # Pattern để tìm email
         self.email_pattern = re.compile(
@@ -152,20 +152,11 @@ class TextCleaner:
         Returns:
             List các số điện thoại tìm được
         """
-        phones = self.phone_pattern.findall(text)
-        # Normalize: chuyển +84 thành 0
-        normalized_phones = []
-        for phone in phones:
-            if isinstance(phone, tuple):
-                phone = phone[0] if phone[0] else phone[1]
-            if phone.startswith('+84'):
-                normalized = '0' + phone[3:]
-            else:
-                normalized = phone
-            normalized_phones.append(normalized)
+        # Engine dùng chung trả về dạng chuẩn (0xxxxxxxxx), giống key trong blacklist
+        normalized_phones = [match.national for match in find_phones(text)]
         
-        # Loại bỏ duplicate
-        unique_phones = list(set(normalized_phones))
+        # Loại bỏ duplicate (giữ thứ tự xuất hiện)
+        unique_phones = list(dict.fromkeys(normalized_phones))
         logger.info(f"Found {len(unique_phones)} phone numbers")
         return unique_phones
     
@@ -184,24 +175,38 @@ class TextCleaner:
         logger.info(f"Found {len(unique_emails)} emails")
         return unique_emails
     
-    def get_cleaning_stats(self, original_text: str, cleaned_text: str) -> Dict:
+    def get_cleaning_stats(
+        self,
+        original_text: str,
+        cleaned_text: str,
+        urls: Optional[List[str]] = None,
+        phones: Optional[List[str]] = None,
+        emails: Optional[List[str]] = None,
+    ) -> Dict:
         """
         Thống kê quá trình làm sạch
         
         Args:
             original_text: Text gốc
             cleaned_text: Text đã làm sạch
+            urls, phones, emails: Kết quả trích xuất sẵn có (nếu bỏ trống sẽ trích xuất lại)
             
         Returns:
             Dictionary chứa thống kê
         """
+        if urls is None:
+            urls = self.extract_urls(cleaned_text)
+        if phones is None:
+            phones = self.extract_phones(cleaned_text)
+        if emails is None:
+            emails = self.extract_emails(cleaned_text)
         return {
             'original_length': len(original_text),
             'cleaned_length': len(cleaned_text),
             'removed_chars': len(original_text) - len(cleaned_text),
-            'urls_found': len(self.extract_urls(cleaned_text)),
-            'phones_found': len(self.extract_phones(cleaned_text)),
-            'emails_found': len(self.extract_emails(cleaned_text))
+            'urls_found': len(urls),
+            'phones_found': len(phones),
+            'emails_found': len(emails)
         }
     
     def preserve_vietnamese_accents(self, text: str) -> str:
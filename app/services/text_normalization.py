@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+import re
+import unicodedata
+
+_WHITESPACE = re.compile(r"\s+")
+_DIGITS = re.compile(r"\d+")
+_LINKS = re.compile(r"(?:https?://|www\.)\S+")
+
+
+def normalize_text(text: str) -> str:
+    """Chuẩn hoá text trước khi băm/trích đặc trưng: NFC, lower, gộp khoảng trắng"""
+    text = unicodedata.normalize("NFC", text or "").lower()
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def mask_variables(text: str, link_token: str = "<url>") -> str:
+    """
+    Thay link bằng `link_token` và gộp chữ số thành "0" để các bản của cùng một kịch bản
+    chỉ khác đường link, số tiền, số tài khoản, số điện thoại trông giống nhau.
+    Nhận text đã qua normalize_text (link được nhận dạng ở dạng chữ thường).
+    """
+    return _DIGITS.sub("0", _LINKS.sub(link_token, text))
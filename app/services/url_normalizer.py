@@ -1,9 +1,15 @@
 from __future__ import annotations
 
+import ipaddress
+from pathlib import Path
 from typing import Iterable, Optional
 from urllib.parse import parse_qsl, urlencode, urlsplit, unquote
 
+from app.core.cache import LRUCache
 from app.core.config import settings
+from app.core.metrics import register_stats
+from app.services.domain_index import DomainIndex
+from app.services.public_suffix import get_public_suffix_list
 
 
 class URLNormalizer:
@@ -16,11 +22,18 @@ class URLNormalizer:
         tracking_params: Optional[Iterable[str]] = None,
         keep_params: Optional[Iterable[str]] = None,
         tracking_prefixes: Optional[Iterable[str]] = None,
+        cache_size: Optional[int] = None,
     ):
         self.tracking_params = {p.lower() for p in (tracking_params or settings.WHITELIST_TRACKING_PARAMS)}
         self.keep_params = {p.lower() for p in (keep_params or settings.WHITELIST_KEEP_PARAMS)}
         prefixes = tracking_prefixes or settings.WHITELIST_TRACKING_PREFIXES
         self.tracking_prefixes = tuple(p.lower() for p in prefixes)
+        self._cache: LRUCache[str, str] = LRUCache(
+            settings.URL_NORMALIZER_CACHE_SIZE if cache_size is None else cache_size
+        )
+        self.shared_hosting: DomainIndex[str] = DomainIndex(
+            (domain, domain) for domain in settings.URL_SHARED_HOSTING_DOMAINS
+        )
 
     def normalize(self, url: str) -> str:
         """
@@ -28,10 +41,24 @@ class URLNormalizer:
         - Bỏ protocol, www.
         - Normalize path và query.
         - Loại bỏ tracking params, sắp xếp query theo alphabet.
+
+        Kết quả được memo hoá theo chuỗi URL gốc trong LRU cache có giới hạn,
+        vì cùng một link lừa đảo thường lặp lại rất nhiều lần.
         """
         if not url:
             return ""
 
+        normalized = self._cache.get(url)
+        if normalized is None:
+            normalized = self._normalize(url)
+            self._cache.set(url, normalized)
+        return normalized
+
+    def cache_stats(self) -> dict:
+        """Thống kê hit/miss/eviction của cache normalize"""
+        return self._cache.stats()
+
+    def _normalize(self, url: str) -> str:
         candidate = url.strip()
         if "://" not in candidate:
             candidate = f"http://{candidate}"
@@ -56,6 +83,52 @@ class URLNormalizer:
             normalized = f"{normalized}?{filtered_query}"
         return normalized
 
+    def registrable_domain(self, url: str) -> str:
+        """
+        Trả về registrable domain theo Public Suffix List để làm key blacklist
+        và gom subdomain: a.scam.com.vn, b.scam.com.vn → scam.com.vn.
+        Địa chỉ IP và host là public suffix được giữ nguyên.
+        """
+        host = self._host(url)
+        if not host:
+            return ""
+        return self._registrable(host) or host
+
+    def _registrable(self, host: str) -> Optional[str]:
+        """Registrable domain của host; IP giữ nguyên, None nếu host là public suffix"""
+        try:
+            ipaddress.ip_address(host.strip("[]"))
+            return host
+        except ValueError:
+            pass
+
+        psl_path = settings.PUBLIC_SUFFIX_LIST_PATH
+        psl = get_public_suffix_list(Path(psl_path) if psl_path else None)
+        return psl.registrable_domain(host)
+
+    def blacklist_key(self, url: str, whitelist: Optional[DomainIndex] = None) -> str:
+        """
+        Key blacklist cho URL bị báo cáo: registrable domain để gom subdomain anh em, trừ khi
+        registrable domain (hoặc domain cha của nó) có trong `whitelist` hay là hosting dùng
+        chung. Khi đó giữ nguyên host: sites.google.com/view/... không được thành google.com
+        (whitelist sẽ thắng khi so khớp, và mọi subdomain của Google bị chặn theo).
+
+        Trả về "" nếu URL không hợp lệ hoặc host là public suffix (http://com.vn): key
+        com.vn sẽ chặn mọi site *.com.vn.
+        """
+        host = self._host(url)
+        domain = self._registrable(host) if host else None
+        if not domain or domain == host:
+            return domain or ""
+        if self.shared_hosting.lookup(domain) is not None:
+            return host
+        if whitelist is not None and whitelist.lookup(domain) is not None:
+            return host
+        return domain
+
+    def _host(self, url: str) -> str:
+        return self.normalize(url).split("/")[0].split("?")[0]
+
     def _filter_query(self, query: str) -> str:
         if not query:
             return ""
@@ -78,3 +151,7 @@ class URLNormalizer:
         kept.sort(key=lambda item: item[0])
         return urlencode(kept, doseq=True)
 
+
+# Normalizer dùng chung cho cả process (cache được chia sẻ giữa các request)
+url_normalizer = URLNormalizer()
+register_stats("url_normalizer_cache", url_normalizer.cache_stats)
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.schemas.whitelist import URLWhitelistMatchResult
+from app.services.domain_index import DomainHit, DomainIndex
+from app.services.domain_snapshot import DomainRecord, DomainSnapshotCache, domain_snapshot_cache
+from app.services.url_normalizer import URLNormalizer, url_normalizer
+
+
+def resolve_verdict(
+    host: str,
+    whitelist: DomainIndex[DomainRecord],
+    blacklist: DomainIndex[DomainRecord],
+) -> Tuple[str, Optional[DomainHit[DomainRecord]]]:
+    """
+    Kết luận cho host: ("whitelist" | "blacklist" | "unknown", domain khớp).
+
+    Whitelist được ưu tiên, trừ khi blacklist khớp cụ thể hơn (vd: whitelist google.com
+    nhưng blacklist sites.google.com). Mọi đường kiểm tra URL đều dùng hàm này.
+    """
+    whitelist_hit = whitelist.lookup(host)
+    blacklist_hit = blacklist.lookup(host)
+    if whitelist_hit and (
+        blacklist_hit is None or len(whitelist_hit.domain) >= len(blacklist_hit.domain)
+    ):
+        return "whitelist", whitelist_hit
+    if blacklist_hit:
+        return "blacklist", blacklist_hit
+    return "unknown", None
+
+
+class URLVerdictService:
+    """
+    Kiểm tra nhiều URL cùng lúc với whitelist/blacklist.
+
+    Cả hai danh sách được tra trong snapshot domain dùng chung của process
+    (`domain_snapshot_cache`) bằng `DomainIndex.lookup` và kết luận qua
+    `resolve_verdict`, giống WhitelistService: domain lưu kèm www. hay chữ hoa và
+    subdomain cho cùng kết luận ở mọi đường kiểm tra, và hot path không query DB.
+    """
+
+    def __init__(
+        self,
+        session: AsyncSession,
+        normalizer: Optional[URLNormalizer] = None,
+        snapshot_cache: Optional[DomainSnapshotCache] = None,
+    ):
+        self.session = session
+        self.normalizer = normalizer or url_normalizer
+        self.snapshot_cache = snapshot_cache or domain_snapshot_cache
+
+    async def check_urls(self, urls: Sequence[str]) -> List[URLWhitelistMatchResult]:
+        snapshot = await self.snapshot_cache.get(self.session)
+        return [
+            self._build_result(url, self.normalizer.normalize(url), snapshot.whitelist, snapshot.blacklist)
+            for url in urls
+        ]
+
+    def _build_result(
+        self,
+        url: str,
+        normalized: str,
+        whitelist: DomainIndex[DomainRecord],
+        blacklist: DomainIndex[DomainRecord],
+    ) -> URLWhitelistMatchResult:
+        if not normalized:
+            return URLWhitelistMatchResult(
+                original_url=url,
+                normalized_url="",
+                is_trusted=False,
+                match_type=None,
+                whitelist_entry_id=None,
+                matched_pattern=None,
+                reason="URL không hợp lệ"
+            )
+
+        verdict, hit = resolve_verdict(normalized.split("/")[0], whitelist, blacklist)
+
+        # 1. Whitelist (trừ khi blacklist khớp cụ thể hơn)
+        if verdict == "whitelist":
+            return URLWhitelistMatchResult(
+                original_url=url,
+                normalized_url=normalized,
+                is_trusted=True,
+                match_type="whitelist",
+                whitelist_entry_id=hit.value.id,
+                matched_pattern=hit.domain,
+                reason="✅ URL này an toàn (có trong whitelist)"
+            )
+
+        # 2. Sau đó tới blacklist
+        if verdict == "blacklist":
+            return URLWhitelistMatchResult(
+                original_url=url,
+                normalized_url=normalized,
+                is_trusted=False,
+                match_type="blacklist",
+                whitelist_entry_id=hit.value.id,
+                matched_pattern=hit.domain,
+                reason="⚠️ URL này đã bị báo cáo là lừa đảo"
+            )
+
+        # 3. Không có ở cả 2
+        return URLWhitelistMatchResult(
+            original_url=url,
+            normalized_url=normalized,
+            is_trusted=False,
+            match_type="unknown",
+            whitelist_entry_id=None,
+            matched_pattern=None,
+            reason="⚠️ URL này chưa có trong hệ thống, hãy cẩn thận vì chưa được xác nhận"
+        )
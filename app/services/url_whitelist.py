@@ -3,17 +3,22 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import List, Sequence, Optional
 
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.white_list_url import WhiteListURL
 from app.schemas.whitelist import URLWhitelistMatchResult
-from app.services.url_normalizer import URLNormalizer
+from app.services.domain_snapshot import (
+    DomainRecord,
+    DomainSnapshot,
+    DomainSnapshotCache,
+    domain_snapshot_cache,
+)
+from app.services.url_normalizer import URLNormalizer, url_normalizer
+from app.services.url_verdict import resolve_verdict
 
 
 @dataclass
 class _Match:
-    entry: Optional[WhiteListURL]
+    entry: Optional[DomainRecord]
     reason: Optional[str] = None
 
 
@@ -22,12 +27,14 @@ class WhitelistService:
         self,
         session: AsyncSession,
         normalizer: Optional[URLNormalizer] = None,
+        snapshot_cache: Optional[DomainSnapshotCache] = None,
     ):
         self.session = session
-        self.normalizer = normalizer or URLNormalizer()
+        self.normalizer = normalizer or url_normalizer
+        self.snapshot_cache = snapshot_cache or domain_snapshot_cache
 
     async def check_urls(self, urls: Sequence[str]) -> List[URLWhitelistMatchResult]:
-        entries = await self._get_whitelist_entries()
+        snapshot = await self.snapshot_cache.get(self.session)
         results: List[URLWhitelistMatchResult] = []
 
         for url in urls:
@@ -43,7 +50,7 @@ class WhitelistService:
                 )
                 continue
 
-            match = self._match(normalized, entries)
+            match = self._match(normalized, snapshot)
             results.append(
                 URLWhitelistMatchResult(
                     original_url=url,
@@ -57,39 +64,27 @@ class WhitelistService:
             )
         return results
 
-    async def _get_whitelist_entries(self) -> Sequence[WhiteListURL]:
-        """Lấy tất cả domain từ bảng white_listURL"""
-        stmt = select(WhiteListURL)
-        result = await self.session.execute(stmt)
-        return result.scalars().all()
-
-    def _match(self, normalized: str, entries: Sequence[WhiteListURL]) -> _Match:
-        """So sánh URL đã normalize với danh sách domain trong whitelist"""
+    def _match(self, normalized: str, snapshot: DomainSnapshot) -> _Match:
+        """
+        So sánh URL đã normalize với whitelist của snapshot. Blacklist khớp cụ thể
+        hơn thì thắng (cùng quy tắc với URLVerdictService), vd: sites.google.com khi
+        whitelist có google.com.
+        """
         if not normalized:
             return _Match(entry=None, reason="Không thể normalize URL")
 
         host, path, query = self._split_normalized(normalized)
-        
-        # Normalize hostname để so sánh
-        normalized_host = host.lower().strip()
-        if normalized_host.startswith("www."):
-            normalized_host = normalized_host[4:]
-        
-        # So sánh với từng domain trong whitelist
-        for entry in entries:
-            normalized_domain = entry.domain.lower().strip()
-            if normalized_domain.startswith("www."):
-                normalized_domain = normalized_domain[4:]
-            
-            # Exact match: domain khớp chính xác
-            if normalized_host == normalized_domain:
-                return _Match(entry=entry, reason="Khớp với domain trong whitelist")
-            
-            # Subdomain match: ví dụ sub.example.com khớp với example.com
-            if normalized_host.endswith(f".{normalized_domain}"):
-                return _Match(entry=entry, reason="Khớp với domain trong whitelist (subdomain)")
-        
-        return _Match(entry=None, reason="Không khớp whitelist")
+
+        # Tra cứu host và các domain cha của nó (sub.example.com → example.com)
+        verdict, hit = resolve_verdict(host, snapshot.whitelist, snapshot.blacklist)
+        if verdict == "blacklist":
+            return _Match(entry=None, reason="Khớp với domain trong blacklist")
+        if hit is None:
+            return _Match(entry=None, reason="Không khớp whitelist")
+
+        if hit.exact:
+            return _Match(entry=hit.value, reason="Khớp với domain trong whitelist")
+        return _Match(entry=hit.value, reason="Khớp với domain trong whitelist (subdomain)")
 
     def _split_normalized(self, normalized: str) -> tuple[str, str, Optional[str]]:
         """Tách URL đã normalize thành host, path, query"""
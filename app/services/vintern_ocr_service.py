@@ -1,26 +1,43 @@
+from functools import lru_cache
+from io import BytesIO
+
 import numpy as np
 import torch
-import torchvision.transforms as T
 from PIL import Image
-from torchvision.transforms.functional import InterpolationMode
-from transformers import AutoModel, AutoTokenizer
+from transformers import AutoModel, AutoTokenizer, StoppingCriteria, StoppingCriteriaList, TextStreamer
+import asyncio
 import logging
+import threading
+import time
+from typing import AsyncIterator, List, Optional
+
+from app.core.metrics import register_stats
+from app.services.inference_pool import (
+    InferencePool,
+    InferencePoolSaturated,
+    ocr_inference_pool,
+)
+from app.services.ocr_batching import OCRBatchScheduler
+from app.services.ocr_cache import OCRResultCache, ocr_result_cache
+from app.services.ocr_profiles import OCR_PROFILES, ocr_profile_latency, resolve_profile
 
 logger = logging.getLogger(__name__)
 
 IMAGENET_MEAN = (0.485, 0.456, 0.406)
 IMAGENET_STD = (0.229, 0.224, 0.225)
+# Hằng số normalize trên thang 0-255: (x/255 - mean)/std = (x - 255*mean) * 1/(255*std)
+_MEAN_255 = (np.array(IMAGENET_MEAN, dtype=np.float32) * 255).reshape(3, 1, 1)
+_INV_STD_255 = (1.0 / (np.array(IMAGENET_STD, dtype=np.float32) * 255)).reshape(3, 1, 1)
+
+# Chế độ độ chính xác khi chạy trên CPU
+CPU_PRECISIONS = ("fp32", "bf16", "int8")
 
+# Default prompt cho OCR tiếng Việt
+DEFAULT_OCR_PROMPT = '<image>\nTrích xuất toàn bộ text trong ảnh này. Trả về text đã được trích xuất, giữ nguyên dấu tiếng Việt.'
 
-def build_transform(input_size):
-    MEAN, STD = IMAGENET_MEAN, IMAGENET_STD
-    transform = T.Compose([
-        T.Lambda(lambda img: img.convert('RGB') if img.mode != 'RGB' else img),
-        T.Resize((input_size, input_size), interpolation=InterpolationMode.BICUBIC),
-        T.ToTensor(),
-        T.Normalize(mean=MEAN, std=STD)
-    ])
-    return transform
+# Số tile và generation config mặc định - giống hệt code mẫu (profile "accurate")
+DEFAULT_MAX_TILES = OCR_PROFILES["accurate"].max_tiles
+DEFAULT_GENERATION_CONFIG = OCR_PROFILES["accurate"].generation_config
 
 
 def find_closest_aspect_ratio(aspect_ratio, target_ratios, width, height, image_size):
@@ -39,52 +56,95 @@ def find_closest_aspect_ratio(aspect_ratio, target_ratios, width, height, image_
     return best_ratio
 
 
-def dynamic_preprocess(image, min_num=1, max_num=12, image_size=448, use_thumbnail=False):
-    orig_width, orig_height = image.size
-    aspect_ratio = orig_width / orig_height
-
-    # calculate the existing image aspect ratio
+@lru_cache(maxsize=None)
+def get_target_ratios(min_num, max_num):
+    """Bảng tỉ lệ lưới tile, tính một lần cho mỗi cặp (min_num, max_num)"""
     target_ratios = set(
         (i, j) for n in range(min_num, max_num + 1) for i in range(1, n + 1) for j in range(1, n + 1) if
         i * j <= max_num and i * j >= min_num)
-    target_ratios = sorted(target_ratios, key=lambda x: x[0] * x[1])
-
-    # find the closest aspect ratio to the target
-    target_aspect_ratio = find_closest_aspect_ratio(
-        aspect_ratio, target_ratios, orig_width, orig_height, image_size)
-
-    # calculate the target width and height
-    target_width = image_size * target_aspect_ratio[0]
-    target_height = image_size * target_aspect_ratio[1]
-    blocks = target_aspect_ratio[0] * target_aspect_ratio[1]
-
-    # resize the image
-    resized_img = image.resize((target_width, target_height))
-    processed_images = []
-    for i in range(blocks):
-        box = (
-            (i % (target_width // image_size)) * image_size,
-            (i // (target_width // image_size)) * image_size,
-            ((i % (target_width // image_size)) + 1) * image_size,
-            ((i // (target_width // image_size)) + 1) * image_size
-        )
-        # split the image
-        split_img = resized_img.crop(box)
-        processed_images.append(split_img)
-    assert len(processed_images) == blocks
-    if use_thumbnail and len(processed_images) != 1:
-        thumbnail_img = image.resize((image_size, image_size))
-        processed_images.append(thumbnail_img)
-    return processed_images
+    return tuple(sorted(target_ratios, key=lambda x: x[0] * x[1]))
+
+
+def preprocess_to_tensor(image, min_num=1, max_num=12, image_size=448, use_thumbnail=False):
+    """
+    Chia ảnh thành lưới tile (+ thumbnail) và normalize theo ImageNet, cho kết quả giống
+    dynamic_preprocess + build_transform trong code mẫu của Vintern (xem
+    app/tests/test_ocr_preprocess.py): resize một lần vào một buffer, cắt tile bằng
+    strided view (reshape/transpose, không crop từng tile) và normalize toàn bộ tile
+    bằng một phép tính vector.
+    Trả về tensor (số tile, 3, image_size, image_size).
+    """
+    orig_width, orig_height = image.size
+    cols, rows = find_closest_aspect_ratio(
+        orig_width / orig_height, get_target_ratios(min_num, max_num), orig_width, orig_height, image_size)
+    blocks = cols * rows
+    with_thumbnail = use_thumbnail and blocks != 1
+
+    out = np.empty((blocks + int(with_thumbnail), 3, image_size, image_size), dtype=np.float32)
+
+    # (H, W, 3) → (rows, S, cols, S, 3) → (rows, cols, 3, S, S): tile theo thứ tự hàng, giống crop
+    resized = np.asarray(image.resize((image_size * cols, image_size * rows)), dtype=np.float32)
+    out[:blocks].reshape(rows, cols, 3, image_size, image_size)[...] = (
+        resized.reshape(rows, image_size, cols, image_size, 3).transpose(0, 2, 4, 1, 3)
+    )
+    if with_thumbnail:
+        thumbnail = np.asarray(image.resize((image_size, image_size)), dtype=np.float32)
+        out[blocks] = thumbnail.transpose(2, 0, 1)
+
+    out -= _MEAN_255
+    out *= _INV_STD_255
+    return torch.from_numpy(out)
+
+
+def open_image(image_file, input_size=448, max_num=12, min_num=1):
+    """
+    Mở ảnh từ đường dẫn, file-like hoặc bytes (decode thẳng trong bộ nhớ, không ghi file tạm).
+    Với JPEG, dùng draft() để decoder thu nhỏ sớm về kích thước lưới tile sẽ dùng.
+    """
+    if isinstance(image_file, (bytes, bytearray, memoryview)):
+        image_file = BytesIO(image_file)
+    image = Image.open(image_file)
+
+    if image.format == 'JPEG':
+        width, height = image.size
+        grid = find_closest_aspect_ratio(
+            width / height, get_target_ratios(min_num, max_num), width, height, input_size)
+        # draft() chỉ giảm theo bậc 1/2, 1/4, 1/8 và luôn giữ kích thước >= kích thước yêu cầu
+        image.draft('RGB', (input_size * grid[0], input_size * grid[1]))
+
+    return image.convert('RGB')
 
 
 def load_image(image_file, input_size=448, max_num=12):
-    image = Image.open(image_file).convert('RGB')
-    transform = build_transform(input_size=input_size)
-    images = dynamic_preprocess(image, image_size=input_size, use_thumbnail=True, max_num=max_num)
-    pixel_values = [transform(image) for image in images]
-    pixel_values = torch.stack(pixel_values)
-    return pixel_values
+    image = open_image(image_file, input_size=input_size, max_num=max_num)
+    return preprocess_to_tensor(image, image_size=input_size, use_thumbnail=True, max_num=max_num)
+
+
+class _QueueTextStreamer(TextStreamer):
+    """Streamer của transformers đẩy từng đoạn text đã decode sang asyncio.Queue (thread-safe)"""
+
+    def __init__(self, tokenizer, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue):
+        super().__init__(tokenizer, skip_prompt=True, skip_special_tokens=True)
+        self.loop = loop
+        self.queue = queue
+
+    def on_finalized_text(self, text: str, stream_end: bool = False):
+        if text:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, text)
+
+
+class _CancelGeneration(StoppingCriteria):
+    """Dừng generate sớm khi client đã ngắt kết nối stream"""
+
+    def __init__(self):
+        self.event = threading.Event()
+
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        return self.event.is_set()
+
+
+async def _single_chunk(text: str) -> AsyncIterator[str]:
+    yield text
 
 
 class VinternOCRService:
@@ -93,10 +153,20 @@ class VinternOCRService:
     Code giống hệt mẫu chính thức từ Hugging Face
     """
     
-    def __init__(self, model_name: str = "5CD-AI/Vintern-1B-v3_5", use_gpu: bool = False, cache_dir: str = None):
+    def __init__(self, model_name: str = "5CD-AI/Vintern-1B-v3_5", use_gpu: bool = False, cache_dir: str = None,
+                 inference_pool: InferencePool = None, result_cache: OCRResultCache = None,
+                 cpu_precision: str = "fp32"):
         import os
+        if cpu_precision not in CPU_PRECISIONS:
+            raise ValueError(f"Unknown CPU precision: {cpu_precision!r} (expected one of {', '.join(CPU_PRECISIONS)})")
         self.model_name = model_name
+        self.inference_pool = inference_pool or ocr_inference_pool
+        self.result_cache = result_cache or ocr_result_cache
         self.use_gpu = use_gpu and torch.cuda.is_available()
+        # GPU luôn chạy bf16 như code mẫu; CPU theo cấu hình
+        self.precision = "bf16" if self.use_gpu else cpu_precision
+        # int8 dynamic quantization giữ activation ở fp32, chỉ weight của Linear là int8
+        self.pixel_dtype = torch.bfloat16 if self.precision == "bf16" else torch.float32
         # Sử dụng cache_dir từ parameter, hoặc environment variable HF_HOME, hoặc default
         # Trong Docker, HF_HOME sẽ được set thành /app/.cache/huggingface
         if cache_dir:
@@ -108,7 +178,7 @@ class VinternOCRService:
             home = os.getenv('HOME', '/app')
             self.cache_dir = os.path.join(home, '.cache', 'huggingface')
         
-        logger.info(f"Loading Vintern model: {model_name}")
+        logger.info(f"Loading Vintern model: {model_name} ({self.precision})")
         logger.info(f"Using cache directory: {self.cache_dir}")
         
         try:
@@ -116,7 +186,7 @@ class VinternOCRService:
             self.model = AutoModel.from_pretrained(
                 model_name,
                 cache_dir=self.cache_dir,
-                torch_dtype=torch.bfloat16 if self.use_gpu else torch.float32,
+                torch_dtype=self.pixel_dtype,
                 low_cpu_mem_usage=True,
                 trust_remote_code=True,
                 use_flash_attn=False,
@@ -124,6 +194,10 @@ class VinternOCRService:
             
             if self.use_gpu:
                 self.model = self.model.cuda()
+            elif self.precision == "int8":
+                self.model = torch.ao.quantization.quantize_dynamic(
+                    self.model, {torch.nn.Linear}, dtype=torch.qint8
+                )
             
             # Load tokenizer - giống hệt code mẫu, thêm cache_dir để persist
             self.tokenizer = AutoTokenizer.from_pretrained(
@@ -137,71 +211,171 @@ class VinternOCRService:
         except Exception as e:
             logger.error(f"Error loading Vintern model: {str(e)}", exc_info=True)
             raise
+
+        # Gom các request OCR đồng thời thành micro-batch
+        self.batcher = OCRBatchScheduler(self._run_batch, self.inference_pool)
+        register_stats("ocr_batching", self.batcher.stats)
     
-    async def extract_text(self, image_bytes: bytes, prompt: str = None) -> str:
+    async def extract_text(self, image_bytes: bytes, prompt: str = None, profile: Optional[str] = None) -> str:
         """
-        Trích xuất text từ ảnh - giống hệt code mẫu
+        Trích xuất text từ ảnh
+        Ảnh đã OCR trước đó (cùng nội dung, prompt và config) được trả từ cache.
+        Tiền xử lý ảnh chạy ngoài event loop; inference được gom micro-batch với các
+        request đồng thời khác và chạy trong inference pool. Ném InferencePoolSaturated
+        nếu hàng đợi OCR đã đầy (kiểm tra trước khi tiền xử lý ảnh).
         Args:
             image_bytes: Bytes của ảnh
             prompt: Prompt tùy chỉnh (mặc định: prompt OCR tiếng Việt)
+            profile: Tên OCR profile (fast/balanced/accurate/adaptive, mặc định OCR_PROFILE)
         Returns:
             Text đã được trích xuất
         """
+        question = DEFAULT_OCR_PROMPT if prompt is None else prompt
+        ocr_profile = resolve_profile(profile, image_bytes)
+        generation_config = ocr_profile.generation_config
+        cache_params = {
+            "model": self.model_name,
+            "precision": self.precision,
+            "prompt": question,
+            "generation_config": generation_config,
+            "max_num": ocr_profile.max_tiles,
+        }
         try:
-            # Tạo file tạm từ bytes để load_image có thể đọc
-            import tempfile
-            import os
-            
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as tmp_file:
-                tmp_file.write(image_bytes)
-                tmp_file_path = tmp_file.name
-            
-            try:
-                # Load và preprocess image - giống hệt code mẫu
-                pixel_values = load_image(tmp_file_path, max_num=6)
-                
-                # Move to device - giống hệt code mẫu
-                if self.use_gpu:
-                    pixel_values = pixel_values.to(torch.bfloat16).cuda()
-                else:
-                    pixel_values = pixel_values.to(torch.float32).cpu()
-                
-                # Generation config - giống hệt code mẫu
-                generation_config = dict(
-                    max_new_tokens=1024, 
-                    do_sample=False, 
-                    num_beams=3, 
-                    repetition_penalty=2.5
-                )
-                
-                # Default prompt cho OCR tiếng Việt
-                if prompt is None:
-                    question = '<image>\nTrích xuất toàn bộ text trong ảnh này. Trả về text đã được trích xuất, giữ nguyên dấu tiếng Việt.'
-                else:
-                    question = prompt
-                
-                # Generate - giống hệt code mẫu
-                with torch.no_grad():
-                    response, history = self.model.chat(
-                        self.tokenizer, 
-                        pixel_values, 
-                        question, 
-                        generation_config, 
-                        history=None, 
-                        return_history=True
-                    )
-                
-                text = response.strip()
-                
-                logger.info(f"Extracted {len(text)} characters with Vintern OCR")
-                return text
-                
-            finally:
-                # Xóa file tạm
-                if os.path.exists(tmp_file_path):
-                    os.unlink(tmp_file_path)
-            
+            cache_key, cached = await asyncio.to_thread(self.result_cache.lookup, image_bytes, cache_params)
+            if cached is not None:
+                logger.info(f"OCR cache hit ({len(cached)} characters)")
+                return cached
+
+            # Hàng đợi đầy thì trả 429 ngay, không tốn CPU tiền xử lý ảnh
+            self.inference_pool.check_capacity()
+            started = time.perf_counter()
+            pixel_values = await asyncio.to_thread(self._prepare_pixel_values, image_bytes, ocr_profile.max_tiles)
+            text = await self.batcher.submit(pixel_values, question, generation_config)
+        except InferencePoolSaturated:
+            # Quá tải là tình huống bình thường, caller trả 429 và log ở mức warning
+            raise
         except Exception as e:
             logger.error(f"Error extracting text with Vintern: {str(e)}", exc_info=True)
             raise
 
+        elapsed = time.perf_counter() - started
+        ocr_profile_latency.record(ocr_profile.name, elapsed, pixel_values.size(0))
+        await asyncio.to_thread(self.result_cache.store, cache_key, text)
+        logger.info(f"Extracted {len(text)} characters with Vintern OCR "
+                    f"(profile={ocr_profile.name}, tiles={pixel_values.size(0)}, {elapsed:.2f}s)")
+        return text
+
+    async def stream_text(self, image_bytes: bytes, prompt: str = None,
+                          profile: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Như extract_text nhưng trả về async iterator các đoạn text ngay khi model sinh ra.
+        Streaming chỉ hỗ trợ greedy decoding nên num_beams của profile bị ép về 1 và
+        request không đi qua micro-batch. Job được đưa vào inference pool trước khi
+        trả iterator, nên InferencePoolSaturated được ném ngay tại đây (trước cả bước
+        tiền xử lý ảnh).
+        Args:
+            image_bytes: Bytes của ảnh
+            prompt: Prompt tùy chỉnh (mặc định: prompt OCR tiếng Việt)
+            profile: Tên OCR profile (fast/balanced/accurate/adaptive, mặc định OCR_PROFILE)
+        Returns:
+            Async iterator các đoạn text
+        """
+        question = DEFAULT_OCR_PROMPT if prompt is None else prompt
+        ocr_profile = resolve_profile(profile, image_bytes)
+        generation_config = {**ocr_profile.generation_config, "num_beams": 1}
+        cache_params = {
+            "model": self.model_name,
+            "precision": self.precision,
+            "prompt": question,
+            "generation_config": generation_config,
+            "max_num": ocr_profile.max_tiles,
+        }
+        cache_key, cached = await asyncio.to_thread(self.result_cache.lookup, image_bytes, cache_params)
+        if cached is not None:
+            logger.info(f"OCR cache hit ({len(cached)} characters)")
+            return _single_chunk(cached)
+
+        self.inference_pool.check_capacity()
+        started = time.perf_counter()
+        pixel_values = await asyncio.to_thread(self._prepare_pixel_values, image_bytes, ocr_profile.max_tiles)
+        queue: asyncio.Queue = asyncio.Queue()
+        streamer = _QueueTextStreamer(self.tokenizer, asyncio.get_running_loop(), queue)
+        cancel = _CancelGeneration()
+        future = self.inference_pool.submit(
+            self._generate_streaming, pixel_values, question, generation_config, streamer, cancel
+        )
+        # Token và tín hiệu kết thúc cùng được đẩy từ worker thread nên giữ đúng thứ tự
+        future.add_done_callback(lambda _future: queue.put_nowait(None))
+
+        async def chunks() -> AsyncIterator[str]:
+            try:
+                while True:
+                    chunk = await queue.get()
+                    if chunk is None:
+                        break
+                    yield chunk
+            finally:
+                if not future.done():
+                    cancel.event.set()
+
+            text = await future
+            elapsed = time.perf_counter() - started
+            ocr_profile_latency.record(f"{ocr_profile.name}-stream", elapsed, pixel_values.size(0))
+            await asyncio.to_thread(self.result_cache.store, cache_key, text)
+            logger.info(f"Streamed {len(text)} characters with Vintern OCR "
+                        f"(profile={ocr_profile.name}, tiles={pixel_values.size(0)}, {elapsed:.2f}s)")
+
+        return chunks()
+
+    def _generate_streaming(self, pixel_values: torch.Tensor, question: str, generation_config: dict,
+                            streamer: TextStreamer, cancel: StoppingCriteria) -> str:
+        """Generate một ảnh, đẩy token ra streamer (blocking, chạy trong inference pool)"""
+        config = dict(generation_config, streamer=streamer, stopping_criteria=StoppingCriteriaList([cancel]))
+        with torch.no_grad():
+            response = self.model.chat(self.tokenizer, pixel_values, question, config)
+        return response.strip()
+
+    def extract_text_sync(self, image_bytes: bytes, prompt: str = None) -> str:
+        """
+        Trích xuất text từ một ảnh, blocking: không qua cache, micro-batch hay
+        inference pool. Dùng cho script offline (vd: ocr_precision_check), không gọi từ
+        event loop.
+        """
+        question = DEFAULT_OCR_PROMPT if prompt is None else prompt
+        pixel_values = self._prepare_pixel_values(image_bytes)
+        return self._run_batch([pixel_values], [question], DEFAULT_GENERATION_CONFIG)[0]
+
+    def _prepare_pixel_values(self, image_bytes: bytes, max_num: int = DEFAULT_MAX_TILES) -> torch.Tensor:
+        """Load và preprocess ảnh thành tensor tile, decode thẳng từ bytes trong bộ nhớ"""
+        pixel_values = load_image(image_bytes, max_num=max_num)
+
+        # Move to device, dtype khớp với weight của model
+        if self.use_gpu:
+            return pixel_values.to(torch.bfloat16).cuda()
+        return pixel_values.to(self.pixel_dtype).cpu()
+
+    def _run_batch(self, pixel_values_list: List[torch.Tensor], questions: List[str],
+                   generation_config: dict) -> List[str]:
+        """Chạy model cho một batch ảnh (blocking, gọi trong worker thread của inference pool)"""
+        with torch.no_grad():
+            if len(pixel_values_list) == 1:
+                # Generate - giống hệt code mẫu
+                response, history = self.model.chat(
+                    self.tokenizer,
+                    pixel_values_list[0],
+                    questions[0],
+                    dict(generation_config),
+                    history=None,
+                    return_history=True
+                )
+                return [response.strip()]
+
+            # Một lần forward cho cả batch: ghép tile của mọi ảnh, model tách lại theo num_patches_list
+            responses = self.model.batch_chat(
+                self.tokenizer,
+                torch.cat(pixel_values_list, dim=0),
+                num_patches_list=[pixel_values.size(0) for pixel_values in pixel_values_list],
+                questions=questions,
+                generation_config=dict(generation_config),
+            )
+            return [response.strip() for response in responses]
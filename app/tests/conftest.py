@@ -0,0 +1,53 @@
+import os
+
+# Settings bắt buộc khi import app; các test ở đây không kết nối Postgres
+os.environ.setdefault("DATABASE_URL", "postgresql://test@localhost/test")
+os.environ.setdefault("TEST_DATABASE_URL", "postgresql://test@localhost/test")
+os.environ.setdefault("SECRET_KEY", "test")
+
+import pytest  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+import app.models  # noqa: E402,F401 - đăng ký mọi bảng vào Base.metadata
+from app.db import Base  # noqa: E402
+
+
+class SyncBackedSession:
+    """Bọc Session sync trên SQLite thành interface async của AsyncSession"""
+
+    def __init__(self, session: Session):
+        self._session = session
+
+    async def execute(self, statement):
+        return self._session.execute(statement)
+
+    async def scalar(self, statement):
+        return self._session.scalar(statement)
+
+    def add(self, instance):
+        self._session.add(instance)
+
+    async def commit(self):
+        self._session.commit()
+
+    async def rollback(self):
+        self._session.rollback()
+
+    async def refresh(self, instance):
+        self._session.refresh(instance)
+
+
+@pytest.fixture
+def db():
+    """Session sync trên SQLite in-memory, đủ mọi bảng của app"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+
+
+@pytest.fixture
+def session(db):
+    """Cùng database với `db`, qua interface AsyncSession cho code async của app"""
+    return SyncBackedSession(db)
@@ -0,0 +1,41 @@
+import asyncio
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import insert, update
+
+from app.models.white_list_url import WhiteListURL
+from app.services.domain_snapshot import DomainSnapshotCache
+
+T0 = datetime(2025, 1, 1)
+
+
+def add_whitelist(db, entry_id, domain):
+    db.execute(
+        insert(WhiteListURL).values(
+            id=entry_id,
+            domain=domain,
+            first_seen=date(2025, 1, 1),
+            last_seen=date(2025, 1, 1),
+            updated=T0,
+        )
+    )
+    db.commit()
+
+
+def test_in_place_edit_reloads_snapshot(db, session):
+    add_whitelist(db, 1, "vietcombank.com.vn")
+    add_whitelist(db, 2, "google.com")
+    cache = DomainSnapshotCache(probe_interval=0)
+    assert "vietcombank.com.vn" in asyncio.run(cache.get(session)).whitelist
+
+    # Worker khác / crawler sửa domain tại chỗ: count, max id và last_seen không đổi
+    db.execute(
+        update(WhiteListURL)
+        .where(WhiteListURL.id == 1)
+        .values(domain="vcb.com.vn", updated=T0 + timedelta(seconds=1))
+    )
+    db.commit()
+    whitelist = asyncio.run(cache.get(session)).whitelist
+
+    assert "vietcombank.com.vn" not in whitelist
+    assert "vcb.com.vn" in whitelist
@@ -0,0 +1,49 @@
+import asyncio
+from io import BytesIO
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from PIL import UnidentifiedImageError
+from starlette.datastructures import Headers
+
+from app.api import image_processing
+
+
+class BrokenOCRService:
+    def __init__(self, error):
+        self.error = error
+
+    async def stream_text(self, image_bytes, profile=None):
+        raise self.error
+
+
+def upload(content):
+    return UploadFile(
+        BytesIO(content),
+        filename="screenshot.png",
+        headers=Headers({"content-type": "image/png"}),
+    )
+
+
+@pytest.mark.parametrize(
+    "error, status_code",
+    [
+        (UnidentifiedImageError("cannot identify image file"), 400),
+        (RuntimeError("CUDA out of memory"), 500),
+    ],
+)
+def test_stream_maps_errors_before_streaming(monkeypatch, error, status_code):
+    async def get():
+        return BrokenOCRService(error)
+
+    monkeypatch.setattr(image_processing.ocr_provider, "get", get)
+
+    # Gọi thẳng endpoint nên phải truyền đủ các field form
+    endpoint = image_processing.extract_text_stream(
+        None, image=upload(b"not an image"), raw_text_input=None, ocr_profile=None
+    )
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(endpoint)
+
+    assert raised.value.status_code == status_code
+    assert raised.value.detail
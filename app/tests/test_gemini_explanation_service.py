@@ -0,0 +1,31 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from app.services.classification_cache import ClassificationCache
+from app.services.gemini_explanation_service import GeminiExplanationService
+
+
+class SlowCaches:
+    """Tạo context cache chậm hơn timeout của request"""
+
+    def create(self, **kwargs):
+        time.sleep(0.5)
+        return SimpleNamespace(name="cachedContents/slow")
+
+
+def test_timeout_covers_context_cache_creation():
+    service = GeminiExplanationService(
+        api_key="test", cache=ClassificationCache(), context_cache_ttl_seconds=600
+    )
+    service.client = SimpleNamespace(caches=SlowCaches())
+
+    async def classify():
+        started = time.monotonic()
+        result = await service.aclassify_and_explain("Chuyển khoản ngay", timeout=0.05)
+        return result, time.monotonic() - started
+
+    result, elapsed = asyncio.run(classify())
+
+    assert elapsed < 0.4
+    assert result == service.fallback_classification([], [], "Chuyển khoản ngay")
@@ -0,0 +1,66 @@
+import pytest
+
+from app.core.config import settings
+from app.services.gemini_prompt import CHARS_PER_TOKEN, OMISSION_MARKER, compact_text
+from app.services.phone import find_phones
+from app.services.text_cleaning import TextCleaner
+
+FILLER = "Hôm nay trời đẹp, mình đi làm về muộn nên chưa kịp trả lời tin nhắn của bạn. " * 12
+
+LONG_MESSAGE = (
+    FILLER
+    + "Bạn đã trúng thưởng, gọi ngay 0912 345 678 để nhận quà. "
+    + FILLER
+    + "Truy cập https://vietcombank-xacminh.top/otp để xác minh tài khoản. "
+    + FILLER
+    + "Hoặc liên hệ tổng đài +84 987 654 321 để được hỗ trợ. "
+    + FILLER
+    + "Nhận quà tại http://qua-tang-tri-an.xyz/nhan-qua?ma=123 trước 24h. "
+    + FILLER
+    + "Chuyển phí 500.000đ vào tài khoản theo hướng dẫn, hạn chót hôm nay."
+)
+
+text_cleaner = TextCleaner()
+
+
+@pytest.mark.parametrize(
+    "max_tokens", [settings.GEMINI_PROMPT_TEXT_TOKENS, settings.GEMINI_BATCH_PROMPT_TEXT_TOKENS, 64]
+)
+def test_compaction_keeps_every_url_and_phone(max_tokens):
+    urls = text_cleaner.extract_urls(LONG_MESSAGE)
+    phones = find_phones(LONG_MESSAGE)
+    assert len(urls) == 2 and len(phones) == 2
+
+    compacted = compact_text(LONG_MESSAGE, max_tokens, urls)
+
+    assert OMISSION_MARKER in compacted
+    for url in urls:
+        assert url in compacted
+    for phone in phones:
+        assert phone.raw in compacted
+    # Số được trích lại từ text rút gọn phải giống hệt số trích từ text gốc
+    assert [match.national for match in find_phones(compacted)] == [phone.national for phone in phones]
+
+
+def test_compaction_respects_budget_and_keeps_tail():
+    max_tokens = settings.GEMINI_PROMPT_TEXT_TOKENS
+    compacted = compact_text(LONG_MESSAGE, max_tokens, text_cleaner.extract_urls(LONG_MESSAGE))
+
+    # Phần vượt ngân sách chỉ là các dấu "[…]" nối đoạn
+    assert len(compacted) <= max_tokens * CHARS_PER_TOKEN + 10 * len(OMISSION_MARKER)
+    assert compacted.startswith("Hôm nay trời đẹp")
+    assert compacted.endswith("hạn chót hôm nay.")
+
+
+def test_evidence_exceeding_budget_is_still_kept():
+    urls = [f"https://lua-dao-{i}.top/xac-minh-tai-khoan" for i in range(10)]
+    message = FILLER + " ".join(urls) + FILLER
+
+    compacted = compact_text(message, 32, urls)
+
+    for url in urls:
+        assert url in compacted
+
+
+def test_short_message_is_unchanged():
+    assert compact_text("alo bạn ơi", 384) == "alo bạn ơi"
@@ -0,0 +1,44 @@
+import sqlite3
+import time
+
+from app.services import ocr_cache
+from app.services.ocr_cache import OCRCacheKey, OCRResultCache
+
+
+def disk_keys(path):
+    with sqlite3.connect(path) as conn:
+        return {key for key, in conn.execute("SELECT key FROM ocr_cache")}
+
+
+def test_disk_tier_is_trimmed_to_max_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(ocr_cache, "_PRUNE_EVERY", 4)
+    path = str(tmp_path / "ocr.sqlite")
+    cache = OCRResultCache(
+        maxsize=0, sqlite_path=path, sqlite_max_rows=3, sqlite_ttl_seconds=0
+    )
+
+    for i in range(8):
+        cache.store(OCRCacheKey(content=f"k{i}"), f"text {i}")
+        time.sleep(0.001)
+
+    # Lần dọn cuối ở lần ghi thứ 8: còn 3 dòng mới nhất
+    assert disk_keys(path) == {"k5", "k6", "k7"}
+
+
+def test_expired_rows_are_ignored_and_pruned_on_open(tmp_path):
+    path = str(tmp_path / "ocr.sqlite")
+    cache = OCRResultCache(
+        maxsize=0, sqlite_path=path, sqlite_max_rows=0, sqlite_ttl_seconds=60
+    )
+    cache.store(OCRCacheKey(content="fresh"), "fresh text")
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "INSERT INTO ocr_cache(key, text, created) VALUES (?, ?, ?)",
+            ("old", "old text", time.time() - 3600),
+        )
+
+    assert cache._get("old") is None
+    assert cache._get("fresh") == "fresh text"
+
+    OCRResultCache(maxsize=0, sqlite_path=path, sqlite_ttl_seconds=60)._get_connection()
+    assert disk_keys(path) == {"fresh"}
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+T = pytest.importorskip("torchvision.transforms")
+pytest.importorskip("transformers")
+
+from PIL import Image  # noqa: E402
+from torchvision.transforms.functional import InterpolationMode  # noqa: E402
+
+from app.services.vintern_ocr_service import (  # noqa: E402
+    IMAGENET_MEAN,
+    IMAGENET_STD,
+    find_closest_aspect_ratio,
+    get_target_ratios,
+    preprocess_to_tensor,
+)
+
+
+# Code mẫu của Vintern (model card) trước khi vector hoá, giữ lại làm chuẩn so sánh
+def reference_transform(input_size):
+    return T.Compose([
+        T.Lambda(lambda img: img.convert('RGB') if img.mode != 'RGB' else img),
+        T.Resize((input_size, input_size), interpolation=InterpolationMode.BICUBIC),
+        T.ToTensor(),
+        T.Normalize(mean=IMAGENET_MEAN, std=IMAGENET_STD)
+    ])
+
+
+def reference_dynamic_preprocess(image, min_num=1, max_num=12, image_size=448, use_thumbnail=False):
+    orig_width, orig_height = image.size
+    target_aspect_ratio = find_closest_aspect_ratio(
+        orig_width / orig_height, get_target_ratios(min_num, max_num), orig_width, orig_height, image_size)
+    target_width = image_size * target_aspect_ratio[0]
+    target_height = image_size * target_aspect_ratio[1]
+    blocks = target_aspect_ratio[0] * target_aspect_ratio[1]
+
+    resized_img = image.resize((target_width, target_height))
+    processed_images = []
+    for i in range(blocks):
+        box = (
+            (i % (target_width // image_size)) * image_size,
+            (i // (target_width // image_size)) * image_size,
+            ((i % (target_width // image_size)) + 1) * image_size,
+            ((i // (target_width // image_size)) + 1) * image_size
+        )
+        processed_images.append(resized_img.crop(box))
+    if use_thumbnail and len(processed_images) != 1:
+        processed_images.append(image.resize((image_size, image_size)))
+    return processed_images
+
+
+def reference_load(image, max_num, image_size=448):
+    transform = reference_transform(image_size)
+    tiles = reference_dynamic_preprocess(image, image_size=image_size, use_thumbnail=True, max_num=max_num)
+    return torch.stack([transform(tile) for tile in tiles])
+
+
+@pytest.mark.parametrize("size", [(448, 448), (1080, 2340), (1920, 1080), (300, 1200), (2000, 500)])
+@pytest.mark.parametrize("max_num", [2, 6, 12])
+def test_vectorized_preprocess_matches_reference(size, max_num):
+    rng = np.random.RandomState(sum(size) + max_num)
+    image = Image.fromarray(rng.randint(0, 256, size=(size[1], size[0], 3), dtype=np.uint8))
+
+    expected = reference_load(image, max_num)
+    actual = preprocess_to_tensor(image, image_size=448, use_thumbnail=True, max_num=max_num)
+
+    assert actual.shape == expected.shape
+    assert actual.dtype == expected.dtype
+    assert torch.max(torch.abs(actual - expected)).item() < 1e-5
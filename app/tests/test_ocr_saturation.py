@@ -0,0 +1,51 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.services.inference_pool import InferencePool, InferencePoolSaturated
+from app.services.ocr_cache import OCRResultCache
+
+
+async def run_saturated(check):
+    """Chạy `check(pool)` khi pool 1 worker, không hàng đợi, đang bận một job"""
+    pool = InferencePool(workers=1, max_queue=0)
+    release = threading.Event()
+    busy = pool.submit(release.wait)
+    try:
+        await check(pool)
+    finally:
+        release.set()
+        await busy
+
+
+def test_check_capacity_raises_when_full():
+    async def check(pool):
+        with pytest.raises(InferencePoolSaturated):
+            pool.check_capacity()
+
+    asyncio.run(run_saturated(check))
+
+
+def test_saturated_ocr_skips_preprocessing(caplog):
+    pytest.importorskip("torch")
+    pytest.importorskip("transformers")
+    from app.services.vintern_ocr_service import VinternOCRService
+
+    def prepare(*args):
+        raise AssertionError("ảnh không được tiền xử lý khi hàng đợi đã đầy")
+
+    async def check(pool):
+        service = VinternOCRService.__new__(VinternOCRService)
+        service.model_name = "test"
+        service.precision = "fp32"
+        service.inference_pool = pool
+        service.result_cache = OCRResultCache(maxsize=0, sqlite_path="")
+        service._prepare_pixel_values = prepare
+        with pytest.raises(InferencePoolSaturated):
+            await service.extract_text(b"image")
+        with pytest.raises(InferencePoolSaturated):
+            await service.stream_text(b"image")
+
+    asyncio.run(run_saturated(check))
+    assert not [record for record in caplog.records if record.levelname == "ERROR"]
@@ -0,0 +1,110 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, update
+
+from app.models.blacklist_phone import BlackListPhone
+from app.services.phone_blacklist import BloomFilter, PhoneBlacklistSet, phone_key
+
+T0 = datetime(2025, 1, 1)
+
+
+def add_phone(db, entry_id, value, updated):
+    db.execute(insert(BlackListPhone).values(id=entry_id, value=value, created=updated, updated=updated))
+    db.commit()
+
+
+def refresh(blacklist, session):
+    blacklist.mark_stale()
+    asyncio.run(blacklist.ensure_fresh(session))
+
+
+def test_phone_key_keeps_leading_zero():
+    assert phone_key("0912345678") == 84912345678
+    assert phone_key("+84912345678") == phone_key("0912345678")
+    assert phone_key("912345678") is None
+    assert phone_key("00912345678") is None
+    assert phone_key("0123") is None
+    assert phone_key("") is None
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(1000, 0.01)
+    keys = [84900000000 + i * 7919 for i in range(1000)]
+    for key in keys:
+        bloom.add(key)
+
+    assert all(key in bloom for key in keys)
+    false_positives = sum(84100000000 + i in bloom for i in range(10000))
+    assert false_positives < 500
+
+
+def test_numbers_without_leading_zero_do_not_match(db, session):
+    add_phone(db, 1, "0912345678", T0)
+    blacklist = PhoneBlacklistSet(probe_interval=60)
+    refresh(blacklist, session)
+
+    assert blacklist.contains("0912345678") is True
+    # Không phải số hợp lệ: không được trùng với 0912345678, caller tra DB theo value
+    assert blacklist.contains("912345678") is None
+    assert blacklist.contains("00912345678") is None
+    assert blacklist.contains("0912345679") is False
+
+
+def test_new_rows_are_added_incrementally(db, session):
+    add_phone(db, 1, "0912345678", T0)
+    blacklist = PhoneBlacklistSet(probe_interval=60)
+    refresh(blacklist, session)
+
+    add_phone(db, 2, "0987654321", T0 + timedelta(seconds=1))
+    refresh(blacklist, session)
+
+    assert blacklist.contains("0987654321") is True
+    assert len(blacklist) == 2
+
+
+def test_edited_row_drops_old_value(db, session):
+    add_phone(db, 1, "0912345678", T0)
+    add_phone(db, 2, "0987654321", T0)
+    blacklist = PhoneBlacklistSet(probe_interval=60)
+    refresh(blacklist, session)
+
+    # Worker khác sửa value, process này không được invalidate()
+    db.execute(
+        update(BlackListPhone)
+        .where(BlackListPhone.id == 1)
+        .values(value="0911111111", updated=T0 + timedelta(seconds=1))
+    )
+    db.commit()
+    refresh(blacklist, session)
+
+    assert blacklist.contains("0912345678") is False
+    assert blacklist.contains("0911111111") is True
+    assert len(blacklist) == 2
+
+
+def test_deleted_row_is_removed(db, session):
+    add_phone(db, 1, "0912345678", T0)
+    add_phone(db, 2, "0987654321", T0)
+    blacklist = PhoneBlacklistSet(probe_interval=60)
+    refresh(blacklist, session)
+
+    db.execute(delete(BlackListPhone).where(BlackListPhone.id == 1))
+    db.commit()
+    refresh(blacklist, session)
+
+    assert blacklist.contains("0912345678") is False
+    assert blacklist.contains("0987654321") is True
+
+
+def test_delete_plus_insert_with_same_row_count_is_detected(db, session):
+    add_phone(db, 1, "0912345678", T0)
+    blacklist = PhoneBlacklistSet(probe_interval=60)
+    refresh(blacklist, session)
+
+    db.execute(delete(BlackListPhone).where(BlackListPhone.id == 1))
+    add_phone(db, 2, "0987654321", T0 + timedelta(seconds=1))
+    refresh(blacklist, session)
+
+    assert blacklist.contains("0912345678") is False
+    assert blacklist.contains("0987654321") is True
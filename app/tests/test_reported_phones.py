@@ -0,0 +1,28 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import insert, select
+
+from app.api.reported_phones import create_reported_phone
+from app.models.blacklist_phone import BlackListPhone
+from app.schemas.blacklist import BlackListPhoneCreate
+
+
+def test_concurrent_duplicate_returns_conflict(db, session, monkeypatch):
+    db.execute(insert(BlackListPhone).values(id=1, value="0912345678"))
+    db.commit()
+
+    # Bước kiểm tra trùng thấy "chưa có", giống request thứ hai chạy song song trước khi
+    # request đầu commit
+    async def no_duplicate(statement):
+        return None
+
+    monkeypatch.setattr(session, "scalar", no_duplicate)
+    payload = BlackListPhoneCreate(value="+84 912 345 678")
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(create_reported_phone(payload, session))
+
+    assert error.value.status_code == 409
+    assert db.execute(select(BlackListPhone.value)).scalars().all() == ["0912345678"]
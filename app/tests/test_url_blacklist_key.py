@@ -0,0 +1,72 @@
+import asyncio
+
+from app.services.domain_index import DomainIndex
+from app.services.domain_snapshot import DomainRecord
+from app.services.url_normalizer import URLNormalizer
+from app.services.url_verdict import URLVerdictService
+from app.tests.test_url_verdict import StaticSnapshotCache
+
+normalizer = URLNormalizer()
+
+
+def index(entries):
+    return DomainIndex((domain, DomainRecord(id=entry_id, domain=domain)) for domain, entry_id in entries.items())
+
+
+def verdict(url, whitelist, blacklist):
+    service = URLVerdictService(session=None, normalizer=normalizer)
+    return service._build_result(url, normalizer.normalize(url), index(whitelist), index(blacklist))
+
+
+def test_registrable_domain_groups_sibling_subdomains():
+    assert normalizer.blacklist_key("https://a.scam.com.vn/login") == "scam.com.vn"
+    assert normalizer.blacklist_key("http://scam.com.vn") == "scam.com.vn"
+
+
+def test_shared_hosting_keeps_full_host():
+    url = "https://sites.google.com/view/vcb-xac-minh"
+    assert normalizer.blacklist_key(url) == "sites.google.com"
+    assert normalizer.blacklist_key("https://vcb-otp.web.app/") == "vcb-otp.web.app"
+
+
+def test_whitelisted_parent_keeps_full_host():
+    whitelist = DomainIndex([("vietcombank.com.vn", 1)])
+    url = "https://xac-minh.vietcombank.com.vn/otp"
+    assert normalizer.blacklist_key(url, whitelist) == "xac-minh.vietcombank.com.vn"
+    assert normalizer.blacklist_key(url) == "vietcombank.com.vn"
+
+
+def test_reported_page_on_whitelisted_host_stays_blacklisted():
+    url = "https://sites.google.com/view/vcb-xac-minh"
+    key = normalizer.blacklist_key(url, DomainIndex([("google.com", 1)]))
+
+    result = verdict(url, {"google.com": 1}, {key: 2})
+
+    assert result.match_type == "blacklist"
+    assert not result.is_trusted
+    # Host khác của Google không bị chặn theo
+    assert verdict("https://mail.google.com/", {"google.com": 1}, {key: 2}).match_type == "whitelist"
+
+
+def test_public_suffix_is_never_a_key():
+    assert normalizer.blacklist_key("http://com.vn") == ""
+    assert normalizer.blacklist_key("https://github.io/phish") == ""
+    assert normalizer.blacklist_key("http://1.2.3.4/login") == "1.2.3.4"
+
+
+def test_approved_page_on_whitelisted_host_is_blacklisted_by_pipeline(monkeypatch):
+    from app.api import image_processing
+    from app.services import url_verdict
+
+    url = "https://sites.google.com/view/vcb-xac-minh"
+    # Key admin approve tạo ra khi google.com nằm trong whitelist
+    key = normalizer.blacklist_key(url, index({"google.com": 1}))
+    cache = StaticSnapshotCache([(1, "google.com")], [(2, key)])
+    monkeypatch.setattr(url_verdict, "domain_snapshot_cache", cache)
+
+    results = asyncio.run(
+        image_processing.check_whitelist(None, [url, "https://docs.google.com/x"])
+    )
+
+    assert [r.match_type for r in results] == ["blacklist", "whitelist"]
+    assert [r.is_trusted for r in results] == [False, True]
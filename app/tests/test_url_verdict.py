@@ -0,0 +1,59 @@
+import asyncio
+
+from app.services.domain_index import DomainIndex
+from app.services.domain_snapshot import DomainRecord, DomainSnapshot
+from app.services.url_verdict import URLVerdictService
+from app.services.url_whitelist import WhitelistService
+
+
+class StaticSnapshotCache:
+    def __init__(self, whitelist_rows, blacklist_rows):
+        self.snapshot = DomainSnapshot(
+            whitelist=DomainIndex((domain, DomainRecord(id=i, domain=domain)) for i, domain in whitelist_rows),
+            blacklist=DomainIndex((domain, DomainRecord(id=i, domain=domain)) for i, domain in blacklist_rows),
+            version=(),
+        )
+
+    async def get(self, session):
+        return self.snapshot
+
+
+def test_raw_stored_domains_match_like_whitelist_service():
+    # Domain lưu nguyên dạng người dùng nhập: có www. và chữ hoa
+    cache = StaticSnapshotCache([(1, "WWW.Vietcombank.com.vn")], [(2, "www.Scam-Site.TOP")])
+    urls = ["https://vietcombank.com.vn/login", "http://a.scam-site.top/otp", "https://other.vn"]
+
+    verdicts = asyncio.run(URLVerdictService(session=None, snapshot_cache=cache).check_urls(urls))
+    whitelist = asyncio.run(WhitelistService(session=None, snapshot_cache=cache).check_urls(urls))
+
+    assert [v.match_type for v in verdicts] == ["whitelist", "blacklist", "unknown"]
+    assert [v.whitelist_entry_id for v in verdicts] == [1, 2, None]
+    assert [v.is_trusted for v in verdicts] == [w.is_trusted for w in whitelist]
+
+
+def test_more_specific_blacklist_wins_on_every_check_path(monkeypatch):
+    from app.api import image_processing
+    from app.services import url_verdict
+
+    cache = StaticSnapshotCache(
+        [(1, "google.com"), (2, "vietcombank.com.vn")],
+        [(3, "sites.google.com"), (4, "xac-minh.vietcombank.com.vn")],
+    )
+    urls = [
+        "https://sites.google.com/view/nhan-qua",
+        "https://xac-minh.vietcombank.com.vn/otp",
+        "https://mail.google.com",
+    ]
+    # Pipeline OCR/extract-text dùng snapshot mặc định của process
+    monkeypatch.setattr(url_verdict, "domain_snapshot_cache", cache)
+
+    verdict_service = URLVerdictService(session=None, snapshot_cache=cache)
+    whitelist_service = WhitelistService(session=None, snapshot_cache=cache)
+    verdicts = asyncio.run(verdict_service.check_urls(urls))
+    pipeline = asyncio.run(image_processing.check_whitelist(None, urls))
+    whitelist = asyncio.run(whitelist_service.check_urls(urls))
+
+    assert [v.match_type for v in verdicts] == ["blacklist", "blacklist", "whitelist"]
+    assert [v.whitelist_entry_id for v in verdicts] == [3, 4, 1]
+    assert [p.model_dump() for p in pipeline] == [v.model_dump() for v in verdicts]
+    assert [w.is_trusted for w in whitelist] == [False, False, True]
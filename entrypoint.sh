@@ -13,5 +13,10 @@ chmod -R 755 /app/.cache/huggingface || true
 # Run migrations and server as root (temporary solution for permission issues)
 # TODO: Fix permissions properly to run as app user
 echo "Running migrations and starting application..."
-alembic upgrade head && uvicorn main:app --host 0.0.0.0 --port 5000
+alembic upgrade head
+if [ "${OCR_SHARED_WEIGHTS,,}" = "true" ] || [ "${OCR_SHARED_WEIGHTS}" = "1" ]; then
+    # Nhiều worker dùng chung weight OCR nạp sẵn trong process cha
+    exec gunicorn -c gunicorn.conf.py main:app
+fi
+exec uvicorn main:app --host 0.0.0.0 --port 5000
 
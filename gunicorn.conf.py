@@ -0,0 +1,37 @@
+"""
+Cấu hình gunicorn cho chạy nhiều worker uvicorn.
+
+Với OCR_SHARED_WEIGHTS=true, app và model Vintern được nạp một lần trong process cha
+(preload_app) rồi mới fork worker, nên các worker dùng chung weight theo copy-on-write:
+số worker bị giới hạn bởi CPU thay vì RAM.
+
+    gunicorn -c gunicorn.conf.py main:app
+"""
+import multiprocessing
+import os
+
+from app.core.config import settings
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+# Nạp model lần đầu có thể lâu hơn timeout mặc định 30s
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+preload_app = settings.OCR_SHARED_WEIGHTS
+
+
+def when_ready(server):
+    # Chạy trong process cha, sau khi nạp app và trước khi fork worker
+    if settings.OCR_SHARED_WEIGHTS:
+        from app.services.ocr_provider import ocr_provider
+
+        ocr_provider.preload_for_fork()
+
+
+def post_fork(server, worker):
+    if settings.OCR_SHARED_WEIGHTS:
+        from app.services.ocr_provider import ocr_provider
+
+        # Chia đều core cho các worker để torch của các process không tranh CPU
+        threads = settings.OCR_TORCH_THREADS or max(1, multiprocessing.cpu_count() // workers)
+        ocr_provider.after_fork(threads)